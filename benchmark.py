@@ -1,27 +1,40 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from statistics import mean
 
-from typing import Callable
+from typing import Callable, Optional
 
 # Import necessary components
-from search import heuristic_dfs, default_dfs
+from search import default_dfs
+from profiling import Phase_Profiler
 from colony_simulation.colony import Colony
 from colony_simulation.wrapper import Colony_Wrapper
 from colony_simulation.default_buildings import ALL_BUILDINGS, farm, nuclear_reactor
 from colony_simulation.default_events import ALL_EVENTS
+from colony_simulation.scenario import Scenario_Corpus
 
 # Reusing specific logic from run.py
 from run import (
     setup_simulation, 
     make_heuristic_values, 
     read_heuristic_weights, 
-    Heuristic_Values
+    Heuristic_Values,
+    algorithms
 )
 
+# Each scenario is run by three agents, so its events are only worked out the first time
+SCENARIOS = Scenario_Corpus(31)
+
+def load_scenarios(path: str | None) -> None:
+    # Also the worker initializer, so every worker process starts from the saved corpus
+    if path is not None and os.path.exists(path):
+        SCENARIOS.load(path)
+
 @dataclass
 class SimulationResult:
     seed: int
@@ -29,6 +42,7 @@ class SimulationResult:
     depth: int
     nodes_generated: int
     execution_time: float
+    profile: Optional[Phase_Profiler] = None
 
 def run_single_scenario(
     seed: int, 
@@ -36,19 +50,30 @@ def run_single_scenario(
     algorithm_func: Callable,
     node_limit: int, 
     actions_per_day: int,
-    goal_days: int
+    goal_days: int,
+    profile: bool = False,
+    mcts_prior_weight: float | None = None,
+    beam_width: int = 8
 ) -> SimulationResult:
     
-    random.seed(seed)
-    colony, buildings = setup_simulation(goal_days)
+    if goal_days == SCENARIOS.days:
+        scenario = SCENARIOS.seed_random(seed)
+        colony, buildings = setup_simulation(goal_days, scenario)
+    else:
+        random.seed(seed)
+        colony, buildings = setup_simulation(goal_days, seed=seed)
     
     # Wrapper always needs weights, even if default_dfs ignores them
     wrapper = Colony_Wrapper(colony, buildings, heuristic_weights)
     wrapper.actions_per_day = actions_per_day
     wrapper.goal_day = goal_days
+    wrapper.mcts_prior_weight = mcts_prior_weight
+    wrapper.beam_width = beam_width
+    if profile:
+        wrapper.profiler = Phase_Profiler()
 
     start_time = time.time()
-    # Run the specific algorithm passed in (heuristic_dfs or default_dfs)
+    # Run the specific algorithm passed in (heuristic_dfs, mcts, beam_search or default_dfs)
     path, stats = algorithm_func(wrapper, node_expansions_allowed=node_limit)
     end_time = time.time()
 
@@ -57,7 +82,8 @@ def run_single_scenario(
         success=stats.success,
         depth=len(path) if path else 0,
         nodes_generated=stats.nodes_generated,
-        execution_time=end_time - start_time
+        execution_time=end_time - start_time,
+        profile=stats.profile
     )
 
 def print_summary(title: str, results: list[SimulationResult]):
@@ -76,6 +102,13 @@ def print_summary(title: str, results: list[SimulationResult]):
     print(f"Avg Nodes Gen:   {avg_nodes:.1f}")
     print(f"Avg Time:        {avg_time:.4f}s")
 
+    profiles = [r.profile for r in results if r.profile is not None]
+    if profiles:
+        combined = Phase_Profiler()
+        for profile in profiles:
+            combined.merge(profile)
+        print(combined.report())
+
 def main():
     parser = argparse.ArgumentParser(description="Benchmark heuristic weights against baseline and default DFS.")
     parser.add_argument('--candidate', '-c', type=str, required=True, help="Path to the new heuristic weights.")
@@ -84,6 +117,12 @@ def main():
     parser.add_argument('--node-expansions', '--nea', type=int, default=500)
     parser.add_argument('--actions-per-day', '--apd', type=int, default=3)
     parser.add_argument('--seed', '-s', type=int, help="Master seed.")
+    parser.add_argument('--algorithm', '--algo', type=str, choices=[name for name in algorithms if name != "percentage_fuzzing"], default="heuristic_dfs", help="Search the candidate and baseline weights are run with, the control group always uses default_dfs.")
+    parser.add_argument('--mcts-prior-weight', '--mpw', type=float, required=False, help="Only used with --algorithm mcts, weight of the heuristic priors (without it mcts ignores the weights).")
+    parser.add_argument('--beam-width', '--bw', type=int, default=8, help="Only used with --algorithm beam_search, how many colonies it keeps per day.")
+    parser.add_argument('--workers', '-w', type=int, default=1, help="Worker processes to spread scenarios across, 1 runs serially.")
+    parser.add_argument('--scenario-file', '--sf', type=str, required=False, help="JSON file to load prebuilt scenarios from, the scenarios run are saved back to it.")
+    parser.add_argument('--profile', '-p', action='store_true', help="Time each search phase and print a per group breakdown with the final statistics.")
 
     args = parser.parse_args()
 
@@ -112,18 +151,34 @@ def main():
     print("-" * 60)
 
     # 3. Execution Loop
-    for i, seed in enumerate(scenario_seeds):
-        # Run Candidate (Heuristic DFS)
-        r_c = run_single_scenario(seed, cand_weights, heuristic_dfs, args.node_expansions, args.actions_per_day, 31)
-        results["Cand"].append(r_c)
+    # Every scenario runs the same three jobs, each one is independent and seeded on its own
+    algorithm = algorithms[args.algorithm]
+    scenario_jobs = [
+        (
+            (seed, cand_weights, algorithm, args.node_expansions, args.actions_per_day, 31, args.profile, args.mcts_prior_weight, args.beam_width), # Candidate
+            (seed, base_weights, algorithm, args.node_expansions, args.actions_per_day, 31, args.profile, args.mcts_prior_weight, args.beam_width), # Baseline
+            (seed, base_weights, default_dfs, args.node_expansions, args.actions_per_day, 31, args.profile),   # Default DFS (Control Group)
+        )
+        for seed in scenario_seeds
+    ]
+
+    load_scenarios(args.scenario_file)
+    SCENARIOS.warm(scenario_seeds)
+    if args.scenario_file:
+        SCENARIOS.save(args.scenario_file)
+
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=load_scenarios, initargs=(args.scenario_file,))
+        # Submit everything up front, then collect per scenario in seed order so rows print as soon as they are ready
+        futures = [[executor.submit(run_single_scenario, *job) for job in jobs] for jobs in scenario_jobs]
+        scenario_results = ([future.result() for future in scenario_futures] for scenario_futures in futures)
+    else:
+        scenario_results = ([run_single_scenario(*job) for job in jobs] for jobs in scenario_jobs)
 
-        # Run Baseline (Heuristic DFS)
-        r_b = run_single_scenario(seed, base_weights, heuristic_dfs, args.node_expansions, args.actions_per_day, 31)
+    for i, (r_c, r_b, r_d) in enumerate(scenario_results):
+        results["Cand"].append(r_c)
         results["Base"].append(r_b)
-
-        # Run Default DFS (Control Group)
-        # We pass base_weights to wrapper initialization, but default_dfs likely ignores them
-        r_d = run_single_scenario(seed, base_weights, default_dfs, args.node_expansions, args.actions_per_day, 31)
         results["Dflt"].append(r_d)
 
         # Formatting Output
@@ -137,13 +192,16 @@ def main():
 
         print(f"{i+1:<3} | {stat_c:<8} | {stat_b:<8} | {stat_d:<8} | {diff_str:<20}")
 
+    if executor is not None:
+        executor.shutdown()
+
     print("\n" + "="*30)
     print("FINAL STATISTICS")
     print("="*30)
     
-    print_summary("CANDIDATE (Heuristic DFS)", results["Cand"])
+    print_summary(f"CANDIDATE ({args.algorithm})", results["Cand"])
     print("")
-    print_summary(f"BASELINE ({base_name})", results["Base"])
+    print_summary(f"BASELINE ({base_name}, {args.algorithm})", results["Base"])
     print("")
     print_summary("CONTROL (Default DFS)", results["Dflt"])
 
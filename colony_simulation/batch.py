@@ -0,0 +1,446 @@
+#This file runs many copies of the same colony in lockstep using NumPy arrays, it is used by percentage_fuzzing
+#to estimate win rates from millions of random rollouts. Every rule here mirrors a scalar rule in colony.py,
+#default_events.py or wrapper.py, if one of those changes the matching function here has to change too
+import random
+from typing import TYPE_CHECKING, Callable, Sequence
+import numpy as np
+
+from colony_simulation.building import Building, VALID_PRODUCTION_KEYS
+from colony_simulation.colony import (
+    invest_in_food_production,
+    invest_in_energy_production,
+    invest_in_defense,
+    invest_in_population_increase,
+    recruit_staff,
+    do_nothing
+)
+from colony_simulation.default_events import (
+    supply_drop_event_fire,
+    population_boom_event_fire,
+    discovery_event_fire,
+    bountiful_harvest_event_fire,
+    underground_discovery_event_fire,
+    strange_signal_event_fire,
+    annihilate_colony_event_fire,
+    cosmic_radiation_event_fire,
+    dust_storm_event_fire,
+    alien_invasion_event_fire,
+    alien_infection_event_fire,
+    rocket_barrage_event,
+    wildlife_encounter_event_fire,
+    escalating_raids_event_fire,
+    resource_depletion_event_fire,
+    solar_flare_event_fire,
+    sabotage_event_fire,
+    seismic_activity_event_fire,
+    massive_raid_one,
+    massive_raid_two,
+    massive_raid_three
+)
+
+if TYPE_CHECKING:
+    from colony_simulation.colony import Colony
+    from colony_simulation.event import Event_Stream
+    from transposition import Transposition_Table
+    from run import Heuristic_Values
+
+class Colony_Batch:
+    """N colonies stored as one array per field, all advanced a day at a time.
+
+    Every colony in a batch is on the same day, so the scheduled events for that day and the numbers
+    they draw from their Event_Stream are the same for all of them, only the actions differ per colony.
+    Colonies that lose are dropped from the arrays by remove_lost.
+    """
+    def __init__(
+            self,
+            colony: "Colony",
+            action_table: tuple[tuple[str, Callable, int], ...],
+            size: int,
+            rng: np.random.Generator | None = None
+        ):
+        self.size: int = size
+        self.rng: np.random.Generator | None = rng
+        self.current_day: int = colony.current_day
+
+        self.food = np.full(size, colony.food, dtype=np.float64)
+        self.energy = np.full(size, colony.energy, dtype=np.float64)
+        self.population = np.full(size, colony.population, dtype=np.int64)
+        self.base_defense_capacity = np.full(size, colony.base_defense_capacity, dtype=np.float64)
+        self.base_food_production = np.full(size, colony.base_food_production, dtype=np.float64)
+        self.base_energy_production = np.full(size, colony.base_energy_production, dtype=np.float64)
+        self.population_growth_factor = np.full(size, colony.population_growth_factor, dtype=np.float64)
+        self.power_modifier = np.full(size, colony.power_modifier, dtype=np.float64)
+        self.defense_capacity = np.full(size, colony.defense_capacity, dtype=np.float64)
+        self.building_counts = np.tile(np.array(colony.building_counts, dtype=np.int64), (size, 1))
+        self.food_consumption_factor: float = colony.food_consumption_factor
+        self.temp_population_growth_factor: float = colony.temp_population_growth_factor
+
+        # Per building type columns, indexed the same way as building_counts
+        building_types = colony.building_registry.types
+        self.staff_needed = np.array([b.staff_needed for b in building_types], dtype=np.int64)
+        self.defense_strength = np.array([b.defense_strength for b in building_types], dtype=np.float64)
+        self.production = np.array(
+            [[b.production.get(resource, 0) for resource in VALID_PRODUCTION_KEYS] for b in building_types],
+            dtype=np.float64
+        ).reshape(len(building_types), len(VALID_PRODUCTION_KEYS))
+
+        self.action_costs = np.array([cost for _name, _action, cost in action_table], dtype=np.float64)
+        self.free_action_count: int = int(np.searchsorted(self.action_costs, 0, side="right"))
+        self.batch_actions: list[Callable] = [get_batch_action(action, colony) for _name, action, _cost in action_table]
+
+        self.events_by_day: dict[int, list[tuple[Callable, "Event_Stream"]]] = {}
+        for day, firings in colony.events.firings.items():
+            for event, _stream in firings:
+                if event.fire_event not in BATCH_EVENTS:
+                    raise ValueError(f"Event {event.event_name} has no batch implementation")
+            self.events_by_day[day] = [(BATCH_EVENTS[event.fire_event], stream) for event, stream in firings]
+
+    def random_transition(self, actions_per_day: int) -> None:
+        # Same as percentage_fuzzing + Colony_Wrapper.transition: each slot picks uniformly among the
+        # actions affordable with the energy left, then the chosen actions are applied
+        available_energy = self.energy.copy()
+        action_count = len(self.batch_actions)
+        times_chosen = np.zeros(self.size * action_count, dtype=np.int64)
+        row_offsets = np.arange(self.size) * action_count
+        for _ in range(actions_per_day):
+            affordable = np.searchsorted(self.action_costs, available_energy, side="right")
+            affordable = np.maximum(affordable, self.free_action_count)
+            can_act = affordable > 0
+            choice = (self.rng.random(self.size) * affordable).astype(np.int64)
+            choice = np.minimum(choice, np.maximum(affordable - 1, 0))
+            times_chosen += np.bincount((row_offsets + choice)[can_act], minlength=times_chosen.size)
+            available_energy -= np.where(can_act, self.action_costs[choice], 0)
+
+        times_chosen = times_chosen.reshape(self.size, action_count)
+        for index, batch_action in enumerate(self.batch_actions):
+            times = times_chosen[:, index]
+            if times.any():
+                batch_action(self, times)
+        self.energy = available_energy
+        self.reset_power_modifiers()
+
+    def reset_power_modifiers(self) -> None:
+        # transition starts each child with a fresh power modifier of 1.0 before recalculating it
+        self.power_modifier = np.ones(self.size, dtype=np.float64)
+        self.calc_building_power_modifiers()
+
+    def apply_combinations(self, combinations: np.ndarray) -> None:
+        # Row i takes the actions action_table[combinations[i, 0]], action_table[combinations[i, 1]], ...
+        # Actions are applied a slot at a time with 0/1 counts and the costs are taken off one by one,
+        # so every row ends up bit for bit equal to Colony_Wrapper.transition with that combination
+        for slot in range(combinations.shape[1]):
+            column = combinations[:, slot]
+            for action_index in np.flatnonzero(np.bincount(column, minlength=len(self.batch_actions))):
+                self.batch_actions[action_index](self, (column == action_index).astype(np.int64))
+            self.energy -= self.action_costs[column]
+
+    def seen_mask(self, seen: "Transposition_Table") -> np.ndarray:
+        # True for every row whose Transposition_Table key is in seen. Only keys from the same day with the
+        # row's food can match, seen looks those up directly (children of one colony all share both), so the
+        # cost depends on how many keys share them, not on how big seen has grown
+        mask = np.zeros(self.size, dtype=bool)
+        if not seen:
+            return mask
+        food = seen.bucket_array(self.food)
+        energy = seen.bucket_array(self.energy)
+        defense_capacity = seen.bucket_array(self.defense_capacity)
+        counts_hash = self.building_counts @ np.array(seen.building_hashes, dtype=np.int64)
+        for food_key in np.unique(food).tolist():
+            keys = seen.keys_for(self.current_day, food_key)
+            if not keys:
+                continue
+            rows = np.flatnonzero(food == food_key)
+            row_mask = np.zeros(len(rows), dtype=bool)
+            for _day, population, _food_key, energy_key, defense_key, counts_key in keys:
+                row_mask |= (
+                    (self.population[rows] == population)
+                    & (energy[rows] == energy_key)
+                    & (defense_capacity[rows] == defense_key)
+                    & (counts_hash[rows] == counts_key)
+                )
+            mask[rows] = row_mask
+        # counted like the lookups of the scalar scorers, one per row
+        hits = int(mask.sum())
+        seen.hits += hits
+        seen.misses += self.size - hits
+        return mask
+
+    def calc_building_power_modifiers(self) -> None:
+        total_staff_needed = self.building_counts @ self.staff_needed
+        has_staff = total_staff_needed > 0
+        fulfillment_ratio = np.minimum(1, self.population / np.where(has_staff, total_staff_needed, 1))
+        self.power_modifier = np.where(has_staff, np.maximum(0, fulfillment_ratio), self.power_modifier)
+
+    def tick_step(self) -> None:
+        # Mirrors Colony.tick_step. Effects are not modelled: Colony_Wrapper.transition does not carry
+        # current_effects over to the child, so in the search paths they never get to apply
+        self.food += self.base_food_production
+        self.food -= np.rint(self.population / self.food_consumption_factor)
+
+        population_change = self.population * self.population_growth_factor
+        population_change = np.where(
+            population_change >= 0,
+            np.maximum(2, np.ceil(population_change)),
+            np.minimum(-2, np.floor(population_change))
+        ).astype(np.int64)
+        self.population += population_change
+        starving = self.food <= 0
+        self.population -= np.where(starving, np.maximum(10, self.population // 10), 0)
+        self.population = np.maximum(0, self.population)
+
+        self.calc_building_power_modifiers()
+        self.defense_capacity = self.base_defense_capacity + (self.building_counts @ self.defense_strength) * self.power_modifier
+
+        # rounded per building like Colony.run_building_effects, columns are food, energy, population, defense
+        per_building = np.rint(self.production[None, :, :] * self.power_modifier[:, None, None])
+        produced = (per_building * self.building_counts[:, :, None]).sum(axis=1)
+        self.food += produced[:, 0]
+        self.energy += produced[:, 1]
+        self.population += produced[:, 2].astype(np.int64)
+        self.base_defense_capacity += produced[:, 3]
+
+        for batch_event, stream in self.events_by_day.get(self.current_day, ()):
+            batch_event(self, stream.restart())
+        self.current_day += 1
+
+        self.energy += self.base_energy_production
+        self.population = np.maximum(0, self.population)
+
+    def remove_lost(self) -> None:
+        alive = self.population > 0
+        if alive.all():
+            return
+        for field in (
+                "food", "energy", "population", "base_defense_capacity", "base_food_production",
+                "base_energy_production", "population_growth_factor", "power_modifier",
+                "defense_capacity", "building_counts"
+            ):
+            setattr(self, field, getattr(self, field)[alive])
+        self.size = int(alive.sum())
+
+def get_index_combinations(costs: Sequence[int], possible_actions: int, available_energy: float) -> np.ndarray:
+    # Every row of search.get_unique_index_combinations as one array, in the same order. Combinations are
+    # grown a slot at a time for all rows at once, keeping only the next indices that are still affordable,
+    # so the same branches get pruned as in the scalar walk
+    cost_array = np.array(costs, dtype=np.float64)
+    candidates = np.arange(len(costs))
+    combinations = np.zeros((1, 0), dtype=np.int64)
+    energy_left = np.array([float(available_energy)])
+    last_index = np.zeros(1, dtype=np.int64)
+    for _ in range(possible_actions):
+        allowed = (candidates[None, :] >= last_index[:, None]) & (
+            (cost_array[None, :] <= energy_left[:, None]) | (cost_array[None, :] == 0)
+        )
+        # nonzero walks row by row with ascending indices, which keeps the lexicographic order of the scalar walk
+        rows, next_index = np.nonzero(allowed)
+        combinations = np.concatenate((combinations[rows], next_index[:, None]), axis=1)
+        energy_left = energy_left[rows] - cost_array[next_index]
+        last_index = next_index
+    return combinations
+
+def batch_heuristic(batch: Colony_Batch, heuristic_values: "Heuristic_Values") -> np.ndarray:
+    # Vectorised Colony_Wrapper.heuristic. The operations are done in the same order as the scalar version
+    # (building totals first, then scaled by the projected efficiency) so the scores come out exactly the same
+    population = batch.population
+    growth = population * (batch.population_growth_factor + batch.temp_population_growth_factor)
+    growth = np.where(growth >= 0, np.maximum(2, np.ceil(growth)), np.minimum(-2, np.floor(growth))).astype(np.int64)
+    growth -= np.where(batch.food <= 0, np.maximum(10, population // 10), 0)
+
+    expected_pop = population + growth
+
+    total_staff_needed = batch.building_counts @ batch.staff_needed
+    has_staff = total_staff_needed > 0
+    projected_efficiency = np.where(
+        has_staff,
+        np.minimum(1.0, expected_pop / np.where(has_staff, total_staff_needed, 1)),
+        1.0
+    )
+
+    production_totals = batch.building_counts @ batch.production
+    building_food_prod = production_totals[:, 0] * projected_efficiency
+    building_energy_prod = production_totals[:, 1] * projected_efficiency
+    building_population_prod = production_totals[:, 2] * projected_efficiency
+    building_defense_prod = production_totals[:, 3] * projected_efficiency
+    building_extra_defense = batch.building_counts @ batch.defense_strength
+
+    food_target = np.maximum(heuristic_values.food_target_base, population * (batch.food_consumption_factor + 0.5))
+    effective_food = batch.food + batch.base_food_production + building_food_prod
+    food_score = effective_food / food_target
+
+    effective_energy_prod = batch.energy + batch.base_energy_production + building_energy_prod
+    energy_score = effective_energy_prod / heuristic_values.energy_prod_target
+
+    effective_defense = batch.defense_capacity + building_defense_prod + building_extra_defense
+    defense_score = effective_defense / heuristic_values.defense_target
+
+    effective_population = expected_pop + building_population_prod
+    population_score = effective_population / heuristic_values.population_target
+
+    w_food = heuristic_values.w_food
+    w_energy = heuristic_values.w_energy
+    w_defense = heuristic_values.w_defense
+    w_population = heuristic_values.w_population
+
+    total_weight = w_food + w_energy + w_defense + w_population
+
+    combined = (
+        w_food * food_score
+        + w_energy * energy_score
+        + w_defense * defense_score
+        + w_population * population_score
+    ) / total_weight
+
+    return np.where(population <= 0, -1e6, combined)
+
+def make_rng(source: random.Random) -> np.random.Generator:
+    # Seeded from the search's RNG (see Colony_Wrapper.rng) so --seed still makes batch runs reproducible
+    return np.random.default_rng(source.getrandbits(64))
+
+# ===== ACTIONS =====
+# Each batch action receives how many times every colony took it today
+
+def get_batch_action(action: Callable, colony: "Colony") -> Callable:
+    building = getattr(action, "__self__", None)
+    if isinstance(building, Building):
+        type_index = colony.building_registry.index_of(building)
+        def build(batch: Colony_Batch, times: np.ndarray) -> None:
+            batch.building_counts[:, type_index] += times
+        return build
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f"Action {action.__name__} has no batch implementation")
+    return BATCH_ACTIONS[action]
+
+def batch_invest_in_food_production(batch: Colony_Batch, times: np.ndarray) -> None:
+    batch.base_food_production *= 1.06 ** times
+
+def batch_invest_in_energy_production(batch: Colony_Batch, times: np.ndarray) -> None:
+    batch.base_energy_production *= 1.08 ** times
+
+def batch_invest_in_defense(batch: Colony_Batch, times: np.ndarray) -> None:
+    batch.base_defense_capacity *= 1.02 ** times
+
+def batch_invest_in_population_increase(batch: Colony_Batch, times: np.ndarray) -> None:
+    batch.population_growth_factor *= 1.04 ** times
+
+def batch_recruit_staff(batch: Colony_Batch, times: np.ndarray) -> None:
+    batch.population += 20 * times
+
+def batch_do_nothing(batch: Colony_Batch, times: np.ndarray) -> None:
+    return
+
+BATCH_ACTIONS: dict[Callable, Callable] = {
+    invest_in_food_production: batch_invest_in_food_production,
+    invest_in_energy_production: batch_invest_in_energy_production,
+    invest_in_defense: batch_invest_in_defense,
+    invest_in_population_increase: batch_invest_in_population_increase,
+    recruit_staff: batch_recruit_staff,
+    do_nothing: batch_do_nothing
+}
+
+# ===== EVENTS =====
+# Called with the same Event_Stream as the scalar events, one draw is shared by every colony in the batch
+
+def batch_supply_drop(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.food += rng.randint(100, 200)
+    batch.energy += rng.randint(30, 60)
+
+def batch_population_boom(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.population += rng.randint(15, 30)
+
+def batch_discovery(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    # the research boost effect is dropped by transition, see tick_step
+    batch.energy += 50
+
+def batch_bountiful_harvest(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.food += rng.randint(150, 300)
+
+def batch_underground_discovery(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.base_energy_production += 5
+
+def batch_strange_signal(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.energy += 50 if rng.random() > 0.5 else -20
+
+def batch_annihilate_colony(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.population -= 100
+
+def batch_cosmic_radiation(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.population -= rng.randint(15, 25)
+
+def batch_dust_storm(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    # the storm effect is dropped by transition, see tick_step
+    batch.energy -= 100
+
+def batch_alien_invasion(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.population -= rng.randint(30, 50)
+    batch.food -= rng.randint(200, 400)
+    batch.energy -= rng.randint(100, 200)
+    batch.base_defense_capacity *= 0.8
+
+def batch_alien_infection(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.population -= rng.randint(20, 40)
+
+def batch_rocket_barrage(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    damage = np.maximum(10, 50 - np.trunc(batch.defense_capacity * 0.1)).astype(np.int64)
+    batch.population -= damage
+    batch.base_defense_capacity *= 0.9
+
+def batch_wildlife_encounter(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.food -= 50
+
+def apply_raid(batch: Colony_Batch, raid_strength: float, population_rate: float, food_rate: float, energy_rate: float) -> None:
+    damage = np.maximum(0, raid_strength - batch.defense_capacity)
+    batch.population -= np.trunc(damage * population_rate).astype(np.int64)
+    batch.food -= np.trunc(damage * food_rate)
+    batch.energy -= np.trunc(damage * energy_rate)
+
+def batch_escalating_raids(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    apply_raid(batch, batch.current_day * 15, 0.4, 2.0, 1.0)
+
+def batch_resource_depletion(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.base_food_production -= 5
+
+def batch_solar_flare(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.energy[:] = 0
+    batch.base_energy_production -= 5
+
+def batch_sabotage(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.base_defense_capacity -= 50
+    batch.food -= 100
+
+def batch_seismic_activity(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    batch.base_energy_production -= 10
+    batch.base_food_production -= 10
+    batch.population -= 15
+
+def batch_massive_raid_one(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    apply_raid(batch, 200, 0.3, 2, 0.7)
+
+def batch_massive_raid_two(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    apply_raid(batch, 400, 0.7, 2, 0.7)
+
+def batch_massive_raid_three(batch: Colony_Batch, rng: "Event_Stream") -> None:
+    apply_raid(batch, 600, 1.0, 2, 0.7)
+
+BATCH_EVENTS: dict[Callable, Callable] = {
+    supply_drop_event_fire: batch_supply_drop,
+    population_boom_event_fire: batch_population_boom,
+    discovery_event_fire: batch_discovery,
+    bountiful_harvest_event_fire: batch_bountiful_harvest,
+    underground_discovery_event_fire: batch_underground_discovery,
+    strange_signal_event_fire: batch_strange_signal,
+    annihilate_colony_event_fire: batch_annihilate_colony,
+    cosmic_radiation_event_fire: batch_cosmic_radiation,
+    dust_storm_event_fire: batch_dust_storm,
+    alien_invasion_event_fire: batch_alien_invasion,
+    alien_infection_event_fire: batch_alien_infection,
+    rocket_barrage_event: batch_rocket_barrage,
+    wildlife_encounter_event_fire: batch_wildlife_encounter,
+    escalating_raids_event_fire: batch_escalating_raids,
+    resource_depletion_event_fire: batch_resource_depletion,
+    solar_flare_event_fire: batch_solar_flare,
+    sabotage_event_fire: batch_sabotage,
+    seismic_activity_event_fire: batch_seismic_activity,
+    massive_raid_one: batch_massive_raid_one,
+    massive_raid_two: batch_massive_raid_two,
+    massive_raid_three: batch_massive_raid_three
+}
@@ -1,12 +1,19 @@
 #Buildings should produce stuff like food and increase defense readiness
 #Buildings are constructed using energy
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, Iterable
 if TYPE_CHECKING:
     from colony import Colony
 
+VALID_PRODUCTION_KEYS = ("food", "energy", "population", "defense")
+# The colony attribute each production key adds to, in the same order as VALID_PRODUCTION_KEYS
+PRODUCTION_ATTRIBUTES = ("food", "energy", "population", "base_defense_capacity")
+
 class Building:
+    # A Building is a building *type*, a single instance is shared by every colony that owns one.
+    # Colonies only store how many of each type they have (see Building_Registry), so nothing
+    # here should be modified once the simulation is running
     def __init__(
-            self, 
+            self,
             building_name: str,
             defense_strength: int = 0,
             staff_needed: int = 15,
@@ -18,45 +25,69 @@ class Building:
         self.defense_strength: int = defense_strength
         self.staff_needed = staff_needed
         self.building_cost: int = building_cost
-        self.power_modifier: float = 1.0
-        self.production: dict[str, int] = production
-        self.valid_production_keys = ["food", "energy", "population", "defense"]
+        self.production: dict[str, int] = dict(production)
+        # (index into VALID_PRODUCTION_KEYS, amount) for every valid, nonzero entry of production,
+        # worked out once so ticks don't have to compare resource names
+        self.production_amounts: tuple[tuple[int, int], ...] = tuple(
+            (VALID_PRODUCTION_KEYS.index(resource), value)
+            for resource, value in self.production.items()
+            if resource in VALID_PRODUCTION_KEYS and value
+        )
 
         #I might want to consider having the effects be tied to the building itself rather than a tick effect so that upgrades and stuff are easier to make
     def build(self, colony: "Colony") -> tuple[bool, str]:
         if colony.energy >= self.building_cost:
-            colony.buildings.append(self.clone())
+            colony.add_building(self)
             return (True, f"Successfully built: {self.building_name}")
         else:
             return (False, f"Failed to build: {self.building_name}: lack of energy")
-        
-    def clone(self) -> "Building":
-        return Building(
-            self.building_name,
-            self.defense_strength,
-            self.staff_needed,
-            self.building_cost,
-            self.production
-        )
-        
-    def tick_effect(self, colony: "Colony") -> None:
-        if not self.production:
-            return
-        for resource, value in self.production.items():
-            if resource not in self.valid_production_keys:
-                continue
-            adjusted_value = round(value * self.power_modifier)
-            if resource == "food":
-                colony.food += adjusted_value
-            elif resource == "energy":
-                colony.energy += adjusted_value
-            elif resource == "population":
-                colony.population += adjusted_value
-            elif resource == "defense":
-                colony.base_defense_capacity += adjusted_value
-        
+
     def __repr__(self) -> str:
-        return f"{self.building_name} efficiency: {self.power_modifier}"
+        return f"Building: {self.building_name}"
+
+class Building_Registry:
+    """Immutable, indexed set of building types.
+
+    Colonies keep a list of counts where index i is the number of registry.types[i] they own,
+    so copying a colony costs O(number of types) instead of O(number of buildings).
+    """
+    def __init__(self, buildings: Iterable[Building]):
+        types: list[Building] = []
+        index: dict[str, int] = {}
+        for building in buildings:
+            if building.building_name in index:
+                continue
+            index[building.building_name] = len(types)
+            types.append(building)
+        self.types: tuple[Building, ...] = tuple(types)
+        self._index: dict[str, int] = index
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __iter__(self):
+        return iter(self.types)
+
+    def __contains__(self, building: Building) -> bool:
+        return building.building_name in self._index
+
+    def index_of(self, building: Building) -> int:
+        return self.index_of_name(building.building_name)
+
+    def index_of_name(self, building_name: str) -> int:
+        try:
+            return self._index[building_name]
+        except KeyError:
+            raise ValueError(f"{building_name} is not a registered building type") from None
+
+    def empty_counts(self) -> list[int]:
+        return [0] * len(self.types)
+
+    def count(self, buildings: Iterable[Building]) -> list[int]:
+        counts = self.empty_counts()
+        for building in buildings:
+            counts[self.index_of(building)] += 1
+        return counts
 
 def get_building_actions(buildings: list[Building]) -> list[tuple[str, Callable, int]]:
     building_actions = []
@@ -68,4 +99,3 @@ def get_building_actions(buildings: list[Building]) -> list[tuple[str, Callable,
             )
         )
     return building_actions
-
@@ -1,8 +1,11 @@
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, Iterator
 import random
 import math
+from colony_simulation.building import PRODUCTION_ATTRIBUTES, VALID_PRODUCTION_KEYS, Building_Registry
+from colony_simulation.event import Event_Schedule
+from colony_simulation.simulation_log import NULL_LOG, EVENT_FIRED, EFFECT_EXPIRED, Null_Log, Simulation_Log
 if TYPE_CHECKING:
-    from building import Building
+    from colony_simulation.building import Building
     from colony_simulation.event import Event
 # future additions that are optional:
 # status effects: statuses that effect aspects about the colony over time
@@ -20,7 +23,7 @@ class Colony:
     def __init__(
             self, 
             starting_buildings : list["Building"],
-            events: list["Event"],
+            events: "list[Event] | Event_Schedule",
             food: float = 600, 
             base_defense_capacity: float = 70.0,
             population: int = 200,
@@ -28,60 +31,131 @@ class Colony:
             base_food_production: float = 30,
             base_energy_production: float = 50,
             population_growth_factor: float = 0.02,
+            building_registry: Building_Registry | None = None,
+            building_counts: list[int] | None = None,
+            log: "Null_Log | Simulation_Log" = NULL_LOG,
         ):
         self.current_day: int = 1
         self.base_defense_capacity: float = base_defense_capacity
         self.food : float = food
         self.base_food_production: float = base_food_production
         self.population: int = population
-        self.buildings: list["Building"] = starting_buildings
+        # Buildings are stored as a count per registered building type, the types themselves are shared
+        self.building_registry: Building_Registry = building_registry if building_registry is not None else Building_Registry(starting_buildings)
+        if building_counts is not None:
+            self.building_counts: list[int] = list(building_counts)
+        else:
+            self.building_counts: list[int] = self.building_registry.count(starting_buildings)
+        # Every building runs at the same staffing efficiency, so it is stored once on the colony
+        self.power_modifier: float = 1.0
+        # Running totals over all buildings, kept up to date by add_building so ticks never walk the buildings
+        self.total_staff_needed: int = 0
+        self.total_defense_strength: int = 0
+        self.production_totals: list[int] = [0] * len(VALID_PRODUCTION_KEYS)
+        # (resource index, per building amount) -> buildings producing it. Production is rounded per building,
+        # so buildings are grouped by amount rather than summed, this stays small however many are built
+        self.production_groups: dict[tuple[int, int], int] = {}
+        for building, count in self.iter_buildings():
+            self.add_building_totals(building, count)
         self.energy: float = energy
         self.base_energy_production: float = base_energy_production
-        self.events: list["Event"] = events
+        # Shared and read only, a plain event list is compiled into a schedule the first time
+        self.events: Event_Schedule = events if isinstance(events, Event_Schedule) else Event_Schedule(events)
         self.current_effects: list[tuple[Callable, int]] = []
         self.population_growth_factor: float = population_growth_factor
         self.temp_population_growth_factor: float = 0.0
         self.temp_energy_production_modifier: float = 1.0
         self.food_consumption_factor: float = 2.0
         self.has_lost = False
+        # Shared with every colony made from this one (see Colony_Wrapper.transition)
+        self.log: Null_Log | Simulation_Log = log
+        # Buildings added since begin_changes, None when no changes are being recorded
+        self.building_log: list[tuple["Building", int]] | None = None
         self.defense_capacity: float = self.calc_defense_capacity()
         #consider adding a population capacity somewhere
 
+    def iter_buildings(self) -> Iterator[tuple["Building", int]]:
+        for building, count in zip(self.building_registry.types, self.building_counts):
+            if count:
+                yield (building, count)
+
+    def total_buildings(self) -> int:
+        return sum(self.building_counts)
+
+    def add_building(self, building: "Building", count: int = 1) -> None:
+        self.building_counts[self.building_registry.index_of(building)] += count
+        self.add_building_totals(building, count)
+        if self.building_log is not None:
+            self.building_log.append((building, count))
+
+    def add_building_totals(self, building: "Building", count: int) -> None:
+        self.total_staff_needed += building.staff_needed * count
+        self.total_defense_strength += building.defense_strength * count
+        for resource, amount in building.production_amounts:
+            self.production_totals[resource] += amount * count
+            group_count = self.production_groups.get((resource, amount), 0) + count
+            if group_count:
+                self.production_groups[(resource, amount)] = group_count
+            else:
+                del self.production_groups[(resource, amount)] # only happens when a change is undone
+
+    def begin_changes(self) -> tuple:
+        # Saves everything colony actions and buildings can change, undo_changes puts it back.
+        # Cheaper than copying the colony when a change is only needed long enough to look at it
+        self.building_log = []
+        return (
+            self.food,
+            self.energy,
+            self.population,
+            self.base_defense_capacity,
+            self.base_food_production,
+            self.base_energy_production,
+            self.population_growth_factor,
+            self.power_modifier,
+            len(self.current_effects)
+        )
+
+    def undo_changes(self, saved: tuple) -> None:
+        building_log = self.building_log
+        self.building_log = None
+        for building, count in reversed(building_log or ()):
+            self.add_building(building, -count)
+        (
+            self.food,
+            self.energy,
+            self.population,
+            self.base_defense_capacity,
+            self.base_food_production,
+            self.base_energy_production,
+            self.population_growth_factor,
+            self.power_modifier,
+            effect_count
+        ) = saved
+        del self.current_effects[effect_count:]
+
     def calc_building_power_modifiers(self) -> None:
-        total_staff_needed = 0
-        for building in self.buildings:
-            total_staff_needed += building.staff_needed
-        if total_staff_needed == 0:
+        if self.total_staff_needed == 0:
             return # no buildings at all
-        fulfillment_ratio = min(1, self.population / total_staff_needed)
-        for building in self.buildings:
-            building.power_modifier = max(0, fulfillment_ratio)
+        fulfillment_ratio = min(1, self.population / self.total_staff_needed)
+        self.power_modifier = max(0, fulfillment_ratio)
         #There may be a minor bug in here somewhere
 
     def calc_defense_capacity(self) -> float:
-        if not self.buildings:
-            return self.base_defense_capacity
-        extra_defense = 0
-
-        for building in self.buildings:
-            if building.defense_strength == 0:
-                continue
-            extra_defense += building.defense_strength * building.power_modifier
-
-        return self.base_defense_capacity + extra_defense
+        return self.base_defense_capacity + self.total_defense_strength * self.power_modifier
     
     def run_building_effects(self) -> None:
-        if not self.buildings:
-            return        
-        for building in self.buildings:
-            building.tick_effect(self)
+        produced = [0] * len(PRODUCTION_ATTRIBUTES)
+        for (resource, amount), count in self.production_groups.items():
+            # rounded per building so that n buildings produce exactly what n separate buildings would
+            produced[resource] += round(amount * self.power_modifier) * count
+        for attribute, total in zip(PRODUCTION_ATTRIBUTES, produced):
+            if total:
+                setattr(self, attribute, getattr(self, attribute) + total)
 
     def run_events(self) -> None:
-        for event in self.events:
-            if not event.fire_dates:
-                continue
-            if self.current_day in event.fire_dates:
-                event.fire_event(self)
+        for event, stream in self.events.firings_on(self.current_day):
+            event.fire_event(self, stream.restart())
+            self.log.record(self.current_day, EVENT_FIRED, event.event_name)
     
     def apply_effects(self) -> None:
         continued_effects = []
@@ -93,7 +167,7 @@ class Colony:
             if duration > 0:
                 continued_effects.append((effect, duration))
             else:
-                print(f'Effect {effect.__name__} has expired')
+                self.log.record(self.current_day, EFFECT_EXPIRED, effect.__name__)
 
         self.current_effects = continued_effects
 
@@ -138,36 +212,50 @@ class Colony:
         self.population = max(0, self.population)
 
 
+# Colony actions live at module level so they can be recognised (and pickled) by identity,
+# get_colony_actions just bundles them up with their names and costs
+food_investment_cost = 50
+def invest_in_food_production(colony: "Colony") -> tuple[bool, str]:
+    colony.base_food_production *= 1.06
+    return (True, "Food production successfully invested in")
+
+energy_investment_cost = 50
+def invest_in_energy_production(colony: "Colony") -> tuple[bool, str]:
+    colony.base_energy_production *= 1.08
+    return (True, "Energy production successfully invested in")
+
+defense_investment_cost = 50
+def invest_in_defense(colony: "Colony") -> tuple[bool, str]:
+    colony.base_defense_capacity*=1.02
+    return (True, "Defense successfully invested in")
+
+population_investment_cost = 50
+def invest_in_population_increase(colony: "Colony") -> tuple[bool, str]:
+    colony.population_growth_factor *= 1.04
+    return (True, "Population increase successfully invested in")
+
+staff_recruitment_cost = 50
+def recruit_staff(colony: "Colony") -> tuple[bool, str]:
+    colony.population += 20
+    return (True, "Successfully recruited 10 new staff members")
+
+do_nothing_cost = 0 # lol
+def do_nothing(colony: "Colony"):
+    return (True, "Successfully did nothing")
+
+# What every colony action does as (attribute, factor, amount) steps, each one sets attribute to
+# attribute * factor + amount. Colony_Wrapper.delta_scores uses these to score children without running
+# the actions, so they have to be kept in line with the functions above (tests/test_wrapper.py checks they are)
+COLONY_ACTION_EFFECTS: dict[Callable, tuple[tuple[str, float, int], ...]] = {
+    invest_in_food_production: (("base_food_production", 1.06, 0),),
+    invest_in_energy_production: (("base_energy_production", 1.08, 0),),
+    invest_in_defense: (("base_defense_capacity", 1.02, 0),),
+    invest_in_population_increase: (("population_growth_factor", 1.04, 0),),
+    recruit_staff: (("population", 1, 20),),
+    do_nothing: ()
+}
+
 def get_colony_actions() -> list[tuple[str, Callable, int]]:
-    food_investment_cost = 50
-    def invest_in_food_production(colony: "Colony") -> tuple[bool, str]:
-        colony.base_food_production *= 1.06
-        return (True, "Food production successfully invested in")
-    
-    energy_investment_cost = 50
-    def invest_in_energy_production(colony: "Colony") -> tuple[bool, str]:
-        colony.base_energy_production *= 1.08
-        return (True, "Energy production successfully invested in")
-    
-    defense_investment_cost = 50
-    def invest_in_defense(colony: "Colony") -> tuple[bool, str]:
-        colony.base_defense_capacity*=1.02
-        return (True, "Defense successfully invested in")
-    
-    population_investment_cost = 50
-    def invest_in_population_increase(colony: "Colony") -> tuple[bool, str]:
-        colony.population_growth_factor *= 1.04
-        return (True, "Population increase successfully invested in")
-    
-    staff_recruitment_cost = 50
-    def recruit_staff(colony: "Colony") -> tuple[bool, str]:
-        colony.population += 20
-        return (True, "Successfully recruited 10 new staff members")
-    
-    do_nothing_cost = 0 # lol
-    def do_nothing(colony: "Colony"):
-        return (True, "Successfully did nothing")
-    
     return [
         ("invest in food production", invest_in_food_production, food_investment_cost),
         ("invest in energy production", invest_in_energy_production, energy_investment_cost),
@@ -176,4 +264,3 @@ def get_colony_actions() -> list[tuple[str, Callable, int]]:
         ("recruit staff", recruit_staff, staff_recruitment_cost),
         ("Do nothing", do_nothing, do_nothing_cost)
     ]
-
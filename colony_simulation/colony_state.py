@@ -0,0 +1,47 @@
+#Colonies as plain JSON-able dicts, so a colony can be sent to the planning service (planner_service.py)
+#Only what Colony_Wrapper.transition carries over to a child is kept, a decoded colony plans exactly like the
+#original would (running effects are dropped, transition drops them as well)
+from typing import Any
+from colony_simulation.colony import Colony
+from colony_simulation.building import Building_Registry
+from colony_simulation.event import Event_Schedule
+
+STATE_FIELDS = (
+    "current_day",
+    "food",
+    "energy",
+    "population",
+    "base_defense_capacity",
+    "base_food_production",
+    "base_energy_production",
+    "population_growth_factor"
+)
+
+def encode_colony(colony: Colony) -> dict[str, Any]:
+    state: dict[str, Any] = {field: getattr(colony, field) for field in STATE_FIELDS}
+    state["buildings"] = {building.building_name: count for building, count in colony.iter_buildings()}
+    return state
+
+def decode_colony(state: dict[str, Any], events: Event_Schedule, registry: Building_Registry) -> Colony:
+    # Raises ValueError for a missing field or a building the registry doesn't know
+    missing = [field for field in STATE_FIELDS if field not in state]
+    if missing:
+        raise ValueError(f"Colony state is missing {', '.join(missing)}")
+    building_counts = registry.empty_counts()
+    for building_name, count in state.get("buildings", {}).items():
+        building_counts[registry.index_of_name(building_name)] = int(count)
+    colony = Colony(
+        [],
+        events,
+        food=state["food"],
+        base_defense_capacity=state["base_defense_capacity"],
+        population=state["population"],
+        energy=state["energy"],
+        base_food_production=state["base_food_production"],
+        base_energy_production=state["base_energy_production"],
+        population_growth_factor=state["population_growth_factor"],
+        building_registry=registry,
+        building_counts=building_counts
+    )
+    colony.current_day = int(state["current_day"])
+    return colony
@@ -1,4 +1,4 @@
-from colony_simulation.building import Building
+from colony_simulation.building import Building, Building_Registry
 
 farm = Building("Farm", production={"food": 45})
 irrigator = Building("Irrigator", production={"food": 80}, building_cost=200, staff_needed=25)
@@ -18,4 +18,7 @@ ALL_BUILDINGS = [
     metropolitan_hub,
     military_academy,
     barracks
-]
\ No newline at end of file
+]
+
+# Shared, immutable set of building types that colony building counts are indexed by
+BUILDING_REGISTRY = Building_Registry(ALL_BUILDINGS)
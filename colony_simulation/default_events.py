@@ -1,22 +1,24 @@
 from typing import TYPE_CHECKING
-import random
 from colony_simulation.event import *
 if TYPE_CHECKING:
     from colony import Colony
 
+# Events are called as fire_event(colony, rng) and draw all of their random numbers from rng, the
+# Event_Stream for that day of the scenario (see Event_Schedule)
+
 # ===== POSITIVE EVENTS (Unchanged or slightly tweaked) =====
 
-def supply_drop_event_fire(colony: "Colony") -> None:
+def supply_drop_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """A supply ship arrives with resources"""
-    colony.food += random.randint(100, 200)
-    colony.energy += random.randint(30, 60)
+    colony.food += rng.randint(100, 200)
+    colony.energy += rng.randint(30, 60)
 
-def population_boom_event_fire(colony: "Colony") -> None:
+def population_boom_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Refugees or immigrants arrive"""
-    new_population = random.randint(15, 30)
+    new_population = rng.randint(15, 30)
     colony.population += new_population
 
-def discovery_event_fire(colony: "Colony") -> None:
+def discovery_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Scientists make a breakthrough"""
     def research_boost(colony: "Colony"):
         colony.temp_population_growth_factor += 0.02
@@ -24,33 +26,33 @@ def discovery_event_fire(colony: "Colony") -> None:
     colony.current_effects.append((research_boost, 5))
     colony.energy += 50
 
-def bountiful_harvest_event_fire(colony: "Colony") -> None:
+def bountiful_harvest_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Crops yield exceptionally well"""
-    colony.food += random.randint(150, 300)
+    colony.food += rng.randint(150, 300)
 
-def underground_discovery_event_fire(colony: "Colony") -> None:
+def underground_discovery_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     colony.base_energy_production += 5
 
-def strange_signal_event_fire(colony: "Colony") -> None:
+def strange_signal_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     # Neutral/Mixed
-    if random.random() > 0.5:
+    if rng.random() > 0.5:
         colony.energy += 50
     else:
         colony.energy -= 20
 
 # ===== NEGATIVE EVENTS (BUFFED FOR HARD MODE) =====
 
-def annihilate_colony_event_fire(colony: "Colony") -> None:
+def annihilate_colony_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     # severe late game check: -100 population
     # If you haven't scaled population > 100 by now, this ends the run.
     colony.population -= 100
 
-def cosmic_radiation_event_fire(colony: "Colony") -> None:
+def cosmic_radiation_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Radiation causes sickness"""
-    loss = random.randint(15, 25) # Buffed from 5-10
+    loss = rng.randint(15, 25) # Buffed from 5-10
     colony.population -= loss
 
-def dust_storm_event_fire(colony: "Colony") -> None:
+def dust_storm_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Reduces energy production and stores"""
     colony.energy -= 100 # Buffed from 30
     
@@ -60,30 +62,30 @@ def dust_storm_event_fire(colony: "Colony") -> None:
         
     colony.current_effects.append((storm_effect, 4)) # Lasts 4 days now
 
-def alien_invasion_event_fire(colony: "Colony") -> None:
+def alien_invasion_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Aliens attack resources and population"""
     # Massive damage
-    colony.population -= random.randint(30, 50)
-    colony.food -= random.randint(200, 400)
-    colony.energy -= random.randint(100, 200)
+    colony.population -= rng.randint(30, 50)
+    colony.food -= rng.randint(200, 400)
+    colony.energy -= rng.randint(100, 200)
     # Permanent defense damage
     colony.base_defense_capacity *= 0.8
 
-def alien_infection_event_fire(colony: "Colony") -> None:
+def alien_infection_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Disease spreads"""
-    colony.population -= random.randint(20, 40) # Buffed
+    colony.population -= rng.randint(20, 40) # Buffed
 
-def rocket_barrage_event(colony: "Colony") -> None:
+def rocket_barrage_event(colony: "Colony", rng: Event_Stream) -> None:
     """Bombardment"""
     # Scales hard: Damage is 50 unless defense is extremely high
     damage = max(10, 50 - int(colony.defense_capacity * 0.1)) 
     colony.population -= damage
     colony.base_defense_capacity *= 0.9
 
-def wildlife_encounter_event_fire(colony: "Colony") -> None:
+def wildlife_encounter_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     colony.food -= 50 # Buffed from 20
 
-def escalating_raids_event_fire(colony: "Colony") -> None:
+def escalating_raids_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     # Multiplier increased from 3 to 15.
     # Day 10 = 150 Str. Day 20 = 300 Str. Day 30 = 450 Str.
     raid_strength = colony.current_day * 15 
@@ -96,22 +98,22 @@ def escalating_raids_event_fire(colony: "Colony") -> None:
         colony.food -= int(damage * 2.0)
         colony.energy -= int(damage * 1.0)
 
-def resource_depletion_event_fire(colony: "Colony") -> None:
+def resource_depletion_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     colony.base_food_production -= 5 # Buffed from 2
 
 # ===== NEW HARD EVENTS =====
 
-def solar_flare_event_fire(colony: "Colony") -> None:
+def solar_flare_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Wipes out stored energy and harms electronics"""
     colony.energy = 0
     colony.base_energy_production -= 5
 
-def sabotage_event_fire(colony: "Colony") -> None:
+def sabotage_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Internal sabotage destroys defenses"""
     colony.base_defense_capacity -= 50
     colony.food -= 100
 
-def seismic_activity_event_fire(colony: "Colony") -> None:
+def seismic_activity_event_fire(colony: "Colony", rng: Event_Stream) -> None:
     """Earthquake damages infrastructure"""
     # Removes a building effectively by reducing base stats permanently
     # representing a collapsed building
@@ -121,7 +123,7 @@ def seismic_activity_event_fire(colony: "Colony") -> None:
 
 # ===== MASSIVE RAIDS (From your list) =====
 
-def massive_raid_one(colony: "Colony") -> None:
+def massive_raid_one(colony: "Colony", rng: Event_Stream) -> None:
     raid_strength = 200
     defense = colony.defense_capacity
     if defense < raid_strength:
@@ -130,7 +132,7 @@ def massive_raid_one(colony: "Colony") -> None:
         colony.food -= int(damage * 2)
         colony.energy -= int(damage * 0.7)
 
-def massive_raid_two(colony: "Colony") -> None:
+def massive_raid_two(colony: "Colony", rng: Event_Stream) -> None:
     raid_strength = 400
     defense = colony.defense_capacity
     if defense < raid_strength:
@@ -139,7 +141,7 @@ def massive_raid_two(colony: "Colony") -> None:
         colony.food -= int(damage * 2)
         colony.energy -= int(damage * 0.7)
 
-def massive_raid_three(colony: "Colony") -> None:
+def massive_raid_three(colony: "Colony", rng: Event_Stream) -> None:
     raid_strength = 600
     defense = colony.defense_capacity
     if defense < raid_strength:
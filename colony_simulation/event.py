@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 import random
 
 if TYPE_CHECKING:
@@ -28,4 +28,70 @@ class Event:
             return f"Event Name: {self.event_name} | Firing Dates: {self.fire_dates}"
         elif self.firing_likelihood:
             return f"Event Name: {self.event_name} | Firing Likelihood: {self.firing_likelihood} | Fire Count: {self.fire_count}"
-        return f"Event Name: {self.event_name}"
\ No newline at end of file
+        return f"Event Name: {self.event_name}"
+
+class Event_Stream:
+    """The random numbers an event gets when it fires on one day of one scenario.
+
+    Seeded from (scenario seed, day, event name) rather than the global RNG, so what an event draws does
+    not depend on anything that drew random numbers before it. Values are kept once drawn and handed out
+    again from the start every time the event fires, which makes a tick a pure function of the colony.
+    """
+    def __init__(self, seed: int, day: int, event_name: str):
+        self.key: str = f"{seed}:{day}:{event_name}"
+        self.values: list[float] = []
+        self.position: int = 0
+
+    def restart(self) -> "Event_Stream":
+        self.position = 0
+        return self
+
+    def random(self) -> float:
+        if self.position == len(self.values):
+            # drawn again from the key in blocks instead of keeping a Random (and its 2.5KB of state) per stream
+            rng = random.Random(self.key)
+            self.values = [rng.random() for _ in range(len(self.values) + 4)]
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+    def randint(self, a: int, b: int) -> int:
+        # inclusive on both ends like random.randint
+        return a + int(self.random() * (b - a + 1))
+
+class Event_Schedule:
+    """A scenario's events compiled once into a day -> events table.
+
+    Colonies only read from it, so every state in a search shares the same schedule
+    instead of copying the event list. seed keys the Event_Stream each event fires with.
+    """
+    def __init__(self, events: Iterable[Event], seed: int = 0):
+        self.events: tuple[Event, ...] = tuple(events)
+        self.seed: int = seed
+        by_day: dict[int, list[Event]] = {}
+        for event in self.events:
+            if not event.fire_dates:
+                continue
+            # an event fires at most once per day, in the order it appears in the event list
+            for day in sorted(set(event.fire_dates)):
+                by_day.setdefault(day, []).append(event)
+        self.by_day: dict[int, tuple[Event, ...]] = {day: tuple(day_events) for day, day_events in by_day.items()}
+        self.firings: dict[int, tuple[tuple[Event, Event_Stream], ...]] = {
+            day: tuple((event, Event_Stream(seed, day, event.event_name)) for event in day_events)
+            for day, day_events in self.by_day.items()
+        }
+
+    def events_on(self, day: int) -> tuple[Event, ...]:
+        return self.by_day.get(day, ())
+
+    def firings_on(self, day: int) -> tuple[tuple[Event, Event_Stream], ...]:
+        return self.firings.get(day, ())
+
+    def __iter__(self) -> Iterator[Event]:
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __repr__(self) -> str:
+        return f"Event Schedule: {len(self.events)} events over {len(self.by_day)} days | Seed: {self.seed}"
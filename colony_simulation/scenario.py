@@ -0,0 +1,185 @@
+#A scenario is the random part of a simulation, which days every event fires on, worked out once per seed
+#Scenario_Corpus caches them in memory and on disk so training and benchmarking don't rebuild the same seeds
+import copy
+import json
+import os
+import random
+from typing import Iterable, Sequence
+from colony_simulation.event import Event, Event_Schedule
+from colony_simulation.default_events import ALL_EVENTS
+
+def plan_event_dates(
+        events: Sequence[Event],
+        days: int,
+        rng: random.Random
+    ) -> tuple[list[tuple[int, tuple[int, ...], int]], int]:
+    """Works out when every event fires without touching the events themselves.
+
+    Returns (index into events, fire dates, fire count left) in event list order, plus how many
+    times rng.random() was called. Given the same rng state the dates are the same as the old
+    in place version of run.setup_events produced.
+    """
+    drawn_dates: list[tuple[int, ...]] = []
+    draws = 0
+    for event in events:
+        if not event.firing_likelihood:
+            continue
+        fire_dates = []
+        fire_count = event.fire_count
+        for day in range(1, days + 1):
+            draws += 1
+            if rng.random() <= event.firing_likelihood:
+                fire_dates.append(day)
+                fire_count -= 1
+                if fire_count <= 0:
+                    break
+        drawn_dates.append(tuple(fire_dates))
+    return plan_from_drawn_dates(events, drawn_dates), draws
+
+def plan_from_drawn_dates(
+        events: Sequence[Event],
+        drawn_dates: Sequence[tuple[int, ...]]
+    ) -> list[tuple[int, tuple[int, ...], int]]:
+    # Only events with a firing likelihood are random, drawn_dates holds their dates in event list order
+    planned: list[tuple[int, tuple[int, ...], int]] = []
+    drawn = iter(drawn_dates)
+    for index, event in enumerate(events):
+        if event.fire_dates:
+            planned.append((index, tuple(event.fire_dates), event.fire_count))
+        if event.firing_likelihood:
+            fire_dates = next(drawn)
+            planned.append((index, fire_dates, event.fire_count - len(fire_dates)))
+    return planned
+
+def make_events(events: Sequence[Event], planned: Iterable[tuple[int, tuple[int, ...], int]]) -> list[Event]:
+    # Fresh copies of the planned events with their fire dates filled in
+    event_list = []
+    for index, fire_dates, fire_count in planned:
+        event = copy.copy(events[index])
+        event.fire_dates = fire_dates
+        event.firing_likelihood = None
+        event.fire_count = fire_count
+        event_list.append(event)
+    return event_list
+
+class Scenario:
+    def __init__(
+            self,
+            seed: int,
+            days: int,
+            planned: tuple[tuple[int, tuple[int, ...], int], ...],
+            draws: int,
+            events: Sequence[Event]
+        ):
+        self.seed: int = seed
+        self.days: int = days
+        self.planned: tuple[tuple[int, tuple[int, ...], int], ...] = planned
+        # How many random() calls building this scenario takes, see Scenario_Corpus.seed_random
+        self.draws: int = draws
+        self._events: Sequence[Event] = events
+        self._schedule: Event_Schedule | None = None
+
+    @property
+    def schedule(self) -> Event_Schedule:
+        # Built the first time it is needed, colonies only ever read it so it is shared between runs
+        if self._schedule is None:
+            self._schedule = Event_Schedule(make_events(self._events, self.planned), self.seed)
+        return self._schedule
+
+    def __repr__(self) -> str:
+        return f"Scenario: seed {self.seed} | {len(self.planned)} events over {self.days} days"
+
+class Scenario_Corpus:
+    """Scenarios by seed for a fixed number of days and event list.
+
+    Each seed is built once and kept in memory. save/load keep the corpus in a JSON file, a file
+    written for different days or events is ignored so a stale corpus is never used.
+    """
+    def __init__(self, days: int = 31, events: Sequence[Event] = ALL_EVENTS, path: str | None = None):
+        self.days: int = days
+        self.events: tuple[Event, ...] = tuple(events)
+        self.path: str | None = path
+        self.scenarios: dict[int, Scenario] = {}
+        # seed -> encoded scenario straight from a loaded file, only decoded when first asked for
+        self.stored: dict[int, str] = {}
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def get(self, seed: int) -> Scenario:
+        scenario = self.scenarios.get(seed)
+        if scenario is not None:
+            return scenario
+        stored = self.stored.pop(seed, None)
+        if stored is not None:
+            planned, draws = self.decode(stored)
+        else:
+            planned, draws = plan_event_dates(self.events, self.days, random.Random(seed))
+        scenario = Scenario(seed, self.days, tuple(planned), draws, self.events)
+        self.scenarios[seed] = scenario
+        return scenario
+
+    def seed_random(self, seed: int) -> Scenario:
+        # Seeds the global RNG and moves it past the draws the scenario used, so the search that follows sees
+        # exactly the random numbers it would have after random.seed(seed) and run.setup_simulation
+        scenario = self.get(seed)
+        random.seed(seed)
+        for _ in range(scenario.draws):
+            random.random()
+        return scenario
+
+    def warm(self, seeds: Iterable[int]) -> None:
+        for seed in seeds:
+            self.get(seed)
+
+    def __contains__(self, seed: int) -> bool:
+        return seed in self.scenarios or seed in self.stored
+
+    def __len__(self) -> int:
+        return len(self.scenarios) + len(self.stored)
+
+    def signature(self) -> list:
+        return [
+            [event.event_name, list(event.fire_dates or ()), event.firing_likelihood, event.fire_count]
+            for event in self.events
+        ]
+
+    def encode(self, scenario: Scenario) -> str:
+        # "draws:dates|dates|..." with only the drawn dates of the random events, everything else comes from the events
+        drawn_dates = [
+            ".".join(map(str, dates))
+            for index, dates, _count in scenario.planned
+            if self.events[index].firing_likelihood
+        ]
+        return f"{scenario.draws}:{'|'.join(drawn_dates)}"
+
+    def decode(self, encoded: str) -> tuple[list[tuple[int, tuple[int, ...], int]], int]:
+        draws, drawn = encoded.split(":")
+        # with no random events at all there is nothing to split, one random event that never fired is still ""
+        groups = drawn.split("|") if any(event.firing_likelihood for event in self.events) else []
+        drawn_dates = [tuple(int(day) for day in dates.split(".") if day) for dates in groups]
+        return plan_from_drawn_dates(self.events, drawn_dates), int(draws)
+
+    def save(self, path: str | None = None) -> None:
+        path = path if path is not None else self.path
+        if path is None:
+            raise ValueError("No path given to save the scenario corpus to")
+        scenarios = {str(seed): stored for seed, stored in self.stored.items()}
+        for seed, scenario in self.scenarios.items():
+            scenarios[str(seed)] = self.encode(scenario)
+        data = {"days": self.days, "events": self.signature(), "scenarios": scenarios}
+        # written next to the target first so an interrupted save never leaves a broken corpus behind
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> int:
+        # Returns how many scenarios were loaded, 0 when the file was made for other days or events
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("days") != self.days or data.get("events") != self.signature():
+            return 0
+        for seed, stored in data["scenarios"].items():
+            if int(seed) not in self.scenarios:
+                self.stored[int(seed)] = stored
+        return len(data["scenarios"])
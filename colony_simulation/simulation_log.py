@@ -0,0 +1,58 @@
+#Where a colony reports what happens to it during a tick (events firing, effects running out)
+#Colonies share the log of the colony they were made from, by default that is NULL_LOG which throws
+#everything away, so the thousands of states a search ticks never do any I/O
+import json
+from dataclasses import dataclass, asdict
+from typing import IO
+
+EVENT_FIRED = "event_fired"
+EFFECT_EXPIRED = "effect_expired"
+
+@dataclass
+class Log_Record:
+    run: str
+    day: int
+    kind: str
+    name: str
+
+class Null_Log:
+    def record(self, day: int, kind: str, name: str) -> None:
+        return
+
+    def flush(self) -> None:
+        return
+
+NULL_LOG = Null_Log()
+
+class Simulation_Log:
+    """Buffered Log_Records for one run.
+
+    Records are kept in memory, with a path they are appended to it as JSON lines whenever buffer_size
+    of them have built up and on flush, otherwise they stay in records.
+    """
+    def __init__(self, run: str, path: str | None = None, buffer_size: int = 1000):
+        self.run: str = run
+        self.path: str | None = path
+        self.buffer_size: int = buffer_size
+        self.records: list[Log_Record] = []
+        self.written: int = 0
+
+    def record(self, day: int, kind: str, name: str) -> None:
+        self.records.append(Log_Record(self.run, day, kind, name))
+        if self.path is not None and len(self.records) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.path is None or not self.records:
+            return
+        with open(self.path, "a") as file:
+            self.write(file)
+        self.written += len(self.records)
+        self.records.clear()
+
+    def write(self, file: IO[str]) -> None:
+        for record in self.records:
+            file.write(json.dumps(asdict(record)) + "\n")
+
+    def __len__(self) -> int:
+        return self.written + len(self.records)
@@ -1,12 +1,23 @@
 #This class wraps a colony in a wrapper and makes it easier for the search algorithm to interact with
 import math
 import random
-from typing import Callable, TYPE_CHECKING
-from colony_simulation.colony import Colony, get_colony_actions
+from bisect import bisect_right
+from typing import Callable, Iterable, Sequence, TYPE_CHECKING
+from colony_simulation.colony import Colony, COLONY_ACTION_EFFECTS, get_colony_actions
 from colony_simulation.building import Building, get_building_actions
 
 if TYPE_CHECKING:
+    import numpy as np
     from run import Heuristic_Values
+    from profiling import Phase_Profiler
+    from colony_simulation.batch import Colony_Batch
+    from transposition import Transposition_Table
+
+# The colony fields an action can change that the heuristic or a transposition table key read
+DELTA_FIELDS = ("population", "population_growth_factor", "food", "energy", "base_food_production", "base_energy_production")
+# Fields actions change that neither of them read (a child's defense_capacity is worked out before its actions run)
+UNSCORED_FIELDS = ("base_defense_capacity",)
+ENERGY_FIELD = DELTA_FIELDS.index("energy")
 
 class Colony_Wrapper:
     def __init__(
@@ -20,18 +31,91 @@ class Colony_Wrapper:
         self.available_buildings: list["Building"] = available_buildings
         self.heuristic_values = heuristic_values
         self.actions_per_day: int = 3
-        self.actions_taken: int = 0
-    def get_actions(self, colony_state: Colony, available_energy: float) -> list[tuple[str, Callable, int]]:
-        colony_actions = [
-            action for action in get_colony_actions() 
-            if available_energy >= action[2] or action[2] == 0
-        ]
-        building_actions = [
-            action for action in get_building_actions(self.available_buildings) 
-            if available_energy >= action[2] or action[2] == 0
+        # When set, heuristic_dfs scores a uniform random sample of this many action combinations per expansion
+        self.max_combinations: int | None = None
+        # When set, heuristic_dfs scores all of a node's children at once with NumPy (see transition_batch)
+        self.batch_scoring: bool = False
+        # Cap (in keys) and bucket size of heuristic_dfs's transposition table, see transposition.py
+        self.transposition_size: int | None = None
+        self.transposition_resolution: float | None = None
+        # When set, default_dfs drops the states of expanded nodes and replays the final path to rebuild them
+        self.replay_paths: bool = False
+        # How many colonies beam_search keeps per day, and the temperature it draws them with (0 keeps the best)
+        self.beam_width: int = 8
+        self.beam_temperature: float = 1.0
+        # When set, mcts adds this times a child's heuristic to its UCT score, fading as it gets visited
+        self.mcts_prior_weight: float | None = None
+        # When set, the search algorithms time their phases into it (see profiling.py)
+        self.profiler: "Phase_Profiler | None" = None
+        # Where the searches draw their own random decisions from, the global random module unless a
+        # random.Random is set. Events never use it, they draw from their Event_Stream
+        self.rng = random
+        # When set, step keeps up to this many (colony, actions) -> next day results, see step
+        self.memo_size: int | None = None
+        self.step_memo: dict[tuple, Colony] = {}
+        self.memo_hits: int = 0
+        self.memo_misses: int = 0
+        self.build_action_table()
+
+    def build_action_table(self) -> None:
+        # The available actions never change during a run, so they are built once and sorted by cost.
+        # affordable_actions[n] is the first n actions of the table, which makes the actions affordable
+        # at a given energy level a bisect on the cost column followed by a lookup
+        self.action_table: tuple[tuple[str, Callable, int], ...] = tuple(sorted(
+            get_colony_actions() + get_building_actions(self.available_buildings),
+            key=lambda action: action[2]
+        ))
+        self.action_costs: list[int] = [cost for _name, _action, cost in self.action_table]
+        self.affordable_actions: list[tuple[tuple[str, Callable, int], ...]] = [
+            self.action_table[:n] for n in range(len(self.action_table) + 1)
         ]
-        actions = colony_actions + building_actions
-        random.shuffle(actions)
+        # Free actions are always allowed, even when energy has gone negative
+        self.free_action_count: int = bisect_right(self.action_costs, 0)
+        self.build_action_deltas()
+
+    def build_action_deltas(self) -> None:
+        # For every action table entry, how it changes the fields delta_scores tracks (DELTA_FIELDS): a
+        # Building when it builds one, otherwise (field index, factor, amount) steps. None when an action's
+        # effect is unknown, children are then scored by running the actions instead
+        self.action_deltas: list["Building | tuple[tuple[int, float, int], ...]"] | None = []
+        for _name, action, _cost in self.action_table:
+            building = getattr(action, "__self__", None)
+            if isinstance(building, Building) and action == building.build:
+                self.action_deltas.append(building)
+                continue
+            if action not in COLONY_ACTION_EFFECTS:
+                self.action_deltas = None
+                return
+            steps = []
+            for attribute, factor, amount in COLONY_ACTION_EFFECTS[action]:
+                if attribute in DELTA_FIELDS:
+                    steps.append((DELTA_FIELDS.index(attribute), factor, amount))
+                elif attribute not in UNSCORED_FIELDS:
+                    self.action_deltas = None
+                    return
+            self.action_deltas.append(tuple(steps))
+
+    def actions_at(self, indices: Sequence[int]) -> list[tuple[str, Callable, int]]:
+        return [self.action_table[i] for i in indices]
+
+    def describe_actions(self, indices: Sequence[int] | None) -> tuple[tuple[str, int], ...] | None:
+        # Search nodes only keep action table indices, this gives the (name, cost) pairs to show for them
+        if indices is None:
+            return None
+        return tuple((self.action_table[i][0], self.action_table[i][2]) for i in indices)
+
+    def get_actions(
+            self,
+            colony_state: Colony,
+            available_energy: float,
+            shuffle: bool = False
+        ) -> Sequence[tuple[str, Callable, int]]:
+        # Returns the shared, cost sorted actions, only copy when the caller asks for a random order
+        affordable_count = max(self.free_action_count, bisect_right(self.action_costs, available_energy))
+        actions = self.affordable_actions[affordable_count]
+        if shuffle:
+            actions = list(actions)
+            self.rng.shuffle(actions)
         return actions
     def transition(
             self, 
@@ -39,27 +123,168 @@ class Colony_Wrapper:
             action_list: list[tuple[str, Callable, int]]
         ) -> Colony:
         new_state: Colony = Colony(
-            [b.clone() for b in colony_state.buildings], 
-            colony_state.events[:], 
+            [],
+            colony_state.events,
             food=colony_state.food,
             base_defense_capacity=colony_state.base_defense_capacity,
             population=colony_state.population,
             energy=colony_state.energy,
             base_food_production=colony_state.base_food_production,
             base_energy_production=colony_state.base_energy_production,
-            population_growth_factor=colony_state.population_growth_factor
+            population_growth_factor=colony_state.population_growth_factor,
+            building_registry=colony_state.building_registry,
+            building_counts=colony_state.building_counts,
+            log=colony_state.log
         )
         new_state.current_day = colony_state.current_day
+        self.run_actions(new_state, action_list)
+
+        return new_state
+
+    def run_actions(self, colony_state: Colony, action_list: Sequence[tuple[str, Callable, int]]) -> None:
         for _name, action, cost in action_list:
-            action(new_state)
-            new_state.energy -= cost
+            action(colony_state)
+            colony_state.energy -= cost
 
-        new_state.calc_building_power_modifiers()
+        colony_state.calc_building_power_modifiers()
 
-        return new_state
+    def apply(self, colony_state: Colony, action_list: Sequence[tuple[str, Callable, int]]) -> tuple:
+        # In place version of transition for a colony that came out of transition(parent, []): afterwards it
+        # matches transition(parent, action_list) until undo is called with the returned log
+        undo_log = colony_state.begin_changes()
+        self.run_actions(colony_state, action_list)
+        return undo_log
+
+    def undo(self, colony_state: Colony, undo_log: tuple) -> None:
+        colony_state.undo_changes(undo_log)
+
+    def delta_scores(
+            self,
+            colony_state: Colony,
+            combinations: Iterable[Sequence[int]],
+            seen: "Transposition_Table"
+        ) -> list[tuple[float, tuple[int, ...]]]:
+        # (heuristic, combination) for the child transition(colony_state, combination) would make, for every
+        # combination of action_table indices whose child's key is not in seen. No child is
+        # built: only the fields in DELTA_FIELDS and the building totals are worked out, step by step in the
+        # same order run_actions goes, so the scores and keys are exactly those of the real children.
+        # Needs action_deltas to be set
+        deltas = self.action_deltas
+        costs = self.action_costs
+        registry = colony_state.building_registry
+        parent_fields = [getattr(colony_state, field) for field in DELTA_FIELDS]
+        parent_counts = colony_state.building_counts
+        parent_totals = colony_state.production_totals
+        # a child's defense capacity is set when it is made, before its actions run
+        defense_capacity = colony_state.base_defense_capacity + colony_state.total_defense_strength * 1.0
+        current_day = colony_state.current_day
+        food_consumption_factor = colony_state.food_consumption_factor
+        if seen:
+            # children only add buildings, so their hash is the parent's plus the hash of every building added
+            building_hashes = seen.building_hashes
+            parent_hash = seen.counts_hash(parent_counts)
+
+        scored: list[tuple[float, tuple[int, ...]]] = []
+        for combination in combinations:
+            fields = parent_fields.copy()
+            staff_needed = colony_state.total_staff_needed
+            defense_strength = colony_state.total_defense_strength
+            totals = parent_totals
+            built: list[Building] = []
+            for i in combination:
+                delta = deltas[i]
+                if type(delta) is tuple:
+                    for field, factor, amount in delta:
+                        fields[field] = fields[field] * factor + amount
+                elif fields[ENERGY_FIELD] >= delta.building_cost: # same check as Building.build
+                    if not built:
+                        totals = list(parent_totals)
+                    built.append(delta)
+                    staff_needed += delta.staff_needed
+                    defense_strength += delta.defense_strength
+                    for resource, amount in delta.production_amounts:
+                        totals[resource] += amount
+                fields[ENERGY_FIELD] -= costs[i]
+
+            population, growth_factor, food, energy, base_food_production, base_energy_production = fields
+            if seen:
+                counts_hash = parent_hash
+                for building in built:
+                    counts_hash += building_hashes[registry.index_of(building)]
+                if seen.make_key(current_day, population, food, energy, defense_capacity, counts_hash) in seen:
+                    continue
+            scored.append((self.heuristic_fields(
+                population,
+                growth_factor,
+                food,
+                energy,
+                base_food_production,
+                base_energy_production,
+                defense_capacity,
+                food_consumption_factor,
+                staff_needed,
+                totals,
+                defense_strength
+            ), tuple(combination)))
+        return scored
     
+    def transition_batch(self, colony_state: Colony, combinations: Sequence[Sequence[int]]) -> "Colony_Batch":
+        # Every child of colony_state at once, one row per combination of action_table indices.
+        # Rows match transition(colony_state, combination) exactly, but no Colony objects are created
+        import numpy as np
+        from colony_simulation.batch import Colony_Batch
+
+        # transition(state, []) gives the shared starting point for every child (fresh temporaries,
+        # defense capacity computed before any action runs), the actions are then applied row by row
+        children = Colony_Batch(self.transition(colony_state, []), self.action_table, len(combinations))
+        combination_matrix = np.array(combinations, dtype=np.int64)
+        if combination_matrix.ndim != 2:
+            combination_matrix = combination_matrix.reshape(len(combinations), 0)
+        children.apply_combinations(combination_matrix)
+        return children
+
+    def heuristic_batch(self, children: "Colony_Batch") -> "np.ndarray":
+        # heuristic for every row of a batch, the scores are identical to calling heuristic on each child
+        from colony_simulation.batch import batch_heuristic
+        return batch_heuristic(children, self.heuristic_values)
+
     def run_tick(self, state : Colony):
         state.tick_step()
+
+    def transition_key(self, colony_state: Colony) -> tuple:
+        # Everything transition carries over to the child, so two colonies with the same key have the same future
+        return (
+            colony_state.current_day,
+            colony_state.food,
+            colony_state.energy,
+            colony_state.population,
+            colony_state.base_defense_capacity,
+            colony_state.base_food_production,
+            colony_state.base_energy_production,
+            colony_state.population_growth_factor,
+            tuple(colony_state.building_counts)
+        )
+
+    def step(self, colony_state: Colony, action_indices: tuple[int, ...]) -> Colony:
+        # transition with action_table[i] for every index, followed by a tick. Events draw from streams keyed
+        # by the scenario and day, so the result only depends on the colony and the actions. With memo_size
+        # set it is remembered and the same Colony is handed out again, callers must not change it
+        if not self.memo_size:
+            new_state = self.transition(colony_state, self.actions_at(action_indices))
+            self.run_tick(new_state)
+            return new_state
+        key = (self.transition_key(colony_state), action_indices)
+        new_state = self.step_memo.get(key)
+        if new_state is not None:
+            self.memo_hits += 1
+            return new_state
+        self.memo_misses += 1
+        new_state = self.transition(colony_state, self.actions_at(action_indices))
+        self.run_tick(new_state)
+        if len(self.step_memo) >= self.memo_size:
+            del self.step_memo[next(iter(self.step_memo))] # dicts keep insertion order, so this is the oldest
+        self.step_memo[key] = new_state
+        return new_state
     
     def goal_test(self, colony_state: Colony) -> bool:
         return (colony_state.current_day > self.goal_day)
@@ -71,26 +296,51 @@ class Colony_Wrapper:
         return 1.0
     
     def heuristic(self, colony_state: Colony) -> float:
+        return self.heuristic_fields(
+            colony_state.population,
+            colony_state.population_growth_factor + colony_state.temp_population_growth_factor,
+            colony_state.food,
+            colony_state.energy,
+            colony_state.base_food_production,
+            colony_state.base_energy_production,
+            colony_state.defense_capacity,
+            colony_state.food_consumption_factor,
+            colony_state.total_staff_needed,
+            colony_state.production_totals,
+            colony_state.total_defense_strength
+        )
 
-        def get_production_value(building: "Building", resource: str) -> int:
-            return building.production.get(resource, 0)
-        if colony_state.check_loss():
+    def heuristic_fields(
+            self,
+            population: int,
+            growth_factor: float,
+            food: float,
+            energy: float,
+            base_food_production: float,
+            base_energy_production: float,
+            defense_capacity: float,
+            food_consumption_factor: float,
+            total_staff_needed: int,
+            production_totals: Sequence[int],
+            total_defense_strength: int
+        ) -> float:
+        # The heuristic from the colony fields it reads, so delta_scores can score a child it never builds
+        if population <= 0:
             return -1e6
+        values = self.heuristic_values
 
 
-        growth = colony_state.population * (colony_state.population_growth_factor + colony_state.temp_population_growth_factor)
+        growth = population * growth_factor
         if growth >= 0:
             growth = max(2, math.ceil(growth))
         else:
             growth = min(-2, math.floor(growth))
         
-        if colony_state.food <= 0:
-            growth -= max(10, math.ceil(colony_state.population // 10))
-
-        expected_pop = colony_state.population + growth
+        if food <= 0:
+            growth -= max(10, math.ceil(population // 10))
 
+        expected_pop = population + growth
 
-        total_staff_needed = sum(b.staff_needed for b in colony_state.buildings)
         
         if total_staff_needed > 0:
             projected_efficiency = min(1.0, expected_pop / total_staff_needed)
@@ -98,43 +348,35 @@ class Colony_Wrapper:
             projected_efficiency = 1.0
 
 
-        building_food_prod = 0.0
-        building_energy_prod = 0.0
-        building_population_prod = 0.0
-        building_defense_prod = 0.0
-        building_extra_defense = 0.0
-
-        if colony_state.buildings:
-            for building in colony_state.buildings:
-                building_food_prod += get_production_value(building, 'food') * projected_efficiency
-                building_energy_prod += get_production_value(building, 'energy') * projected_efficiency
-                building_population_prod += get_production_value(building, 'population') * projected_efficiency
-                building_defense_prod += get_production_value(building, 'defense') * projected_efficiency
-                if building.defense_strength:
-                    building_extra_defense += building.defense_strength
+        food_total, energy_total, population_total, defense_total = production_totals
+        building_food_prod = food_total * projected_efficiency
+        building_energy_prod = energy_total * projected_efficiency
+        building_population_prod = population_total * projected_efficiency
+        building_defense_prod = defense_total * projected_efficiency
+        building_extra_defense = total_defense_strength
                 
 
-        food_target = max(self.heuristic_values.food_target_base, colony_state.population * (colony_state.food_consumption_factor + 0.5))
-        effective_food = colony_state.food + colony_state.base_food_production + building_food_prod
+        food_target = max(values.food_target_base, population * (food_consumption_factor + 0.5))
+        effective_food = food + base_food_production + building_food_prod
         food_score = effective_food / food_target
 
-        energy_prod_target = self.heuristic_values.energy_prod_target
-        effective_energy_prod = colony_state.energy + colony_state.base_energy_production + building_energy_prod
+        energy_prod_target = values.energy_prod_target
+        effective_energy_prod = energy + base_energy_production + building_energy_prod
         energy_score = effective_energy_prod / energy_prod_target
 
-        defense_target = self.heuristic_values.defense_target
-        effective_defense = colony_state.defense_capacity + building_defense_prod + building_extra_defense
+        defense_target = values.defense_target
+        effective_defense = defense_capacity + building_defense_prod + building_extra_defense
         defense_score = effective_defense / defense_target
 
-        population_target = self.heuristic_values.population_target
+        population_target = values.population_target
         effective_population = expected_pop + building_population_prod
         population_score =  effective_population / population_target
 
         # Weighted combination (weights chosen to reflect relative importance)
-        w_food = self.heuristic_values.w_food
-        w_energy = self.heuristic_values.w_energy
-        w_defense = self.heuristic_values.w_defense
-        w_population = self.heuristic_values.w_population
+        w_food = values.w_food
+        w_energy = values.w_energy
+        w_defense = values.w_defense
+        w_population = values.w_population
 
         total_weight = w_food + w_energy + w_defense + w_population
 
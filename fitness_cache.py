@@ -0,0 +1,69 @@
+#Stores the result of evaluating an agent on a seed so train.py never runs the same evaluation twice
+#Evaluations are deterministic (evaluate_seed seeds the RNG itself), so a cached result is exactly what a re-run would give
+import hashlib
+import sqlite3
+from dataclasses import fields
+from typing import TYPE_CHECKING, Iterable
+if TYPE_CHECKING:
+    from run import Heuristic_Values
+
+# Algorithms that never look at the heuristic weights, their results only depend on the seed and budget
+HEURISTIC_FREE_ALGORITHMS = ("default_dfs",)
+
+def agent_hash(agent: "Heuristic_Values") -> str:
+    # repr keeps every bit of the floats, so two agents only share a hash if all their values are equal
+    description = "|".join(f"{field.name}={getattr(agent, field.name)!r}" for field in fields(agent))
+    return hashlib.sha1(description.encode()).hexdigest()
+
+def fitness_key(agent: "Heuristic_Values", seed: int, algorithm: str, node_budget: int) -> tuple[str, int, str, int]:
+    agent_part = "-" if algorithm in HEURISTIC_FREE_ALGORITHMS else agent_hash(agent)
+    return (agent_part, seed, algorithm, node_budget)
+
+class Fitness_Cache:
+    """(agent hash, seed, algorithm, node budget) -> (success, path length), kept in SQLite.
+
+    With no path the cache only lives for this process. Results depend on the simulation code as well,
+    so delete the file after changing the simulation or the search.
+    """
+    def __init__(self, path: str | None = None):
+        self.path: str | None = path
+        self.connection = sqlite3.connect(path if path is not None else ":memory:")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS fitness (
+                agent_hash TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                node_budget INTEGER NOT NULL,
+                success INTEGER NOT NULL,
+                path_length INTEGER NOT NULL,
+                PRIMARY KEY (agent_hash, seed, algorithm, node_budget)
+            )"""
+        )
+        self.connection.commit()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: tuple[str, int, str, int]) -> tuple[bool, int] | None:
+        row = self.connection.execute(
+            "SELECT success, path_length FROM fitness WHERE agent_hash = ? AND seed = ? AND algorithm = ? AND node_budget = ?",
+            key
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (bool(row[0]), row[1])
+
+    def put_many(self, items: Iterable[tuple[tuple[str, int, str, int], tuple[bool, int]]]) -> None:
+        # Committed straight away so an interrupted run keeps everything finished so far
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?, ?, ?)",
+            [(*key, int(success), path_length) for key, (success, path_length) in items]
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM fitness").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
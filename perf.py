@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+#Microbenchmarks for the simulation hot paths, unlike benchmark.py this measures raw engine speed rather than win rates
+#Results can be written to JSON and compared against a saved baseline, the script exits with 1 on a regression
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable
+
+from search import heuristic_dfs, default_dfs, get_unique_combinations
+from colony_simulation.colony import Colony
+from colony_simulation.wrapper import Colony_Wrapper
+from run import setup_simulation, make_heuristic_values
+
+# Fixed so every run of the suite times exactly the same work
+SCENARIO_SEEDS = (11, 22, 33)
+GOAL_DAYS = 31
+SEARCH_NODE_LIMIT = 300
+
+@dataclass
+class Perf_Result:
+    name: str
+    ops: int
+    seconds: float
+    ops_per_sec: float
+
+def make_wrapper(seed: int, actions_per_day: int) -> Colony_Wrapper:
+    random.seed(seed)
+    colony, buildings = setup_simulation(GOAL_DAYS, seed=seed)
+    wrapper = Colony_Wrapper(colony, buildings, make_heuristic_values())
+    wrapper.actions_per_day = actions_per_day
+    wrapper.goal_day = GOAL_DAYS
+    return wrapper
+
+def sample_states(actions_per_day: int) -> tuple[Colony_Wrapper, list[Colony]]:
+    # Realistic colonies from every day of a fixed default_dfs run (before their tick) for each scenario seed
+    states: list[Colony] = []
+    wrapper = None
+    for seed in SCENARIO_SEEDS:
+        wrapper = make_wrapper(seed, actions_per_day)
+        random.seed(seed)
+        path, _stats = default_dfs(wrapper, node_expansions_allowed=SEARCH_NODE_LIMIT)
+        states.extend(node.state for node in path)
+    return wrapper, states
+
+def sample_combinations(wrapper: Colony_Wrapper, states: list[Colony]) -> list[tuple[Colony, list]]:
+    # One random affordable combination per state, drawn with a fixed seed
+    rng_state = random.getstate()
+    random.seed(0)
+    pairs = []
+    for state in states:
+        combinations = list(get_unique_combinations(wrapper.get_actions(state, state.energy), wrapper.actions_per_day, state.energy))
+        pairs.append((state, list(random.choice(combinations))))
+    random.setstate(rng_state)
+    return pairs
+
+def time_operation(name: str, operation: Callable[[], tuple[int, float]], repeats: int, min_time: float) -> Perf_Result:
+    # operation does some work and returns (ops done, seconds spent on them), so setup it needs is not counted.
+    # Each repeat calls it until min_time has been timed, the best repeat is kept since slower ones are the
+    # machine getting in the way
+    best: Perf_Result | None = None
+    for _ in range(repeats):
+        ops = 0
+        seconds = 0.0
+        while seconds < min_time:
+            done, elapsed = operation()
+            ops += done
+            seconds += elapsed
+        result = Perf_Result(name, ops, seconds, ops / seconds)
+        if best is None or result.ops_per_sec > best.ops_per_sec:
+            best = result
+    return best
+
+def build_suite(actions_per_day: int) -> dict[str, Callable[[], tuple[int, float]]]:
+    wrapper, states = sample_states(actions_per_day)
+    pairs = sample_combinations(wrapper, states)
+    clock = time.perf_counter
+
+    def tick_step() -> tuple[int, float]:
+        # tick_step changes the colony, so it runs on fresh copies which are made outside the timing
+        copies = [wrapper.transition(state, []) for state in states]
+        start = clock()
+        for colony in copies:
+            colony.tick_step()
+        return len(copies), clock() - start
+
+    def transition() -> tuple[int, float]:
+        start = clock()
+        for state, actions in pairs:
+            wrapper.transition(state, actions)
+        return len(pairs), clock() - start
+
+    def heuristic() -> tuple[int, float]:
+        start = clock()
+        for state in states:
+            wrapper.heuristic(state)
+        return len(states), clock() - start
+
+    def unique_combinations() -> tuple[int, float]:
+        count = 0
+        start = clock()
+        for state in states:
+            for _combination in get_unique_combinations(wrapper.get_actions(state, state.energy), actions_per_day, state.energy):
+                count += 1
+        return count, clock() - start
+
+    def search_runs(algorithm: Callable) -> Callable[[], tuple[int, float]]:
+        def run() -> tuple[int, float]:
+            elapsed = 0.0
+            for seed in SCENARIO_SEEDS:
+                search_wrapper = make_wrapper(seed, actions_per_day)
+                random.seed(seed)
+                start = clock()
+                algorithm(search_wrapper, node_expansions_allowed=SEARCH_NODE_LIMIT)
+                elapsed += clock() - start
+            return len(SCENARIO_SEEDS), elapsed
+        return run
+
+    return {
+        "colony.tick_step": tick_step,
+        "wrapper.transition": transition,
+        "wrapper.heuristic": heuristic,
+        "search.get_unique_combinations": unique_combinations,
+        "search.default_dfs": search_runs(default_dfs),
+        "search.heuristic_dfs": search_runs(heuristic_dfs),
+    }
+
+def compare_to_baseline(results: list[Perf_Result], baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    baseline_results = baseline.get("results", {})
+    print(f"\n{'Benchmark':<32} | {'Baseline ops/s':>14} | {'Current ops/s':>14} | {'Change':>8}")
+    print("-" * 78)
+    for result in results:
+        if result.name not in baseline_results:
+            print(f"{result.name:<32} | {'-':>14} | {result.ops_per_sec:>14.1f} | {'new':>8}")
+            continue
+        baseline_ops = baseline_results[result.name]["ops_per_sec"]
+        change = (result.ops_per_sec - baseline_ops) / baseline_ops * 100
+        flag = ""
+        if change < -max_regression:
+            flag = "  REGRESSION"
+            failures.append(f"{result.name}: {change:+.1f}% (allowed -{max_regression:.1f}%)")
+        print(f"{result.name:<32} | {baseline_ops:>14.1f} | {result.ops_per_sec:>14.1f} | {change:>+7.1f}%{flag}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the simulation hot paths and optionally gate on a saved baseline.")
+    parser.add_argument('--output', '-o', type=str, required=False, help="Write the results to this JSON file (use it as a later --baseline).")
+    parser.add_argument('--baseline', '-b', type=str, required=False, help="JSON file from an earlier --output run to compare against.")
+    parser.add_argument('--max-regression', '--mr', type=float, default=10.0, help="Fail when a benchmark's ops/sec drops by more than this percentage against the baseline.")
+    parser.add_argument('--repeats', '-r', type=int, default=5, help="Times each benchmark is repeated, the best one is reported.")
+    parser.add_argument('--min-time', '--mt', type=float, default=0.2, help="Minimum seconds spent in each repeat.")
+    parser.add_argument('--actions-per-day', '--apd', type=int, default=3)
+    parser.add_argument('--only', type=str, nargs='+', required=False, help="Only run the benchmarks with these names.")
+
+    args = parser.parse_args()
+
+    suite = build_suite(args.actions_per_day)
+    if args.only:
+        suite = {name: operation for name, operation in suite.items() if name in args.only}
+
+    results: list[Perf_Result] = []
+    print(f"{'Benchmark':<32} | {'Ops':>9} | {'Seconds':>8} | {'Ops/sec':>12}")
+    print("-" * 70)
+    for name, operation in suite.items():
+        result = time_operation(name, operation, args.repeats, args.min_time)
+        results.append(result)
+        print(f"{result.name:<32} | {result.ops:>9} | {result.seconds:>8.3f} | {result.ops_per_sec:>12.1f}")
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "actions_per_day": args.actions_per_day,
+            "results": {result.name: asdict(result) for result in results},
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("actions_per_day", args.actions_per_day) != args.actions_per_day:
+            print(f"Warning: baseline was recorded with --apd {baseline['actions_per_day']}")
+        failures = compare_to_baseline(results, baseline, args.max_regression)
+        if failures:
+            print("\nThroughput regressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nNo benchmark regressed by more than {args.max_regression:.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#Plays whole games against a running planner_service.py, asking it for every day's actions
+#Each game keeps its own colony and connection, applies the actions it gets back and sends the next day's
+#colony, so the service sees a realistic stream of requests from several clients at once
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict
+from typing import Any
+
+from colony_simulation.wrapper import Colony_Wrapper
+from colony_simulation.colony_state import encode_colony
+from colony_simulation.scenario import Scenario_Corpus
+from run import setup_simulation, make_heuristic_values, read_heuristic_weights
+from planner_service import DEFAULT_HOST, DEFAULT_PORT, GOAL_DAYS, PLANNERS, Latency_Stats
+
+SCENARIOS = Scenario_Corpus(GOAL_DAYS)
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: dict[str, Any]) -> dict[str, Any]:
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("The planning service closed the connection")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise RuntimeError(f"Planning service error: {response['error']}")
+    return response
+
+async def play_game(host: str, port: int, seed: int, request: dict[str, Any], latency: Latency_Stats) -> tuple[bool, int]:
+    # Returns whether the colony reached the goal and the last day it got to
+    colony, buildings = setup_simulation(GOAL_DAYS, SCENARIOS.get(seed))
+    # only used to apply the service's actions locally, its action table matches the service's
+    wrapper = Colony_Wrapper(colony, buildings, make_heuristic_values())
+    wrapper.goal_day = GOAL_DAYS
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        state = colony
+        while not wrapper.goal_test(state) and not wrapper.fail_test(state):
+            start = time.perf_counter()
+            response = await send(reader, writer, {**request, "id": f"{seed}-{state.current_day}", "seed": seed, "state": encode_colony(state)})
+            latency.record(time.perf_counter() - start)
+            state = wrapper.step(state, tuple(index for index, _name, _cost in response["actions"]))
+        return wrapper.goal_test(state), state.current_day
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def run_games(args: argparse.Namespace, seeds: list[int]) -> None:
+    request: dict[str, Any] = {
+        "op": "plan",
+        "algorithm": args.algorithm,
+        "node_expansions_allowed": args.node_expansions_allowed,
+        "actions_per_day": args.actions_per_day,
+        "time_limit": args.time_limit
+    }
+    if args.weight_file:
+        request["weights"] = asdict(read_heuristic_weights(args.weight_file))
+    latency = Latency_Stats()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play_game(args.host, args.port, seed, request, latency) for seed in seeds))
+    elapsed = time.perf_counter() - start
+
+    for seed, (won, day) in zip(seeds, results):
+        print(f"Seed {seed}: {'won' if won else f'lost on day {day}'}")
+    wins = sum(won for won, _day in results)
+    print(f"Won {wins}/{len(seeds)} games with {latency.requests} plans in {elapsed:.2f}s")
+    print("Round trip latency:")
+    print(latency.report(args.algorithm))
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    stats = await send(reader, writer, {"op": "stats"})
+    writer.close()
+    await writer.wait_closed()
+    print(f"Service latency ({stats['workers']} workers):")
+    for name, summary in stats["latency"].items():
+        print(f"{name:<16} | {summary['requests']:>8} requests | p50 {summary['p50_ms']:>9.2f} ms | p90 {summary['p90_ms']:>9.2f} ms | p99 {summary['p99_ms']:>9.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games with plans from a running planning service.")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help="Address the service listens on.")
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT, help="Port the service listens on.")
+    parser.add_argument('--seed', '--s', type=int, required=False, help="Scenario seed of the first game, the others use the following seeds. Random if left out.")
+    parser.add_argument('--games', '-g', type=int, default=4, help="How many games are played at once, each over its own connection.")
+    parser.add_argument('--algorithm', '--algo', type=str, choices=PLANNERS.keys(), default="heuristic_dfs", help="Search the service plans with.")
+    parser.add_argument('--node-expansions-allowed', '--nea', type=int, default=500, help="Node budget of every plan.")
+    parser.add_argument('--actions-per-day', '--apd', type=int, default=3)
+    parser.add_argument('--time-limit', '--tl', type=float, required=False, help="Milliseconds every plan may take, on top of the node budget.")
+    parser.add_argument('--weight-file', '--wf', type=str, required=False, help="Path to a file containing heuristic weights to plan with.")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(10000000)
+    asyncio.run(run_games(args, [seed + game for game in range(args.games)]))
+
+if __name__ == "__main__":
+    main()
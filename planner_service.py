@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+#Long running planning service, so asking for a plan doesn't cost a fresh run.py process every time
+#Clients send one JSON request per line over a local TCP socket and get one JSON response per line back,
+#the searches run in a pool of worker processes that keep their scenarios and action tables between requests
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Any
+
+from search import path_actions
+from colony_simulation.wrapper import Colony_Wrapper
+from colony_simulation.default_buildings import BUILDING_REGISTRY
+from colony_simulation.colony_state import decode_colony
+from colony_simulation.scenario import Scenario_Corpus
+from run import setup_simulation, make_heuristic_values, Heuristic_Values, algorithms
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_ACTIONS_PER_DAY = 6
+GOAL_DAYS = 31
+# Wrappers kept per worker, one per (scenario seed, days)
+WRAPPER_CACHE_SIZE = 64
+# How many of the latest requests the latency percentiles cover
+LATENCY_WINDOW = 10000
+
+PLANNERS = {name: algorithm for name, algorithm in algorithms.items() if name != "percentage_fuzzing"}
+
+# Request fields copied onto the wrapper, with the value used when a request leaves them out
+WRAPPER_OPTIONS = {
+    "max_combinations": None,
+    "batch_scoring": False,
+    "transposition_size": None,
+    "transposition_resolution": None,
+    "beam_width": 8,
+    "beam_temperature": 1.0,
+    "mcts_prior_weight": None
+}
+
+# Worker process state, filled in by load_worker and plan_request
+SCENARIOS: dict[int, Scenario_Corpus] = {}
+SCENARIO_FILE: str | None = None
+WRAPPERS: OrderedDict[tuple[int, int], Colony_Wrapper] = OrderedDict()
+
+def load_worker(scenario_file: str | None) -> None:
+    # The worker initializer, every worker starts from the saved corpus
+    global SCENARIO_FILE
+    SCENARIO_FILE = scenario_file
+    # Ctrl-C reaches the whole process group, only the service itself should react to it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_corpus(GOAL_DAYS)
+
+def get_corpus(days: int) -> Scenario_Corpus:
+    corpus = SCENARIOS.get(days)
+    if corpus is None:
+        # a corpus file written for other days is ignored by Scenario_Corpus
+        corpus = Scenario_Corpus(days, path=SCENARIO_FILE)
+        SCENARIOS[days] = corpus
+    return corpus
+
+def get_wrapper(seed: int, days: int) -> Colony_Wrapper:
+    # Building a wrapper builds its action table, so they are kept and only their settings change per request
+    key = (seed, days)
+    wrapper = WRAPPERS.get(key)
+    if wrapper is not None:
+        WRAPPERS.move_to_end(key)
+        return wrapper
+    colony, buildings = setup_simulation(days, get_corpus(days).get(seed))
+    wrapper = Colony_Wrapper(colony, buildings, make_heuristic_values())
+    wrapper.goal_day = days
+    if len(WRAPPERS) >= WRAPPER_CACHE_SIZE:
+        WRAPPERS.popitem(last=False)
+    WRAPPERS[key] = wrapper
+    return wrapper
+
+def warm_worker(seed: int) -> int:
+    # Submitted once per worker at startup so the first real requests don't pay for process start up
+    get_wrapper(seed, GOAL_DAYS)
+    return os.getpid()
+
+def plan_request(request: dict[str, Any]) -> dict[str, Any]:
+    """Runs one "plan" request in a worker and returns the fields of its response.
+
+    The search starts from the colony in request["state"] (see colony_state.py) in the scenario of
+    request["seed"]. Its random decisions come from the seed as well, moved past the draws the scenario
+    takes, so planning a scenario's first day gives the same path as run.py with that seed.
+    """
+    seed = int(request.get("seed", 0))
+    days = int(request.get("days", GOAL_DAYS))
+    wrapper = get_wrapper(seed, days)
+    scenario = get_corpus(days).get(seed)
+    if "state" in request:
+        wrapper.initial_state = decode_colony(request["state"], scenario.schedule, BUILDING_REGISTRY)
+    else:
+        wrapper.initial_state, _buildings = setup_simulation(days, scenario)
+    weights = asdict(make_heuristic_values())
+    weights.update(request.get("weights") or {})
+    wrapper.heuristic_values = Heuristic_Values(**weights)
+    wrapper.actions_per_day = min(MAX_ACTIONS_PER_DAY, max(1, int(request.get("actions_per_day", 3))))
+    for option, default in WRAPPER_OPTIONS.items():
+        setattr(wrapper, option, request.get(option, default))
+    rng = random.Random(seed)
+    for _ in range(scenario.draws):
+        rng.random()
+    wrapper.rng = rng
+
+    algorithm = PLANNERS[request.get("algorithm", "heuristic_dfs")]
+    start = time.perf_counter()
+    deadline = None
+    if request.get("time_limit") is not None:
+        deadline = start + float(request["time_limit"]) / 1000
+    path, stats = algorithm(wrapper, node_expansions_allowed=int(request.get("node_expansions_allowed", 500)), deadline=deadline)
+    search_time = time.perf_counter() - start
+
+    plan = [list(actions) for actions in path_actions(path)]
+    first_day = plan[0] if plan else []
+    return {
+        "actions": [[index, name, cost] for index, (name, cost) in zip(first_day, wrapper.describe_actions(first_day) or ())],
+        "plan": plan,
+        "success": stats.success,
+        "timed_out": stats.timed_out,
+        "nodes_explored": stats.nodes_explored,
+        "search_ms": search_time * 1000
+    }
+
+def percentile(values: list[float], percent: float) -> float:
+    # Nearest rank percentile of values, which have to be sorted
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+class Latency_Stats:
+    """Latencies (in seconds) of the latest window requests, plus counts over the whole run."""
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.requests: int = 0
+        self.errors: int = 0
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        self.latencies.append(seconds)
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> dict[str, float]:
+        values = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p90_ms": percentile(values, 90) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000
+        }
+
+    def report(self, title: str) -> str:
+        summary = self.summary()
+        return (f"{title:<16} | {summary['requests']:>8} requests | {summary['errors']:>5} errors | "
+                f"p50 {summary['p50_ms']:>9.2f} ms | p90 {summary['p90_ms']:>9.2f} ms | "
+                f"p99 {summary['p99_ms']:>9.2f} ms | max {summary['max_ms']:>9.2f} ms")
+
+class Planner_Service:
+    """Answers requests from every connection, handing plans to the worker pool so the event loop only
+    ever parses and writes JSON. Latencies are measured from reading a request to writing its response,
+    so they include the time spent waiting for a free worker.
+    """
+    def __init__(self, pool: ProcessPoolExecutor, workers: int):
+        self.pool: ProcessPoolExecutor = pool
+        self.workers: int = workers
+        self.started: float = time.perf_counter()
+        # one Latency_Stats per algorithm, plus "all" for every request
+        self.latency: dict[str, Latency_Stats] = {"all": Latency_Stats()}
+
+    async def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get("op", "plan")
+        if op == "ping":
+            return {"ok": True}
+        if op == "stats":
+            return {
+                "ok": True,
+                "workers": self.workers,
+                "uptime_s": time.perf_counter() - self.started,
+                "latency": {name: stats.summary() for name, stats in self.latency.items()}
+            }
+        if op != "plan":
+            raise ValueError(f"Unknown op {op}")
+        algorithm = request.get("algorithm", "heuristic_dfs")
+        if algorithm not in PLANNERS:
+            raise ValueError(f"Unknown algorithm {algorithm}, expected one of {', '.join(PLANNERS)}")
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.pool, plan_request, request)
+        response["ok"] = True
+        return response
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                start = time.perf_counter()
+                request: dict[str, Any] = {}
+                try:
+                    parsed = json.loads(line)
+                    if not isinstance(parsed, dict):
+                        raise ValueError("A request has to be a JSON object")
+                    request = parsed
+                    response = await self.handle(request)
+                except Exception as error:
+                    response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+                if "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                if request.get("op", "plan") == "plan":
+                    latency = time.perf_counter() - start
+                    self.latency["all"].record(latency, response["ok"])
+                    algorithm = str(request.get("algorithm", "heuristic_dfs"))
+                    if algorithm in PLANNERS:
+                        self.latency.setdefault(algorithm, Latency_Stats()).record(latency, response["ok"])
+        except ConnectionError:
+            pass # the client went away, nothing left to answer
+        finally:
+            writer.close()
+
+    def report(self) -> str:
+        return "\n".join(stats.report(name) for name, stats in self.latency.items())
+
+async def serve(host: str, port: int, workers: int, scenario_file: str | None) -> None:
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_worker, initargs=(scenario_file,)) as pool:
+        loop = asyncio.get_running_loop()
+        # one job per worker starts them all before the first client connects
+        await asyncio.gather(*(loop.run_in_executor(pool, warm_worker, seed) for seed in range(workers)))
+        service = Planner_Service(pool, workers)
+        server = await asyncio.start_server(service.serve_connection, host, port)
+        stopped = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopped.set)
+        print(f"Planning service on {host}:{port} with {workers} workers, algorithms: {', '.join(PLANNERS)}", flush=True)
+        async with server:
+            await stopped.wait()
+        print("Request latency:")
+        print(service.report())
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve plans from the colony search algorithms over a local socket.")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help="Address to listen on, keep it local.")
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1, help="Worker processes the searches run in.")
+    parser.add_argument('--scenario-file', '--sf', type=str, required=False, help="Scenario corpus (as saved by train.py or benchmark.py) every worker loads at startup.")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, max(1, args.workers), args.scenario_file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#Opt in timing of the phases of a search run (get_actions, transition, heuristic, ...)
+#Attach a Phase_Profiler to Colony_Wrapper.profiler and the search algorithms fill it in, when no profiler
+#is attached the algorithms run exactly as before and nothing gets timed
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
+if TYPE_CHECKING:
+    from colony_simulation.wrapper import Colony_Wrapper
+
+# Colony_Wrapper methods that are timed as their own phase while a profiled algorithm runs
+PROBLEM_PHASES = ("get_actions", "transition", "apply", "undo", "delta_scores", "heuristic", "run_tick", "transition_batch", "heuristic_batch")
+
+class Phase_Stats:
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.total_time: float = 0.0
+
+class Phase_Profiler:
+    """Call counts and cumulative time per phase, plus the wall time and nodes of every profiled run.
+
+    Phases are timed where they are called, so a phase that calls another one (transition_batch calls
+    transition) includes its time. The profiler only holds plain numbers, so it can be sent back from
+    worker processes and merged.
+    """
+    def __init__(self) -> None:
+        self.phases: dict[str, Phase_Stats] = {}
+        self.total_time: float = 0.0
+        self.nodes: int = 0
+        self.runs: int = 0
+
+    def phase(self, name: str) -> Phase_Stats:
+        if name not in self.phases:
+            self.phases[name] = Phase_Stats()
+        return self.phases[name]
+
+    def time_function(self, name: str, function: Callable) -> Callable:
+        phase = self.phase(name)
+        clock = time.perf_counter
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                phase.total_time += clock() - start
+                phase.calls += 1
+        return timed
+
+    def time_iterator(self, name: str, items: Iterable[Any]) -> Iterator[Any]:
+        # Times producing each item (for lazy generators), the time spent by the consumer is not counted
+        phase = self.phase(name)
+        clock = time.perf_counter
+        iterator = iter(items)
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                phase.total_time += clock() - start
+                return
+            phase.total_time += clock() - start
+            phase.calls += 1
+            yield item
+
+    @contextmanager
+    def instrument(self, problem: "Colony_Wrapper") -> Iterator["Phase_Profiler"]:
+        # The timed methods are set on the instance so they shadow the class methods, and are removed afterwards
+        for name in PROBLEM_PHASES:
+            if hasattr(problem, name):
+                setattr(problem, name, self.time_function(name, getattr(problem, name)))
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.total_time += time.perf_counter() - start
+            self.runs += 1
+            for name in PROBLEM_PHASES:
+                problem.__dict__.pop(name, None)
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.total_time if self.total_time > 0 else 0.0
+
+    def merge(self, other: "Phase_Profiler") -> None:
+        for name, other_phase in other.phases.items():
+            phase = self.phase(name)
+            phase.calls += other_phase.calls
+            phase.total_time += other_phase.total_time
+        self.total_time += other.total_time
+        self.nodes += other.nodes
+        self.runs += other.runs
+
+    def report(self) -> str:
+        lines = [f"{'Phase':<24} | {'Calls':>10} | {'Time (s)':>9} | {'% of run':>8} | {'us/call':>9}"]
+        lines.append("-" * len(lines[0]))
+        for name, phase in sorted(self.phases.items(), key=lambda item: item[1].total_time, reverse=True):
+            if not phase.calls:
+                continue # methods the algorithm never used
+            share = phase.total_time / self.total_time * 100 if self.total_time > 0 else 0.0
+            per_call = phase.total_time / phase.calls * 1e6 if phase.calls else 0.0
+            lines.append(f"{name:<24} | {phase.calls:>10} | {phase.total_time:>9.4f} | {share:>7.1f}% | {per_call:>9.2f}")
+        lines.append(f"Total: {self.total_time:.4f}s over {self.runs} run(s), {self.nodes} nodes, {self.nodes_per_second():.1f} nodes/s")
+        return "\n".join(lines)
+
+def timed(profiler: Optional[Phase_Profiler], name: str, function: Callable) -> Callable:
+    # function timed as a phase, or function itself when nothing is being profiled
+    if profiler is None:
+        return function
+    return profiler.time_function(name, function)
+
+def profiled(node_attribute: str) -> Callable[[Callable], Callable]:
+    """Decorator for search algorithms: runs them instrumented when problem.profiler is set.
+
+    node_attribute is the stats field counted as nodes for nodes per second. The profiler is also stored
+    on the returned stats as stats.profile. Without a profiler the algorithm is called directly.
+    """
+    def decorate(algorithm: Callable) -> Callable:
+        @wraps(algorithm)
+        def run(problem: "Colony_Wrapper", *args, **kwargs):
+            profiler = problem.profiler
+            if profiler is None:
+                return algorithm(problem, *args, **kwargs)
+            with profiler.instrument(problem):
+                result = algorithm(problem, *args, **kwargs)
+            stats = result[1] if isinstance(result, tuple) else result
+            profiler.nodes += getattr(stats, node_attribute)
+            stats.profile = profiler
+            return result
+        return run
+    return decorate
@@ -2,56 +2,49 @@
 
 import argparse
 import random
+import time
 from dataclasses import dataclass
+from typing import Callable
 from search import *
+from profiling import Phase_Profiler
 from colony_simulation.colony import *
 from colony_simulation.building import *
 from colony_simulation.wrapper import Colony_Wrapper
 from colony_simulation.default_buildings import *
 from colony_simulation.default_events import *
+from colony_simulation.scenario import Scenario, plan_event_dates, make_events
+from colony_simulation.simulation_log import Simulation_Log
 
 
 # goes through a list of events, if the event has firing date(s), 
 # if the event has a firing likelihood, generate a random number and add the event at the current day if the random number deems it so
+# the events passed in are left alone, the returned list holds copies with their fire dates filled in
 def setup_events(events : list[Event], days : int):
-    
-    event_list = []
-    event_removal_list = []
-
-    for event in events:
-        if event.fire_dates:
-            event_list.append(event)
-            event_removal_list.append(event)
-        if event.firing_likelihood:
-            fire_dates = []
-            for i in range(1, days + 1):
-                if random.random() <= event.firing_likelihood:
-                    fire_dates.append(i)
-                    event.fire_count -= 1
-                    if event.fire_count <= 0:
-                        event_removal_list.append(event)
-                        break
-            event.firing_likelihood = None
-            event.fire_dates = tuple(fire_dates)
-            event_list.append(event)
-    for event in event_removal_list:
-        events.remove(event)
-    return event_list
-
-
-
-def setup_simulation(expected_days : int) -> tuple[Colony, list[Building]]:
-    buildings = [farm.clone(), nuclear_reactor.clone()]
+    planned, _draws = plan_event_dates(events, days, random)
+    return make_events(events, planned)
+
+
+
+# seed keys the random streams the events draw from, pass the one the global RNG was seeded with so the
+# run matches the same seed's Scenario
+def setup_simulation(expected_days : int, scenario: Scenario | None = None, seed: int = 0) -> tuple[Colony, list[Building]]:
+    buildings = [farm, nuclear_reactor]
     available_buildings = [building for building in ALL_BUILDINGS]
-    events = [event for event in ALL_EVENTS]
-    event_list = setup_events(events, expected_days)
-    colony_state = Colony(starting_buildings=buildings, events=event_list)
+    if scenario is None:
+        # draws the event dates from the global RNG, so seed it first
+        schedule = Event_Schedule(setup_events(ALL_EVENTS, expected_days), seed)
+    else:
+        # a prebuilt scenario (see Scenario_Corpus), its schedule is shared
+        schedule = scenario.schedule
+    colony_state = Colony(starting_buildings=buildings, events=schedule, building_registry=BUILDING_REGISTRY)
 
     return (colony_state, available_buildings)
 
 algorithms = {
     "default_dfs" : default_dfs,
     "heuristic_dfs" : heuristic_dfs,
+    "mcts" : mcts,
+    "beam_search" : beam_search,
     "percentage_fuzzing" : percentage_fuzzing
 }
 
@@ -107,16 +100,39 @@ def read_heuristic_weights(file_path: str) -> Heuristic_Values:
         below_energy_target_energy_w=weights.get('below_energy_target_energy_w', 4.0)
     )
 
+# The algorithm's result, printing a line for every progress snapshot on the way when show_progress is set
+def run_algorithm(algorithm: Callable, colony_wrapper: Colony_Wrapper, show_progress: bool, *args, **kwargs):
+    if not show_progress:
+        return algorithm(colony_wrapper, *args, **kwargs)
+    for snapshot in search_progress(algorithm, colony_wrapper, *args, **kwargs):
+        if snapshot.done:
+            return snapshot.result
+        print(f"[{snapshot.elapsed * 1000:.0f} ms] Nodes: {snapshot.nodes_explored}, best depth: {snapshot.best_depth}, current path: {len(snapshot.path)} days")
+
 def main() -> None:
     MAX_ACTIONS_PER_DAY = 6
 
     parser = argparse.ArgumentParser(description="Agent runner for running the colony management agent")
     parser.add_argument('--algorithm', '--algo', type=str, choices=algorithms.keys(), required=False, default="default_dfs", help="What algorithm to use for this run of the colony management agents")
     parser.add_argument('--run-count', "--rc", type=int, default=10, required=False, help="How many times the simulation should run, this should only be used when using the percentage fuzzing algorithm")
+    parser.add_argument('--batch-size', "--bs", type=int, required=False, help="Only used for percentage fuzzing, simulates this many colonies at once with the NumPy batch engine instead of one at a time")
     parser.add_argument('--node-expansions-allowed', "--nea", type=int, default=500, required=False, help="How many nodes the agent gets to expand, only applies to the DFS searches")
     parser.add_argument('--seed', '--s', type=int, required=False, help="The seed for random number generation, if blank a seed is generated by the program")
     parser.add_argument('--display-timeline', '--dt', type=bool, required=False, default=False, help="Whether or not to display the timeline the agent followed to get to its conclusion")
     parser.add_argument('--actions-per-day', '--apd', type=int, required=False, default=3, help=f"How many actions per day the agent is allowed to take, the max is {MAX_ACTIONS_PER_DAY} action per day and the min is 1 action per day")
+    parser.add_argument('--max-combinations', '--mc', type=int, required=False, help="Only used by heuristic_dfs, scores a random sample of this many action combinations per expansion instead of all of them")
+    parser.add_argument('--batch-scoring', '--bsc', action='store_true', help="Only used by heuristic_dfs, scores all children of a node at once with NumPy instead of building every child colony")
+    parser.add_argument('--transposition-size', '--tts', type=int, required=False, help="Only used by heuristic_dfs, caps its table of already visited states at this many entries and evicts the oldest ones beyond it")
+    parser.add_argument('--transposition-resolution', '--ttr', type=float, required=False, help="Only used by heuristic_dfs, buckets food, energy and defense to multiples of this before comparing visited states, so near identical colonies count as the same state")
+    parser.add_argument('--beam-width', '--bw', type=int, required=False, default=8, help="Only used by beam_search, how many colonies it keeps per day")
+    parser.add_argument('--beam-temperature', '--btemp', type=float, required=False, default=1.0, help="Only used by beam_search, the colonies kept are drawn weighted by exp(score / temperature) like heuristic_dfs's choice, 0 always keeps the best scoring ones")
+    parser.add_argument('--mcts-prior-weight', '--mpw', type=float, required=False, help="Only used by mcts, adds this times a child's heuristic score to its UCT score so promising children are tried first, the weights from --weight-file are used")
+    parser.add_argument('--replay-paths', '--rp', action='store_true', help="Only used by default_dfs, keeps only the action log of the path being searched and replays it at the end instead of holding every colony along it")
+    parser.add_argument('--memo-size', '--ms', type=int, required=False, help="Only used by percentage_fuzzing and default_dfs, remembers up to this many (colony, actions) -> next day results so repeated steps are not simulated again")
+    parser.add_argument('--simulation-log', '--sl', type=str, required=False, help="Path to append a JSON lines log of every event firing and effect expiration the run's colonies go through, tagged with the seed, nothing is logged without it")
+    parser.add_argument('--time-limit', '--tl', type=float, required=False, help="Stop the search after this many milliseconds and use the best path found so far, on top of the node budget")
+    parser.add_argument('--progress', '--pg', action='store_true', help="Print the nodes explored, best depth and current path length while the search runs (not profiled)")
+    parser.add_argument('--profile', '--prof', action='store_true', help="Time each phase of the search (get_actions, transition, heuristic, ...) and print a breakdown after the stats")
     parser.add_argument('--weight-file', '--wf', type=str, required=False, help="Path to a file containing heuristic weights to use for the agent")
     args = parser.parse_args()
     
@@ -139,17 +155,35 @@ def main() -> None:
     actions_per_day = max(1, actions_per_day)
 
     GOAL_DAYS = 31
-    colony, buildings = setup_simulation(GOAL_DAYS)
+    colony, buildings = setup_simulation(GOAL_DAYS, seed=seed)
+    if args.simulation_log:
+        # every colony the search makes shares the starting colony's log
+        colony.log = Simulation_Log(str(seed), args.simulation_log)
     if not weight_file:
         heuristic_weights = make_heuristic_values()
     else:
         heuristic_weights = read_heuristic_weights(weight_file)
     colony_wrapper = Colony_Wrapper(colony, buildings, heuristic_weights)
     colony_wrapper.actions_per_day = actions_per_day
+    colony_wrapper.max_combinations = args.max_combinations
+    colony_wrapper.batch_scoring = args.batch_scoring
+    colony_wrapper.replay_paths = args.replay_paths
+    colony_wrapper.transposition_size = args.transposition_size
+    colony_wrapper.transposition_resolution = args.transposition_resolution
+    colony_wrapper.memo_size = args.memo_size
+    colony_wrapper.mcts_prior_weight = args.mcts_prior_weight
+    colony_wrapper.beam_width = args.beam_width
+    colony_wrapper.beam_temperature = args.beam_temperature
     colony_wrapper.goal_day = GOAL_DAYS
+    if args.profile:
+        colony_wrapper.profiler = Phase_Profiler()
+
+    deadline = None
+    if args.time_limit is not None:
+        deadline = time.perf_counter() + args.time_limit / 1000
 
     if args.algorithm == "percentage_fuzzing":
-        stats = algorithm(colony_wrapper, run_count)
+        stats = run_algorithm(algorithm, colony_wrapper, args.progress, run_count, batch_size=args.batch_size, deadline=deadline)
         print(f"""Percentage fuzzing stats:
                 Win rate: {stats.win_rate}
                 Total wins: {stats.total_wins}
@@ -157,22 +191,42 @@ def main() -> None:
                 Total depth: {stats.total_depth}
                 Average depth: {stats.average_depth}
                 Nodes generated: {stats.nodes_generated}""")
+        if stats.timed_out:
+            print(f"Time limit of {args.time_limit} ms reached, the stats cover the runs that finished")
+        if stats.profile:
+            print(stats.profile.report())
+        if colony_wrapper.memo_size:
+            print(f"Step memo: {colony_wrapper.memo_hits} hits, {colony_wrapper.memo_misses} misses")
+        if args.simulation_log:
+            colony.log.flush()
+            print(f"Simulation log: {len(colony.log)} records written to {args.simulation_log}")
         return
     
-    path, stats = algorithm(colony_wrapper, node_expansions_allowed = node_expansions_allowed)
+    path, stats = run_algorithm(algorithm, colony_wrapper, args.progress, node_expansions_allowed = node_expansions_allowed, deadline=deadline)
     print(f"""Search stats:
                 Attempts needed: {stats.attempts_needed}
                 Nodes generated: {stats.nodes_generated}
                 Nodes explored: {stats.nodes_explored}
                 Average depth: {stats.average_depth}
                 Success: {stats.success}""")
+    if stats.timed_out:
+        print(f"Time limit of {args.time_limit} ms reached, the path is the deepest one found")
+    if stats.transposition_hits or stats.transposition_misses:
+        print(f"Transposition table: {stats.transposition_hits} hits, {stats.transposition_misses} misses, {stats.transposition_evictions} evictions")
+    if stats.profile:
+        print(stats.profile.report())
+    if colony_wrapper.memo_size:
+        print(f"Step memo: {colony_wrapper.memo_hits} hits, {colony_wrapper.memo_misses} misses")
+    if args.simulation_log:
+        colony.log.flush()
+        print(f"Simulation log: {len(colony.log)} records written to {args.simulation_log}")
     if not display_timeline:
         return
     
     print("Colony timeline:")
     for day, node in enumerate(path):
         print(day)
-        print(f"Actions: {node.actions}")
+        print(f"Actions: {colony_wrapper.describe_actions(node.actions)}")
         print(f"Energy: {node.state.energy}")
         print(f"Base energy production: {node.state.base_energy_production}")
         print(f"Population: {node.state.population}")
@@ -180,17 +234,14 @@ def main() -> None:
         print(f"Defense: {node.state.defense_capacity}")
         print(f"Food: {node.state.food}")
         print(f"Base food production: {node.state.base_food_production}")
-        print(f"Total buildings: {len(node.state.buildings)}")
-        if node.state.buildings:
-            print(f"Building Efficiency: {node.state.buildings[0].power_modifier}")
+        print(f"Total buildings: {node.state.total_buildings()}")
+        if node.state.total_buildings():
+            print(f"Building Efficiency: {node.state.power_modifier}")
 
 
         print("Events:")
-        for event in colony.events:
-            if not event.fire_dates:
-                continue
-            if day in event.fire_dates:
-                print(event.event_name)
+        for event in colony.events.events_on(day):
+            print(event.event_name)
 
     #Start by implementing a basic version of the "fuzzer" which is basic DFS first
 
@@ -1,16 +1,23 @@
 import random
 import math
-from typing import TYPE_CHECKING, Any, Optional, Callable
-from dataclasses import dataclass
+import time
+from typing import TYPE_CHECKING, Any, Optional, Callable, Generator, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from profiling import profiled, timed
+from transposition import Transposition_Table
 if TYPE_CHECKING:
+    from profiling import Phase_Profiler
     from colony_simulation.wrapper import Colony_Wrapper
     from colony_simulation.colony import Colony
 
 
+#actions are indices into problem.action_table (problem.describe_actions gives their names and costs).
+#With problem.replay_paths set, default_dfs drops the state of every node it has expanded and rebuilds the
+#path's states with replay_path at the end. heuristic_dfs always keeps them
 @dataclass
 class Node:
-    state: "Colony"
-    actions: Optional[tuple[tuple[str, int], ...]] = None
+    state: Optional["Colony"]
+    actions: Optional[tuple[int, ...]] = None
     parent: Optional["Node"] = None
 class pf_stats:
     total_depth: int = 0
@@ -19,68 +26,216 @@ class pf_stats:
     total_runs: int = 0
     win_rate: float = 0.0
     nodes_generated: int = 0
+    # set when the deadline passed before every attempt was run
+    timed_out: bool = False
+    profile: Optional["Phase_Profiler"] = None
 class search_stats:
     attempts_needed: int = 0
     average_depth: float = 0
     success:  bool = False
     nodes_generated: int = 0
     nodes_explored: int = 0
+    # heuristic_dfs only, see transposition.py
+    transposition_hits: int = 0
+    transposition_misses: int = 0
+    transposition_evictions: int = 0
+    # set when the deadline passed first, the path is then the deepest one found
+    timed_out: bool = False
+    profile: Optional["Phase_Profiler"] = None
+
+#Every search is a generator (the *_search functions) that yields its Search_Progress after each node it
+#reaches and returns what the plain function returns, the plain functions just run it to the end.
+#A deadline is a time.perf_counter() value, once it has passed the search stops and returns what it has
+class Search_Progress:
+    def __init__(self, stats: "search_stats | pf_stats") -> None:
+        self.stats = stats
+        # the node reached last and the deepest one so far (percentage_fuzzing keeps no nodes)
+        self.current: Optional[Node] = None
+        self.best: Optional[Node] = None
+        self.best_depth: int = 0
+
+    def reached(self, node: Node) -> None:
+        self.current = node
+        depth = node.state.current_day - 1
+        if self.best is None or depth > self.best_depth:
+            self.best = node
+            self.best_depth = depth
+
+@dataclass
+class Progress_Snapshot:
+    nodes_explored: int
+    best_depth: int
+    path: list[Node]
+    elapsed: float
+    done: bool = False
+    # only on the last snapshot: what the plain search function returns
+    result: Any = None
+
+def out_of_time(deadline: float | None) -> bool:
+    return deadline is not None and time.perf_counter() >= deadline
+
+def run_search(search: Generator[Search_Progress, None, Any]) -> Any:
+    # Runs a search generator to the end without looking at its progress and returns its result
+    while True:
+        try:
+            next(search)
+        except StopIteration as stop:
+            return stop.value
 
 #This function attempts to roughly determine how many realistic win conditions there are
-def percentage_fuzzing(problem: "Colony_Wrapper", attempts: int=100000) -> "pf_stats": 
+@profiled("nodes_generated")
+def percentage_fuzzing(
+        problem: "Colony_Wrapper",
+        attempts: int=100000,
+        batch_size: int | None = None,
+        deadline: float | None = None
+    ) -> "pf_stats": 
+    return run_search(percentage_fuzzing_search(problem, attempts, batch_size, deadline))
+
+def percentage_fuzzing_search(
+        problem: "Colony_Wrapper",
+        attempts: int=100000,
+        batch_size: int | None = None,
+        deadline: float | None = None
+    ) -> Generator[Search_Progress, None, "pf_stats"]:
+    if batch_size:
+        return (yield from batch_percentage_fuzzing(problem, attempts, batch_size, deadline))
     stats = pf_stats()
+    progress = Search_Progress(stats)
 
     for _ in range(attempts):
-        frontier = [(Node(problem.initial_state), 0)]
-        total_depth = 0
+        if out_of_time(deadline):
+            stats.timed_out = True
+            break
+        # only the win and the depth of a rollout are kept, so it is just the current state
+        state = problem.initial_state
         stats.total_runs += 1
+        depth = 0
 
-        while frontier:
-            node, depth = frontier.pop()
+        while not problem.goal_test(state):
+            state = problem.step(state, choose_random_actions(problem, state))
 
-            if problem.goal_test(node.state):
-                stats.total_wins += 1
+            if state.check_loss():
                 break
+            stats.nodes_generated += 1
+            stats.total_depth += 1
+            depth += 1
+        else:
+            stats.total_wins += 1
+        progress.best_depth = max(progress.best_depth, depth)
+        yield progress
+
+    if stats.total_runs:
+        stats.win_rate = stats.total_wins / stats.total_runs
+        stats.average_depth = stats.total_depth / stats.total_runs
+    
+    return stats
 
-            chosen_action_list: list[tuple[str, Callable, int]] = []
-            action_stats: list[tuple[str, int]] = []
-            available_energy = node.state.energy
-            
-            for i in range(problem.actions_per_day):
-                action_list = problem.get_actions(node.state, available_energy)
-                if action_list:
-                    action = random.choice(action_list)
-                    available_energy -= action[2]
-                    chosen_action_list.append(action)
-                    action_stats.append((action[0], action[2]))
-                else:
-                    break
-                    #This might be entirely redundant because the loop only runs an amount equal to the actions per day
-
-            newState = problem.transition(node.state, chosen_action_list)
-            problem.run_tick(newState)
-            total_depth += 1
-
-            if not newState.check_loss():
-                frontier.append((Node(newState, tuple(action_stats), node), total_depth))
-                stats.nodes_generated += 1
-                stats.total_depth += 1
+#Same rollouts as percentage_fuzzing, but batch_size colonies at a time are simulated together as NumPy arrays
+def batch_percentage_fuzzing(
+        problem: "Colony_Wrapper",
+        attempts: int,
+        batch_size: int,
+        deadline: float | None = None
+    ) -> Generator[Search_Progress, None, "pf_stats"]:
+    # numpy is only needed for this mode, so it is imported here rather than at the top of the file
+    from colony_simulation.batch import Colony_Batch, make_rng
+    stats = pf_stats()
+    progress = Search_Progress(stats)
+    rng = make_rng(problem.rng)
+    remaining = attempts
+    # the batch steps are phases of their own, nothing here goes through the problem's methods
+    random_transition = timed(problem.profiler, "random_transition", Colony_Batch.random_transition)
+    tick_step = timed(problem.profiler, "tick_step", Colony_Batch.tick_step)
+    remove_lost = timed(problem.profiler, "remove_lost", Colony_Batch.remove_lost)
+
+    while remaining > 0 and not stats.timed_out:
+        batch = Colony_Batch(problem.initial_state, problem.action_table, min(batch_size, remaining), rng)
+        stats.total_runs += batch.size
+        remaining -= batch.size
+
+        while batch.size and batch.current_day <= problem.goal_day:
+            if out_of_time(deadline):
+                # the colonies still running have neither won nor lost, they are left out
+                stats.timed_out = True
+                stats.total_runs -= batch.size
+                break
+            random_transition(batch, problem.actions_per_day)
+            tick_step(batch)
+            remove_lost(batch)
+            stats.nodes_generated += batch.size
+            stats.total_depth += batch.size
+            if batch.size:
+                progress.best_depth = max(progress.best_depth, batch.current_day - 1)
+            yield progress
+        else:
+            stats.total_wins += batch.size
+
+    if stats.total_runs:
+        stats.win_rate = stats.total_wins / stats.total_runs
+        stats.average_depth = stats.total_depth / stats.total_runs
 
-    stats.win_rate = stats.total_wins / stats.total_runs
-    stats.average_depth = stats.total_depth / stats.total_runs
-    
     return stats
 
-def default_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int):
+def choose_random_actions(problem: "Colony_Wrapper", state: "Colony") -> tuple[int, ...]:
+    # The random policy of percentage_fuzzing and default_dfs, one random affordable action at a time.
+    # get_actions returns a prefix of the action table, so a position in it is an action table index
+    chosen: list[int] = []
+    available_energy = state.energy
+    for _ in range(problem.actions_per_day):
+        action_list = problem.get_actions(state, available_energy)
+        if not action_list:
+            break
+        index = problem.rng.randrange(len(action_list))
+        available_energy -= action_list[index][2]
+        chosen.append(index)
+    return tuple(chosen)
+
+def get_path(node: Node | None) -> list[Node]:
+    path: list[Node] = []
+    while node:
+        path.append(node)
+        node = node.parent
+    return path[::-1]
+
+def path_actions(path: list[Node]) -> list[tuple[int, ...]]:
+    # The actions taken on each day of path, in order. default_dfs, mcts and beam_search log on every node
+    # the actions that led to it (none on the first), heuristic_dfs logs the actions taken from it, either
+    # way that is the first len(path) - 1 logged action tuples
+    return [node.actions for node in path if node.actions is not None][:len(path) - 1]
+
+def replay_path(problem: "Colony_Wrapper", path: list[Node]) -> list[Node]:
+    # Fills in the states along path from its logged actions. A step only depends on the colony and the
+    # actions (events have their own random streams), so this gives back exactly the states the search saw
+    if not path:
+        return path
+    state = problem.initial_state
+    path[0].state = state
+    for node in path[1:]:
+        state = problem.step(state, node.actions)
+        node.state = state
+    return path
+
+@profiled("nodes_explored")
+def default_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    return run_search(default_dfs_search(problem, node_expansions_allowed, deadline))
+
+def default_dfs_search(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
     stats = search_stats()
+    progress = Search_Progress(stats)
     total_depth = 0
+    last_seen_state: Node | None = None
+    replay = problem.replay_paths
 
-    while stats.nodes_explored < node_expansions_allowed:
+    while stats.nodes_explored < node_expansions_allowed and not stats.timed_out:
         stats.attempts_needed += 1
         frontier = [(Node(problem.initial_state), 0)]
-        last_seen_state: Node | None = None
+        last_seen_state = None
 
         while frontier:
+            if out_of_time(deadline):
+                stats.timed_out = True
+                break
             node, depth = frontier.pop()
             last_seen_state = node
             stats.nodes_explored += 1
@@ -90,103 +245,224 @@ def default_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int):
             if problem.goal_test(node.state):
                 stats.success = True
                 stats.average_depth = total_depth / stats.attempts_needed
-                path = []
-                while node:
-                    path.append(node)
-                    node = node.parent
-                return (path[::-1], stats)
+                path = get_path(node)
+                if replay:
+                    replay_path(problem, path)
+                return (path, stats)
         
-            chosen_action_list: list[tuple[str, Callable, int]] = []
-            action_stats: list[tuple[str, int]] = []
-            available_energy = node.state.energy
-
-            for i in range(problem.actions_per_day):
-                action_list = problem.get_actions(node.state, available_energy)
-                #If the actions stay static for the entire run I might be able to just compute them at the start rather than computing it in this inner loop
-                if action_list:
-                    action = random.choice(action_list)
-                    available_energy -= action[2]
-                    chosen_action_list.append(action)
-                    action_stats.append((action[0], action[2]))
-                else:
-                    break            
-            newState = problem.transition(node.state, chosen_action_list)
+            chosen = choose_random_actions(problem, node.state)
+            newState = problem.step(node.state, chosen)
+            if replay:
+                # from here on only the child needs a state
+                node.state = None
         
-            last_seen_state = Node(newState, tuple(action_stats), node)
+            last_seen_state = Node(newState, chosen, node)
             stats.nodes_generated += 1
-            problem.run_tick(newState)
             total_depth += 1
+            progress.reached(last_seen_state)
+            yield progress
             
             if not newState.check_loss():
-                frontier.append((Node(newState, tuple(action_stats), node), total_depth))
+                frontier.append((last_seen_state, total_depth))
     stats.average_depth = total_depth / stats.attempts_needed
-    
-    path = []
-    node = last_seen_state
-    while node:
-        path.append(node)
-        node = node.parent 
-
-    return (path[::-1], stats)
+    path = get_path(progress.best if stats.timed_out else last_seen_state)
+    if replay:
+        replay_path(problem, path)
+
+    return (path, stats)
+
+def reservoir_sample(items: Iterable[Any], sample: int, limit: int | None = None, rng: random.Random = random) -> list[Any]:
+    # Uniform random sample of size sample from items in one pass, only looks at the first limit items if set
+    reservoir: list[Any] = []
+    for seen_count, item in enumerate(items):
+        if seen_count < sample:
+            reservoir.append(item)
+        else:
+            replace_index = rng.randrange(seen_count + 1)
+            if replace_index < sample:
+                reservoir[replace_index] = item
+        if limit is not None and seen_count + 1 >= limit:
+            break
+    return reservoir
+
+def get_unique_index_combinations(
+        costs: Sequence[int],
+        possible_actions: int,
+        available_energy: float,
+        limit: int | None = None,
+        sample: int | None = None,
+        rng: random.Random = random
+    ) -> Iterator[tuple[int, ...]]:
+    """Lazily yields every affordable multiset of possible_actions actions as a tuple of indices into costs.
+
+    costs must be sorted in ascending order. The walk keeps a single index list instead of
+    building partial combinations, so a branch is cut as soon as the next action is more
+    than the energy left (every later action costs at least as much). Free actions are
+    always allowed.
+    limit stops after that many combinations, sample keeps a uniform random sample of that
+    size (reservoir sampling, drawing from rng) and yields it once the walk is done.
+    """
+    if sample is not None:
+        yield from reservoir_sample(get_unique_index_combinations(costs, possible_actions, available_energy), sample, limit, rng)
+        return
+
+    if possible_actions <= 0:
+        yield ()
+        return
+
+    action_count = len(costs)
+    last_position = possible_actions - 1
+
+    indices = [0] * possible_actions
+    energy_left = [0.0] * possible_actions
+    energy_left[0] = available_energy
+    position = 0
+    produced = 0
+
+    while position >= 0:
+        i = indices[position]
+        if i < action_count and (costs[i] <= energy_left[position] or costs[i] == 0):
+            if position == last_position:
+                yield tuple(indices)
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+                indices[position] = i + 1
+            else:
+                # multisets are generated with non decreasing indices so each one appears once
+                position += 1
+                indices[position] = i
+                energy_left[position] = energy_left[position - 1] - costs[i]
+            continue
+
+        # nothing else at this position is affordable, step back and advance the previous slot
+        position -= 1
+        if position >= 0:
+            indices[position] += 1
 
 def get_unique_combinations(
-        actions: list[tuple[str, Callable, int]],
+        actions: Sequence[tuple[str, Callable, int]],
         possible_actions: int,
-        available_energy: float
-    ) -> list[tuple[tuple[str, Callable, int], ...]]:
-
-    results: list[tuple[tuple[str, Callable, int], ...]] = []
-
-    def combination_search(current_combo: list[tuple[str, Callable, int]], energy_left: float, start_index):
-        if len(current_combo) == possible_actions:
-            results.append(tuple(current_combo))
-            return
-        
-        for i in range(start_index, len(actions)):
-            action = actions[i]
-            name, fn, cost = action
-
-            if cost > energy_left and cost != 0:
-                continue
-
-            combination_search(current_combo + [action], energy_left - cost, i)
-
-    combination_search([], available_energy, 0)
-    return results
+        available_energy: float,
+        limit: int | None = None,
+        sample: int | None = None
+    ) -> Iterator[tuple[tuple[str, Callable, int], ...]]:
+    """Same as get_unique_index_combinations but yields the actions themselves, actions can be in any order."""
+    ordered = sorted(actions, key=lambda action: action[2])
+    costs = [cost for _name, _action, cost in ordered]
+    for indices in get_unique_index_combinations(costs, possible_actions, available_energy, limit, sample):
+        yield tuple([ordered[i] for i in indices])
 
 def choose_state_temperature(
-        scored: list[tuple[float, "Colony", list[tuple[str, int]]]], 
-        temperature : float = 1.0):
+        scored: list[tuple[float, tuple[int, ...]]], 
+        temperature : float = 1.0,
+        rng: random.Random = random):
     scores = [s[0] for s in scored]
     max_score = max(scores)
     exp_scores = [math.exp((s - max_score) / temperature) for s in scores]
 
-    chosen_index = random.choices(range(len(scored)), weights=exp_scores, k=1)[0]
+    chosen_index = rng.choices(range(len(scored)), weights=exp_scores, k=1)[0]
     return scored[chosen_index]
 
-def heuristic_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int):
-    def get_state_key(state: "Colony"):
-        return (
-            new_state.current_day,
-            new_state.population,
-            new_state.food,
-            new_state.energy,
-            new_state.defense_capacity,
-            tuple(sorted(b.building_name for b in new_state.buildings))
-        )
-    
+def is_seen(state: "Colony", seen: Transposition_Table) -> bool:
+    # an empty table is not asked, so the hit and miss counts match delta_scores and the batch scorer
+    return bool(seen) and seen.state_key(state) in seen
+
+def score_combinations(
+        problem: "Colony_Wrapper",
+        state: "Colony",
+        action_list: Sequence[tuple[str, Callable, int]],
+        combinations: Iterable[Sequence[int]],
+        seen: Transposition_Table
+    ) -> list[tuple[float, tuple[int, ...]]]:
+    # Children are scored from what their actions change (see Colony_Wrapper.delta_scores), only the
+    # chosen one gets turned into a real state (see heuristic_dfs)
+    if problem.action_deltas is not None:
+        return problem.delta_scores(state, combinations, seen)
+    # some action has no known effect: every combination is applied to one scratch child and undone again
+    child = problem.transition(state, [])
+    state_seen = timed(problem.profiler, "seen lookup", is_seen)
+    scored: list[tuple[float, tuple[int, ...]]] = []
+    for combination in combinations:
+        undo_log = problem.apply(child, [action_list[i] for i in combination])
+        if not state_seen(child, seen):
+            scored.append((problem.heuristic(child), tuple(combination)))
+        problem.undo(child, undo_log)
+    return scored
+
+def score_children(
+        problem: "Colony_Wrapper",
+        state: "Colony",
+        action_list: Sequence[tuple[str, Callable, int]],
+        seen: Transposition_Table
+    ) -> list[tuple[float, tuple[int, ...]]]:
+    # action_list is a prefix of the cost sorted action table, so its indices are action table indices
+    combinations = get_unique_index_combinations(
+        problem.action_costs[:len(action_list)],
+        problem.actions_per_day,
+        state.energy,
+        sample=problem.max_combinations,
+        rng=problem.rng
+    )
+    if problem.profiler is not None:
+        combinations = problem.profiler.time_iterator("get_unique_combinations", combinations)
+    return score_combinations(problem, state, action_list, combinations, seen)
+
+BATCH_SCORING_MIN_CHILDREN = 48
+
+#Scores every child at once with NumPy, gives exactly the same entries as score_children
+def score_children_batch(
+        problem: "Colony_Wrapper",
+        state: "Colony",
+        action_list: Sequence[tuple[str, Callable, int]],
+        seen: Transposition_Table
+    ) -> list[tuple[float, tuple[int, ...]]]:
+    if problem.max_combinations is not None and problem.max_combinations < BATCH_SCORING_MIN_CHILDREN:
+        # the sample never gets big enough for the arrays to pay off, the streamed scalar path is identical
+        return score_children(problem, state, action_list, seen)
+    from colony_simulation.batch import get_index_combinations
+
+    combinations = timed(problem.profiler, "get_unique_combinations", get_index_combinations)(
+        problem.action_costs[:len(action_list)], problem.actions_per_day, state.energy
+    )
+    if problem.max_combinations is not None:
+        # same reservoir (and random draws) as the scalar path
+        combinations = combinations[reservoir_sample(range(len(combinations)), problem.max_combinations, rng=problem.rng)]
+    if len(combinations) < BATCH_SCORING_MIN_CHILDREN:
+        # setting up the arrays costs more than it saves for a handful of children, the scalar scores are identical
+        return score_combinations(problem, state, action_list, combinations.tolist(), seen)
+    children = problem.transition_batch(state, combinations)
+    scores = problem.heuristic_batch(children)
+
+    unseen = ~timed(problem.profiler, "seen lookup", children.seen_mask)(seen)
+    return list(zip(scores[unseen].tolist(), map(tuple, combinations[unseen].tolist())))
+
+@profiled("nodes_explored")
+def heuristic_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    return run_search(heuristic_dfs_search(problem, node_expansions_allowed, deadline))
+
+def heuristic_dfs_search(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
     TEMPERATURE = 1.0
     stats = search_stats()
+    progress = Search_Progress(stats)
     total_depth = 0
     PRUNING_DEPTH = 3
-    seen: set[tuple] = set()
+    seen = Transposition_Table(
+        len(problem.initial_state.building_registry),
+        problem.transposition_size,
+        problem.transposition_resolution
+    )
     last_seen_state: Node | None = None
+    choose_state = timed(problem.profiler, "choose_state_temperature", choose_state_temperature)
     
-    while stats.nodes_explored < node_expansions_allowed:
+    while stats.nodes_explored < node_expansions_allowed and not stats.timed_out:
         stats.attempts_needed += 1
         frontier = [(Node(problem.initial_state), 0)]
 
         while frontier:
+            if out_of_time(deadline):
+                stats.timed_out = True
+                break
             node, depth = frontier.pop()
             last_seen_state = node
             stats.nodes_explored += 1
@@ -195,52 +471,298 @@ def heuristic_dfs(problem: "Colony_Wrapper", node_expansions_allowed: int):
             if problem.goal_test(node.state):
                 stats.success = True
                 stats.average_depth = total_depth / stats.attempts_needed
-                path = []
-                while node:
-                    path.append(node)
-                    node = node.parent                
-                return (path[::-1], stats)
+                seen.record_stats(stats)
+                return (get_path(node), stats)
             
-            available_energy = node.state.energy
-            action_list = problem.get_actions(node.state, available_energy)
-            action_combinations = get_unique_combinations(action_list, problem.actions_per_day, available_energy)
-
-            scored: list[tuple[float, "Colony", list[tuple[str, int]]]] = [] 
-            action_stats: list[tuple[str, int]] = []
-
-            for combination in action_combinations:
-                new_state = problem.transition(node.state, list(combination))
-                action_stats = [(name, cost) for (name, _, cost) in combination]
-
-
-                state_key = get_state_key(new_state)
-
-                if state_key in seen:
-                    continue
-                
-                stats.nodes_generated += 1
-                scored.append((problem.heuristic(new_state), new_state, action_stats))
+            action_list = problem.get_actions(node.state, node.state.energy)
+            if problem.batch_scoring:
+                scored = score_children_batch(problem, node.state, action_list, seen)
+            else:
+                scored = score_children(problem, node.state, action_list, seen)
+            stats.nodes_generated += len(scored)
             if not scored:
+                # every child was seen already, there is no new node but callers still get to cancel
+                yield progress
                 break
 
-            chosen_score, chosen_state, chosen_actions = choose_state_temperature(scored, TEMPERATURE)
+            chosen_score, chosen_indices = choose_state(scored, TEMPERATURE, problem.rng)
+            # the only child of this node that becomes a real Colony
+            chosen_combination = [action_list[i] for i in chosen_indices]
+            chosen_state = problem.transition(node.state, chosen_combination)
 
-            if total_depth >= PRUNING_DEPTH:
-                chosen_key = get_state_key(chosen_state)
-                seen.add(chosen_key)
-            last_seen_state = Node(chosen_state, tuple(chosen_actions), node)
+            # depth counts from the start of this attempt, so every attempt explores its first days freely
+            if depth >= PRUNING_DEPTH:
+                seen.add(seen.state_key(chosen_state))
+            last_seen_state = Node(chosen_state, chosen_indices, node)
             problem.run_tick(chosen_state)
             total_depth += 1
-            node.actions = tuple(chosen_actions)
+            node.actions = chosen_indices
+            progress.reached(last_seen_state)
+            yield progress
             if not chosen_state.check_loss():
-                frontier.append((Node(chosen_state, (), node), total_depth))
+                frontier.append((Node(chosen_state, (), node), depth + 1))
 
     stats.average_depth = total_depth / stats.attempts_needed
-    path = []
-    node = last_seen_state
-    while node:
-        path.append(node)
-        node = node.parent 
+    seen.record_stats(stats)
+
+    return (get_path(progress.best if stats.timed_out else last_seen_state), stats)
+
+
+# UCT's exploration constant, rewards are between 0 and 1
+MCTS_EXPLORATION = math.sqrt(2)
+# Progressive widening: a tree node may have MCTS_WIDENING * visits ** MCTS_WIDENING_EXPONENT children (at
+# least one), there are far too many action combinations per day to try them all. A playout takes up to
+# goal_day days of the budget, so at a few hundred nodes there are only around ten of them, any wider and
+# every one of them would just add another child to the root
+MCTS_WIDENING = 1.5
+MCTS_WIDENING_EXPONENT = 0.5
+# With priors, a new child's actions are the best scoring of this many random draws
+MCTS_PRIOR_CANDIDATES = 4
+
+@dataclass
+class Tree_Node(Node):
+    children: list["Tree_Node"] = field(default_factory=list)
+    visits: int = 0
+    total_reward: float = 0.0
+    # heuristic score of the actions that made it, before the tick (see expand_actions), only with priors
+    prior: float = 0.0
+
+def rollout_reward(problem: "Colony_Wrapper", state: "Colony") -> float:
+    # share of the days the colony got through, 1.0 for a win
+    return min(1.0, (state.current_day - 1) / problem.goal_day)
+
+def uct_score(child: Tree_Node, parent_visits: int, prior_weight: float | None) -> float:
+    score = child.total_reward / child.visits + MCTS_EXPLORATION * math.sqrt(math.log(parent_visits) / child.visits)
+    if prior_weight:
+        # the prior matters most for children that have barely been visited
+        score += prior_weight * child.prior / (child.visits + 1)
+    return score
+
+def can_widen(node: Tree_Node) -> bool:
+    return len(node.children) < max(1, math.ceil(MCTS_WIDENING * node.visits ** MCTS_WIDENING_EXPONENT))
+
+def expand_actions(
+        problem: "Colony_Wrapper",
+        state: "Colony",
+        seen: Transposition_Table | None
+    ) -> tuple[tuple[int, ...], float, int]:
+    # (actions, prior, children scored) for a new child of state. Without priors (seen is None) the actions
+    # are a plain random draw, with them the best of MCTS_PRIOR_CANDIDATES draws scored like heuristic_dfs's children
+    if seen is None:
+        return (choose_random_actions(problem, state), 0.0, 0)
+    candidates = [choose_random_actions(problem, state) for _ in range(MCTS_PRIOR_CANDIDATES)]
+    scored = score_combinations(problem, state, problem.action_table, candidates, seen)
+    prior, actions = max(scored, key=lambda entry: entry[0])
+    return (actions, prior, len(scored))
+
+@profiled("nodes_explored")
+def mcts(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    return run_search(mcts_search(problem, node_expansions_allowed, deadline))
+
+def mcts_search(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    """Monte Carlo tree search with UCT selection and random rollouts.
+
+    Every playout walks down the tree, adds one child (actions drawn like percentage_fuzzing's), plays
+    random days from it until the colony is lost or wins, and backs the share of days survived up the tree.
+    Every simulated day counts towards node_expansions_allowed, tree or rollout, so the budget means the
+    same as for the DFS searches, and a winning rollout is returned as soon as it is found. Colonies that
+    are lost are never added to the tree, so every playout simulates at least one day.
+    With problem.mcts_prior_weight set, new children take the best of MCTS_PRIOR_CANDIDATES random action
+    draws by heuristic and the weight times that score is added to their UCT score, rollouts stay random.
+    attempts_needed is the number of playouts.
+    """
+    stats = search_stats()
+    total_depth = 0
+    prior_weight = problem.mcts_prior_weight
+    # only used to score prior candidates, it stays empty so nothing is ever pruned
+    prior_seen = Transposition_Table(len(problem.initial_state.building_registry)) if prior_weight else None
+    root = Tree_Node(problem.initial_state)
+    # the deepest colony reached is the path returned when nothing wins
+    progress = Search_Progress(stats)
+    progress.reached(root)
+
+    while stats.nodes_explored < node_expansions_allowed and not stats.timed_out:
+        if out_of_time(deadline):
+            stats.timed_out = True
+            break
+        stats.attempts_needed += 1
 
-    return (path[::-1], stats)
-        
\ No newline at end of file
+        node = root
+        while not can_widen(node):
+            parent_visits = node.visits
+            node = max(node.children, key=lambda child: uct_score(child, parent_visits, prior_weight))
+
+        actions, prior, scored_count = expand_actions(problem, node.state, prior_seen)
+        stats.nodes_generated += scored_count
+        existing = [child for child in node.children if child.actions == actions]
+        if existing:
+            leaf: Node = existing[0]
+        else:
+            state = problem.step(node.state, actions)
+            stats.nodes_explored += 1
+            stats.nodes_generated += 1
+            leaf = Tree_Node(state, actions, node, prior=prior)
+            if not state.check_loss() and not problem.goal_test(state):
+                node.children.append(leaf)
+        tree_leaf = leaf
+        progress.reached(leaf)
+        yield progress
+
+        # random rollout, only kept as Nodes so a win or the deepest run can be returned
+        state = leaf.state
+        while not state.check_loss() and not problem.goal_test(state) and stats.nodes_explored < node_expansions_allowed:
+            if out_of_time(deadline):
+                # the cut short rollout is still backed up, the search ends after it anyway
+                stats.timed_out = True
+                break
+            actions = choose_random_actions(problem, state)
+            state = problem.step(state, actions)
+            stats.nodes_explored += 1
+            stats.nodes_generated += 1
+            leaf = Node(state, actions, leaf)
+            progress.reached(leaf)
+            yield progress
+
+        total_depth += state.current_day - 1
+        if problem.goal_test(state):
+            stats.success = True
+            stats.average_depth = total_depth / stats.attempts_needed
+            return (get_path(leaf), stats)
+
+        reward = rollout_reward(problem, state)
+        tree_node: Optional[Node] = tree_leaf
+        while tree_node is not None:
+            tree_node.visits += 1
+            tree_node.total_reward += reward
+            tree_node = tree_node.parent
+
+    stats.average_depth = total_depth / stats.attempts_needed if stats.attempts_needed else 0
+    return (get_path(progress.best), stats)
+
+def temperature_order(scores: Sequence[float], temperature: float, rng: random.Random = random) -> list[int]:
+    # Positions of scores in the order drawing them one by one without replacement would give, each draw
+    # weighted like choose_state_temperature (Efraimidis-Spirakis keys). A temperature of 0 is best first
+    if not temperature:
+        return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+    max_score = max(scores, default=0.0)
+    keys: list[float] = []
+    for score in scores:
+        weight = math.exp((score - max_score) / temperature)
+        keys.append(math.log(1.0 - rng.random()) / weight if weight > 0 else -math.inf)
+    return sorted(range(len(scores)), key=keys.__getitem__, reverse=True)
+
+@profiled("nodes_explored")
+def beam_search(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    return run_search(beam_search_search(problem, node_expansions_allowed, deadline))
+
+def beam_search_search(problem: "Colony_Wrapper", node_expansions_allowed: int, deadline: float | None = None):
+    """Keeps problem.beam_width colonies per day, picked by their heuristic score before the tick.
+
+    Every member of the beam is expanded (scoring its children like heuristic_dfs, with problem.batch_scoring
+    and problem.max_combinations), then the next day's beam is drawn from the children of all members
+    together: with problem.beam_temperature they are drawn without replacement weighted like heuristic_dfs's
+    choice, with a temperature of 0 the best scoring ones are kept. Children with the same transposition
+    key (bucketed with problem.transposition_resolution) only take one slot, and children that lose are
+    skipped. An expansion counts towards node_expansions_allowed, and the width is narrowed when the budget
+    left would not last to the goal day at full width. Stops when a member passes goal_test, the budget
+    or the time runs out, or every child loses.
+    """
+    stats = search_stats()
+    progress = Search_Progress(stats)
+    stats.attempts_needed = 1
+    keys = Transposition_Table(len(problem.initial_state.building_registry), resolution=problem.transposition_resolution)
+    # never filled, the children of one day are only compared with each other
+    no_seen = Transposition_Table(len(problem.initial_state.building_registry))
+    score = score_children_batch if problem.batch_scoring else score_children
+    order_candidates = timed(problem.profiler, "temperature_order", temperature_order)
+    beam = [Node(problem.initial_state)]
+    progress.reached(beam[0])
+
+    while beam:
+        days_left = problem.goal_day + 1 - beam[0].state.current_day
+        width = min(problem.beam_width, (node_expansions_allowed - stats.nodes_explored) // days_left)
+        if width < 1:
+            break
+
+        scores: list[float] = []
+        candidates: list[tuple[Node, tuple[int, ...]]] = []
+        for node in beam[:width]:
+            if out_of_time(deadline):
+                stats.timed_out = True
+                break
+            stats.nodes_explored += 1
+            action_list = problem.get_actions(node.state, node.state.energy)
+            scored = score(problem, node.state, action_list, no_seen)
+            stats.nodes_generated += len(scored)
+            for child_score, combination in scored:
+                scores.append(child_score)
+                candidates.append((node, combination))
+            yield progress
+        if stats.timed_out:
+            break
+
+        next_beam: list[Node] = []
+        chosen_keys: set[tuple] = set()
+        for position in order_candidates(scores, problem.beam_temperature, problem.rng):
+            node, combination = candidates[position]
+            child_state = problem.transition(node.state, problem.actions_at(combination))
+            key = keys.state_key(child_state)
+            if key in chosen_keys:
+                continue
+            chosen_keys.add(key)
+            problem.run_tick(child_state)
+            if child_state.check_loss():
+                continue
+            child = Node(child_state, combination, node)
+            if problem.goal_test(child_state):
+                stats.success = True
+                stats.average_depth = child_state.current_day - 1
+                return (get_path(child), stats)
+            next_beam.append(child)
+            progress.reached(child)
+            if len(next_beam) >= problem.beam_width:
+                break
+        if not next_beam:
+            break
+        beam = next_beam
+
+    stats.average_depth = beam[0].state.current_day - 1
+    return (get_path(beam[0]), stats)
+
+# The generator behind every search function, for search_progress
+SEARCH_GENERATORS: dict[Callable, Callable[..., Generator[Search_Progress, None, Any]]] = {
+    percentage_fuzzing: percentage_fuzzing_search,
+    default_dfs: default_dfs_search,
+    heuristic_dfs: heuristic_dfs_search,
+    mcts: mcts_search,
+    beam_search: beam_search_search,
+}
+
+def search_progress(algorithm: Callable, problem: "Colony_Wrapper", *args, interval: float = 0.05, **kwargs) -> Iterator[Progress_Snapshot]:
+    """Runs algorithm (any of the search functions, with the same arguments) and yields a Progress_Snapshot at
+    most every interval seconds while it runs, then a last one with done set and the algorithm's result.
+
+    Stopping the iteration early cancels the search. Snapshot paths are the path to the node reached last,
+    with default_dfs's replay_paths their earlier nodes have no state. The phases are not profiled.
+    """
+    search = SEARCH_GENERATORS[algorithm](problem, *args, **kwargs)
+    start = time.perf_counter()
+    next_snapshot = start + interval
+    progress: Search_Progress | None = None
+    while True:
+        try:
+            progress = next(search)
+        except StopIteration as stop:
+            result = stop.value
+            break
+        now = time.perf_counter()
+        if now >= next_snapshot:
+            next_snapshot = now + interval
+            yield Progress_Snapshot(node_count(progress.stats), progress.best_depth, get_path(progress.current), now - start)
+
+    path, stats = result if isinstance(result, tuple) else ([], result)
+    best_depth = progress.best_depth if progress is not None else 0
+    yield Progress_Snapshot(node_count(stats), best_depth, path, time.perf_counter() - start, True, result)
+
+def node_count(stats: "search_stats | pf_stats") -> int:
+    return stats.nodes_explored if isinstance(stats, search_stats) else stats.nodes_generated
@@ -0,0 +1,22 @@
+import random
+from typing import Callable
+import pytest
+
+from colony_simulation.wrapper import Colony_Wrapper
+from colony_simulation.scenario import Scenario_Corpus
+from run import setup_simulation, make_heuristic_values
+
+GOAL_DAYS = 31
+SCENARIOS = Scenario_Corpus(GOAL_DAYS)
+
+@pytest.fixture
+def make_wrapper() -> Callable[[int, int], Colony_Wrapper]:
+    # A wrapper for seed's scenario with its own random.Random, so the tests never touch the global RNG
+    def make(seed: int, actions_per_day: int = 3) -> Colony_Wrapper:
+        colony, buildings = setup_simulation(GOAL_DAYS, SCENARIOS.get(seed))
+        wrapper = Colony_Wrapper(colony, buildings, make_heuristic_values())
+        wrapper.actions_per_day = actions_per_day
+        wrapper.goal_day = GOAL_DAYS
+        wrapper.rng = random.Random(seed)
+        return wrapper
+    return make
@@ -0,0 +1,36 @@
+#The NumPy engine in batch.py mirrors the Colony rules by hand, these tests step both engines side by side
+import numpy as np
+import pytest
+
+from search import choose_random_actions
+from colony_simulation.batch import Colony_Batch
+
+FIELDS = (
+    "food",
+    "energy",
+    "population",
+    "defense_capacity",
+    "base_defense_capacity",
+    "base_food_production",
+    "base_energy_production",
+    "population_growth_factor"
+)
+
+@pytest.mark.parametrize("actions_per_day", [3, 6])
+@pytest.mark.parametrize("seed", range(1, 9))
+def test_batch_steps_match_colony(make_wrapper, seed, actions_per_day):
+    # One colony per engine, both given the same random actions every day until it wins or loses
+    wrapper = make_wrapper(seed, actions_per_day)
+    state = wrapper.initial_state
+    batch = Colony_Batch(state, wrapper.action_table, 1)
+    while not wrapper.goal_test(state) and not wrapper.fail_test(state):
+        actions = choose_random_actions(wrapper, state)
+        state = wrapper.step(state, actions)
+        batch.apply_combinations(np.array([actions], dtype=np.int64).reshape(1, len(actions)))
+        batch.reset_power_modifiers()
+        batch.tick_step()
+
+        assert batch.current_day == state.current_day
+        for field in FIELDS:
+            assert getattr(batch, field)[0] == getattr(state, field), f"{field} differs after day {state.current_day - 1}"
+        assert batch.building_counts[0].tolist() == state.building_counts
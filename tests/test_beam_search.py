@@ -0,0 +1,74 @@
+#beam_search keeps a few colonies per day instead of restarting, these tests check the beam stays within its
+#width and the budget, that the path it returns is one the colony can take, and how members are drawn
+import math
+import random
+from collections import Counter
+import pytest
+
+import search
+from search import beam_search, temperature_order
+
+def run_beam(make_wrapper, seed, nea, width=8, temperature=1.0, batch_scoring=False):
+    wrapper = make_wrapper(seed, 3)
+    wrapper.beam_width = width
+    wrapper.beam_temperature = temperature
+    wrapper.batch_scoring = batch_scoring
+    path, stats = beam_search(wrapper, nea)
+    return wrapper, path, stats
+
+def test_same_seed_same_search(make_wrapper):
+    first = run_beam(make_wrapper, 3, 300)
+    second = run_beam(make_wrapper, 3, 300)
+    assert [node.actions for node in first[1]] == [node.actions for node in second[1]]
+    assert vars(first[2]) == vars(second[2])
+
+@pytest.mark.parametrize("seed", [1, 4])
+@pytest.mark.parametrize("temperature", [0.0, 1.0])
+def test_batch_scoring_picks_same_path(make_wrapper, seed, temperature):
+    results = []
+    for batch_scoring in (False, True):
+        _wrapper, path, stats = run_beam(make_wrapper, seed, 300, temperature=temperature, batch_scoring=batch_scoring)
+        results.append(([node.actions for node in path], vars(stats)))
+    assert results[0] == results[1]
+
+@pytest.mark.parametrize("seed", range(1, 7))
+@pytest.mark.parametrize("nea, width", [(40, 8), (100, 8), (300, 8), (300, 20)])
+def test_width_and_budget_are_respected(make_wrapper, monkeypatch, seed, nea, width):
+    # one expansion per member, so the members of a day are the colonies of that day that get scored
+    expanded_days = Counter()
+    score_children = search.score_children
+    def spy(problem, state, action_list, seen):
+        expanded_days[state.current_day] += 1
+        return score_children(problem, state, action_list, seen)
+    monkeypatch.setattr(search, "score_children", spy)
+    _wrapper, _path, stats = run_beam(make_wrapper, seed, nea, width=width)
+    assert stats.nodes_explored == sum(expanded_days.values()) <= nea
+    assert max(expanded_days.values()) <= width
+
+@pytest.mark.parametrize("seed", range(1, 7))
+@pytest.mark.parametrize("temperature", [0.0, 1.0])
+def test_path_replays(make_wrapper, seed, temperature):
+    # Every colony on the path is what its actions make from the one before, a win ends past the goal day
+    wrapper, path, stats = run_beam(make_wrapper, seed, 300, temperature=temperature)
+    assert path[0].state is wrapper.initial_state
+    state = wrapper.initial_state
+    for node in path[1:]:
+        state = wrapper.step(state, node.actions)
+        assert wrapper.transition_key(state) == wrapper.transition_key(node.state)
+    assert wrapper.goal_test(state) == stats.success
+    assert stats.average_depth == state.current_day - 1
+
+def test_zero_temperature_orders_best_first():
+    scores = [0.5, 2.0, -1.0, 2.5, 0.0]
+    assert temperature_order(scores, 0.0) == [3, 1, 0, 4, 2]
+
+def test_temperature_order_draws_like_the_temperature_choice():
+    # The first position drawn is picked with probability exp(score / temperature), normalised
+    scores = [0.0, 1.0, 2.0]
+    temperature = 1.5
+    rng = random.Random(0)
+    draws = 20000
+    firsts = Counter(temperature_order(scores, temperature, rng)[0] for _ in range(draws))
+    weights = [math.exp(score / temperature) for score in scores]
+    for position, weight in enumerate(weights):
+        assert firsts[position] / draws == pytest.approx(weight / sum(weights), abs=0.015)
@@ -0,0 +1,57 @@
+#train.py skips every evaluation the fitness cache already holds, so the cache has to survive a restart and
+#only ever hand back results for exactly the same agent, seed, algorithm and budget
+from dataclasses import replace
+
+import train
+from fitness_cache import Fitness_Cache, fitness_key
+from run import make_heuristic_values
+from search import default_dfs, heuristic_dfs
+
+def test_results_survive_reopening(tmp_path):
+    path = str(tmp_path / "fitness.sqlite")
+    key = fitness_key(make_heuristic_values(), 4, "heuristic_dfs", 1500)
+    cache = Fitness_Cache(path)
+    assert cache.get(key) is None
+    cache.put_many([(key, (True, 32))])
+    cache.close()
+
+    reopened = Fitness_Cache(path)
+    assert len(reopened) == 1
+    assert reopened.get(key) == (True, 32)
+    assert (reopened.hits, reopened.misses) == (1, 0)
+    reopened.close()
+
+def test_keys_tell_agents_apart():
+    agent = make_heuristic_values()
+    changed = replace(agent, w_food=agent.w_food + 1e-12)
+    assert fitness_key(agent, 1, "heuristic_dfs", 1500) == fitness_key(make_heuristic_values(), 1, "heuristic_dfs", 1500)
+    assert fitness_key(agent, 1, "heuristic_dfs", 1500) != fitness_key(changed, 1, "heuristic_dfs", 1500)
+    assert fitness_key(agent, 1, "heuristic_dfs", 1500) != fitness_key(agent, 1, "heuristic_dfs", 300)
+    # default_dfs never reads the weights, so every agent shares its results
+    assert fitness_key(agent, 1, "default_dfs", 300) == fitness_key(changed, 1, "default_dfs", 300)
+
+def test_evaluate_many_reuses_results_after_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / "fitness.sqlite")
+    agent = make_heuristic_values()
+    seeds = [1, 2, 3]
+    calls = []
+    evaluate_seed = train.evaluate_seed
+    def counted(*args):
+        calls.append(args[1])
+        return evaluate_seed(*args)
+    monkeypatch.setattr(train, "evaluate_seed", counted)
+
+    cache = Fitness_Cache(path)
+    # the same agent twice only runs each seed once
+    first = train.evaluate_many([agent, agent], seeds, heuristic_dfs, 100, cache=cache)
+    assert sorted(calls) == seeds
+    baseline = train.evaluate_many([agent], seeds, default_dfs, 100, cache=cache)
+    cache.close()
+
+    calls.clear()
+    restarted = Fitness_Cache(path)
+    assert train.evaluate_many([agent, agent], seeds, heuristic_dfs, 100, cache=restarted) == first
+    assert train.evaluate_many([replace(agent, w_food=1.0)], seeds, default_dfs, 100, cache=restarted) == baseline
+    assert calls == []
+    assert restarted.hits == 9
+    restarted.close()
@@ -0,0 +1,65 @@
+#mcts plays random days from a growing tree, these tests check that its playouts stay within the budget,
+#that it really does go back into the tree, and that the path it returns is one the colony can take
+import pytest
+
+import search
+from search import mcts, can_widen, Tree_Node
+
+def run_mcts(make_wrapper, seed, nea, prior_weight=None):
+    wrapper = make_wrapper(seed, 3)
+    wrapper.mcts_prior_weight = prior_weight
+    path, stats = mcts(wrapper, nea)
+    return wrapper, path, stats
+
+@pytest.mark.parametrize("prior_weight", [None, 1.0])
+def test_same_seed_same_search(make_wrapper, prior_weight):
+    first = run_mcts(make_wrapper, 3, 200, prior_weight)
+    second = run_mcts(make_wrapper, 3, 200, prior_weight)
+    assert [node.actions for node in first[1]] == [node.actions for node in second[1]]
+    assert vars(first[2]) == vars(second[2])
+
+@pytest.mark.parametrize("seed", range(1, 9))
+@pytest.mark.parametrize("nea", [40, 150])
+def test_budget_is_respected(make_wrapper, seed, nea):
+    _wrapper, _path, stats = run_mcts(make_wrapper, seed, nea)
+    assert stats.nodes_explored <= nea
+    if not stats.success:
+        assert stats.nodes_explored == nea
+
+@pytest.mark.parametrize("seed", range(1, 9))
+def test_path_replays(make_wrapper, seed):
+    # Every node on the path is what its actions make from the one before, a win ends past the goal day
+    wrapper, path, stats = run_mcts(make_wrapper, seed, 150)
+    assert path[0].state is wrapper.initial_state
+    state = wrapper.initial_state
+    for node in path[1:]:
+        state = wrapper.step(state, node.actions)
+        assert wrapper.transition_key(state) == wrapper.transition_key(node.state)
+    assert wrapper.goal_test(state) == stats.success
+
+@pytest.mark.parametrize("seed", [16, 34, 36])
+def test_playouts_go_back_into_the_tree(make_wrapper, monkeypatch, seed):
+    # With a budget of a handful of playouts, later ones have to add their child below an existing child of
+    # the root instead of all adding one to the root, otherwise the search is just random restarts
+    expanded_days = []
+    expand_actions = search.expand_actions
+    def spy(problem, state, seen):
+        expanded_days.append(state.current_day)
+        return expand_actions(problem, state, seen)
+    monkeypatch.setattr(search, "expand_actions", spy)
+    wrapper, _path, stats = run_mcts(make_wrapper, seed, 200)
+    assert len(expanded_days) == stats.attempts_needed
+    assert any(day > wrapper.initial_state.current_day for day in expanded_days)
+
+def test_widening_grows_with_visits():
+    node = Tree_Node(None)
+    allowed = []
+    for visits in range(1, 20):
+        node.visits = visits
+        node.children = []
+        while can_widen(node):
+            node.children.append(Tree_Node(None))
+        allowed.append(len(node.children))
+    assert allowed[0] >= 1
+    assert allowed == sorted(allowed)
+    assert allowed[-1] < 19
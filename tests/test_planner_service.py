@@ -0,0 +1,99 @@
+#planner_service.py answers every request line with a response line, these tests feed it requests without a
+#socket or worker processes (the searches run on asyncio's default executor) and check what comes back
+import asyncio
+import json
+import pytest
+
+import planner_service
+from planner_service import Planner_Service, plan_request, percentile
+from colony_simulation.colony_state import encode_colony
+from run import setup_simulation
+
+class Fake_Reader:
+    def __init__(self, lines: list[bytes]):
+        self.lines = list(lines)
+
+    async def readline(self) -> bytes:
+        return self.lines.pop(0) if self.lines else b""
+
+class Fake_Writer:
+    def __init__(self):
+        self.written = b""
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        self.written += data
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+def serve(service: Planner_Service, *lines) -> list[dict]:
+    # Sends lines (dicts are sent as JSON) over one connection and returns the decoded responses
+    raw = [line if isinstance(line, bytes) else json.dumps(line).encode() for line in lines]
+    writer = Fake_Writer()
+    asyncio.run(service.serve_connection(Fake_Reader([line + b"\n" for line in raw]), writer))
+    assert writer.closed
+    return [json.loads(line) for line in writer.written.splitlines()]
+
+@pytest.fixture
+def service() -> Planner_Service:
+    return Planner_Service(pool=None, workers=1)
+
+@pytest.mark.parametrize("line, error", [
+    (b"{not json", "JSONDecodeError"),
+    (b"[1, 2]", "ValueError: A request has to be a JSON object"),
+    ({"op": "launch"}, "ValueError: Unknown op launch"),
+    ({"algorithm": "percentage_fuzzing"}, "ValueError: Unknown algorithm percentage_fuzzing"),
+    ({"state": {"food": 100}}, "ValueError: Colony state is missing current_day, energy"),
+    ({"state": {"food": 1}, "seed": "five"}, "ValueError: invalid literal for int()"),
+])
+def test_bad_requests_get_an_error(service, line, error):
+    [response] = serve(service, line)
+    assert response["ok"] is False
+    assert response["error"].startswith(error)
+
+def test_unknown_building_in_state(service):
+    state = encode_colony(setup_simulation(planner_service.GOAL_DAYS, planner_service.get_corpus(planner_service.GOAL_DAYS).get(3))[0])
+    state["buildings"] = {"Moon Base": 1}
+    [response] = serve(service, {"id": 7, "seed": 3, "state": state})
+    assert response == {"ok": False, "error": "ValueError: Moon Base is not a registered building type", "id": 7}
+
+def test_connection_keeps_going_after_an_error(service):
+    responses = serve(service, {"id": 1, "op": "launch"}, b"{", {"id": 3, "op": "ping"})
+    assert [response["ok"] for response in responses] == [False, False, True]
+    assert responses[0]["id"] == 1 and "id" not in responses[1] and responses[2]["id"] == 3
+
+def test_plans_and_errors_are_counted(service):
+    serve(
+        service,
+        {"seed": 2, "node_expansions_allowed": 50},
+        {"seed": 2, "algorithm": "mcts", "node_expansions_allowed": 50},
+        {"algorithm": "nonsense"},
+        {"op": "ping"}
+    )
+    [stats] = serve(service, {"op": "stats"})
+    latency = stats["latency"]
+    assert (latency["all"]["requests"], latency["all"]["errors"]) == (3, 1)
+    assert (latency["heuristic_dfs"]["requests"], latency["heuristic_dfs"]["errors"]) == (1, 0)
+    assert latency["mcts"]["requests"] == 1
+    assert "nonsense" not in latency
+
+@pytest.mark.parametrize("algorithm", ["default_dfs", "heuristic_dfs", "mcts", "beam_search"])
+def test_sent_state_plans_like_the_scenario_start(algorithm):
+    # Encoding the scenario's first colony and sending it has to give the plan planning from the scenario does
+    request = {"seed": 4, "algorithm": algorithm, "node_expansions_allowed": 150}
+    plain = plan_request(dict(request))
+    colony, _buildings = setup_simulation(planner_service.GOAL_DAYS, planner_service.get_corpus(planner_service.GOAL_DAYS).get(4))
+    sent = plan_request(dict(request, state=encode_colony(colony)))
+    assert sent["plan"] == plain["plan"]
+    assert sent["actions"] == plain["actions"]
+    assert [action[0] for action in plain["actions"]] == plain["plan"][0]
+
+def test_percentile_is_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert [percentile(values, percent) for percent in (50, 90, 99, 100)] == [50.0, 90.0, 99.0, 100.0]
+    assert percentile([3.0], 50) == 3.0
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,110 @@
+#Every search runs as a generator with an optional deadline, these tests check that the plain functions still
+#give the same results, that a deadline stops them with the deepest path found, and search_progress's snapshots
+import time
+import pytest
+
+import search
+from search import default_dfs, heuristic_dfs, mcts, beam_search, percentage_fuzzing, search_progress
+
+NODE_BUDGET = 300
+# every search loses this seed within NODE_BUDGET, so none of them stops early on a win
+LOSING_SEED = 51
+PATH_SEARCHES = [default_dfs, heuristic_dfs, mcts, beam_search]
+
+def run_result(result):
+    # what two runs of the same search on the same seed have to agree on
+    if isinstance(result, tuple):
+        path, stats = result
+        return ([node.actions for node in path], vars(stats))
+    return vars(result)
+
+def budget_for(algorithm):
+    return 30 if algorithm is percentage_fuzzing else NODE_BUDGET
+
+def deadline_after(monkeypatch, checks: int) -> None:
+    # The deadline passes at the given deadline check, so the tests don't depend on how fast they run
+    calls = []
+    def out_of_time(deadline):
+        calls.append(deadline)
+        return deadline is not None and len(calls) > checks
+    monkeypatch.setattr(search, "out_of_time", out_of_time)
+
+def assert_days_follow(wrapper, path):
+    # A path runs from the initial colony one day at a time
+    assert path[0].state is wrapper.initial_state
+    assert [node.state.current_day for node in path] == list(range(1, len(path) + 1))
+
+@pytest.mark.parametrize("algorithm", PATH_SEARCHES + [percentage_fuzzing])
+def test_deadline_far_away_changes_nothing(make_wrapper, algorithm):
+    plain = algorithm(make_wrapper(6, 3), budget_for(algorithm))
+    timed = algorithm(make_wrapper(6, 3), budget_for(algorithm), deadline=time.perf_counter() + 3600)
+    assert run_result(plain) == run_result(timed)
+    stats = plain[1] if isinstance(plain, tuple) else plain
+    assert not stats.timed_out
+
+@pytest.mark.parametrize("algorithm", PATH_SEARCHES)
+def test_passed_deadline_stops_at_once(make_wrapper, algorithm):
+    wrapper = make_wrapper(6, 3)
+    path, stats = algorithm(wrapper, NODE_BUDGET, deadline=time.perf_counter())
+    assert stats.timed_out
+    assert not stats.success
+    assert stats.nodes_explored <= 1
+    # the DFS searches time out before taking their root, the others start from it
+    assert [node.state for node in path] in ([], [wrapper.initial_state])
+
+def test_passed_deadline_stops_percentage_fuzzing(make_wrapper):
+    stats = percentage_fuzzing(make_wrapper(6, 3), 30, deadline=time.perf_counter())
+    assert stats.timed_out
+    assert stats.total_runs == 0
+
+@pytest.mark.parametrize("replay_paths", [False, True])
+@pytest.mark.parametrize("algorithm", PATH_SEARCHES)
+def test_timed_out_search_returns_deepest_path(make_wrapper, monkeypatch, algorithm, replay_paths):
+    deadline_after(monkeypatch, 60)
+    wrapper = make_wrapper(LOSING_SEED, 3)
+    wrapper.replay_paths = replay_paths
+    snapshots = list(search_progress(algorithm, wrapper, NODE_BUDGET, deadline=0.0, interval=0.0))
+    path, stats = snapshots[-1].result
+    assert stats.timed_out
+    assert stats.nodes_explored < NODE_BUDGET
+    assert len(path) - 1 == snapshots[-1].best_depth == max(snapshot.best_depth for snapshot in snapshots)
+    assert_days_follow(wrapper, path)
+
+def test_timed_out_percentage_fuzzing_counts_finished_runs(make_wrapper, monkeypatch):
+    deadline_after(monkeypatch, 5)
+    stats = percentage_fuzzing(make_wrapper(6, 3), 30, deadline=0.0)
+    assert stats.timed_out
+    assert stats.total_runs == 5
+    assert stats.win_rate == stats.total_wins / 5
+
+@pytest.mark.parametrize("algorithm", PATH_SEARCHES + [percentage_fuzzing])
+def test_progress_ends_with_the_plain_result(make_wrapper, algorithm):
+    plain = algorithm(make_wrapper(LOSING_SEED, 3), budget_for(algorithm))
+    snapshots = list(search_progress(algorithm, make_wrapper(LOSING_SEED, 3), budget_for(algorithm), interval=0.0))
+    last = snapshots[-1]
+    assert last.done and not any(snapshot.done for snapshot in snapshots[:-1])
+    assert run_result(last.result) == run_result(plain)
+    counts = [snapshot.nodes_explored for snapshot in snapshots]
+    depths = [snapshot.best_depth for snapshot in snapshots]
+    assert counts == sorted(counts) and depths == sorted(depths)
+    assert len(snapshots) > 2
+
+@pytest.mark.parametrize("algorithm", PATH_SEARCHES)
+def test_snapshot_paths_end_at_the_current_node(make_wrapper, algorithm):
+    wrapper = make_wrapper(LOSING_SEED, 3)
+    for snapshot in search_progress(algorithm, wrapper, NODE_BUDGET, interval=0.0):
+        if snapshot.done:
+            break
+        assert_days_follow(wrapper, snapshot.path)
+
+def test_stopping_the_iteration_cancels_the_search(make_wrapper):
+    wrapper = make_wrapper(LOSING_SEED, 3)
+    steps = []
+    run_tick = wrapper.run_tick
+    wrapper.run_tick = lambda state: (steps.append(state), run_tick(state))
+    progress = search_progress(default_dfs, wrapper, NODE_BUDGET, interval=0.0)
+    for snapshot in progress:
+        if snapshot.nodes_explored >= 5:
+            break
+    progress.close()
+    assert len(steps) == snapshot.nodes_explored < NODE_BUDGET
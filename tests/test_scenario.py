@@ -0,0 +1,44 @@
+#Scenario_Corpus has to hand out the scenarios (and the random numbers after them) that seeding the global RNG
+#and building the events in place gives, whether a scenario was just built or read back from a file
+import random
+import pytest
+
+from colony_simulation.scenario import Scenario_Corpus
+from run import setup_simulation
+
+GOAL_DAYS = 31
+
+def fire_days(schedule) -> list[tuple[str, ...]]:
+    return [tuple(event.event_name for event in schedule.events_on(day)) for day in range(1, GOAL_DAYS + 1)]
+
+@pytest.mark.parametrize("seed", [0, 1, 7, 12345])
+def test_seed_random_matches_setup_simulation(seed):
+    random.seed(seed)
+    colony, _buildings = setup_simulation(GOAL_DAYS)
+    expected_draws = [random.random() for _ in range(5)]
+
+    scenario = Scenario_Corpus(GOAL_DAYS).seed_random(seed)
+    assert [random.random() for _ in range(5)] == expected_draws
+    assert fire_days(scenario.schedule) == fire_days(colony.events)
+
+def test_get_leaves_global_rng_alone():
+    random.seed(3)
+    state = random.getstate()
+    Scenario_Corpus(GOAL_DAYS).warm(range(10))
+    assert random.getstate() == state
+
+def test_saved_corpus_round_trip(tmp_path):
+    path = str(tmp_path / "scenarios.json")
+    corpus = Scenario_Corpus(GOAL_DAYS)
+    corpus.warm(range(20))
+    corpus.save(path)
+
+    loaded = Scenario_Corpus(GOAL_DAYS, path=path)
+    assert len(loaded) == 20
+    for seed in range(20):
+        assert loaded.get(seed).planned == corpus.get(seed).planned
+        assert loaded.get(seed).draws == corpus.get(seed).draws
+        assert fire_days(loaded.get(seed).schedule) == fire_days(corpus.get(seed).schedule)
+
+    # a corpus for another number of days must not pick up this file
+    assert len(Scenario_Corpus(GOAL_DAYS - 1, path=path)) == 0
@@ -0,0 +1,71 @@
+#The searches have faster ways of doing the same work (NumPy scoring, replayed paths) that have to give
+#exactly the same results, these tests run them against the plain way on fixed seeds
+import pytest
+
+import search
+from search import default_dfs, heuristic_dfs, score_children, score_children_batch
+from transposition import Transposition_Table
+
+@pytest.mark.parametrize("actions_per_day", [3, 4])
+@pytest.mark.parametrize("seed", [1, 5, 11])
+def test_batch_scoring_picks_same_path(make_wrapper, seed, actions_per_day):
+    results = []
+    for batch_scoring in (False, True):
+        wrapper = make_wrapper(seed, actions_per_day)
+        wrapper.batch_scoring = batch_scoring
+        path, stats = heuristic_dfs(wrapper, node_expansions_allowed=200)
+        results.append(([node.actions for node in path], stats.attempts_needed, stats.nodes_explored, stats.nodes_generated, stats.success))
+    assert results[0] == results[1]
+
+@pytest.mark.parametrize("seed", [1, 5])
+def test_batch_scoring_with_bounded_table(make_wrapper, seed):
+    # A small, bucketed table evicts all the time, seen_mask has to follow what is left in it
+    results = []
+    for batch_scoring in (False, True):
+        wrapper = make_wrapper(seed, 3)
+        wrapper.batch_scoring = batch_scoring
+        wrapper.transposition_size = 20
+        wrapper.transposition_resolution = 5.0
+        path, stats = heuristic_dfs(wrapper, node_expansions_allowed=200)
+        results.append(([node.actions for node in path], stats.nodes_explored, stats.transposition_evictions))
+    assert results[0] == results[1]
+    assert results[0][2] > 0
+
+@pytest.mark.parametrize("resolution", [None, 5.0])
+@pytest.mark.parametrize("seed", [2, 7])
+def test_batch_scores_match_scalar(make_wrapper, monkeypatch, seed, resolution):
+    # Every colony along a path, with a third of its children already in seen. The arrays are used
+    # however few children there are, otherwise small nodes would be scored by the scalar path twice
+    monkeypatch.setattr(search, "BATCH_SCORING_MIN_CHILDREN", 0)
+    wrapper = make_wrapper(seed, 3)
+    path, _stats = heuristic_dfs(wrapper, node_expansions_allowed=100)
+    for node in path:
+        state = node.state
+        action_list = wrapper.get_actions(state, state.energy)
+        seen = Transposition_Table(len(state.building_counts), resolution=resolution)
+        children = score_children(wrapper, state, action_list, seen)
+        for _score, combination in children[::3]:
+            seen.add(seen.state_key(wrapper.transition(state, [action_list[i] for i in combination])))
+        expected = score_children(wrapper, state, action_list, seen)
+        assert len(expected) < len(children) or not children
+        assert score_children_batch(wrapper, state, action_list, seen) == expected
+
+def colony_fields(state) -> dict:
+    # Every attribute but the event schedule and building registry, each wrapper in a test builds its own.
+    # Events make their effects as closures, so effects are compared by name and days left
+    fields = {name: value for name, value in vars(state).items() if name not in ("events", "building_registry")}
+    fields["current_effects"] = [(effect.__name__, duration) for effect, duration in state.current_effects]
+    return fields
+
+@pytest.mark.parametrize("seed", [1, 4, 9])
+def test_replayed_paths_match_kept_states(make_wrapper, seed):
+    # replay_path only re-steps the logged actions, the colonies it rebuilds have to be the ones the search saw
+    paths = []
+    for replay_paths in (False, True):
+        wrapper = make_wrapper(seed, 3)
+        wrapper.replay_paths = replay_paths
+        path, _stats = default_dfs(wrapper, node_expansions_allowed=300)
+        paths.append(path)
+    kept, replayed = paths
+    assert [node.actions for node in kept] == [node.actions for node in replayed]
+    assert [colony_fields(node.state) for node in kept] == [colony_fields(node.state) for node in replayed]
@@ -0,0 +1,93 @@
+#Racing and steady state training decide which agents survive, these tests run them on agents with made up
+#win rates so the outcome of every (agent, seed) pair is known without running a search
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+import pytest
+
+import train
+from fitness_cache import Fitness_Cache
+from run import make_heuristic_values
+
+SEEDS = list(range(32))
+
+def make_agents(win_rates: list[float]):
+    # w_food holds the win rate, fake_results reads it back
+    return [replace(make_heuristic_values(), w_food=rate) for rate in win_rates]
+
+@pytest.fixture
+def fake_results(monkeypatch):
+    # Replaces the searches: an agent wins a seed when the seed's fixed draw is below its win rate
+    runs = []
+    def evaluate_results(agents, seeds, algorithm, node_expansion_limit, executor=None, cache=None):
+        runs.extend((agent.w_food, seed) for agent in agents for seed in seeds)
+        return [[((seed * 37 % 100) / 100 < agent.w_food, 20 + seed % 5) for seed in seeds] for agent in agents]
+    monkeypatch.setattr(train, "evaluate_results", evaluate_results)
+    return runs
+
+def test_wilson_interval():
+    lower, upper = train.wilson_interval(8, 10, 1.96)
+    assert lower == pytest.approx(0.4902, abs=1e-4)
+    assert upper == pytest.approx(0.9433, abs=1e-4)
+    # stays inside [0, 1] with no wins or only wins, where the normal interval collapses to a point
+    lower, upper = train.wilson_interval(0, 10, 1.96)
+    assert lower == pytest.approx(0.0) and 0 < upper < 1
+    lower, upper = train.wilson_interval(10, 10, 1.96)
+    assert 0 < lower < 1 and upper == pytest.approx(1.0)
+    assert train.wilson_interval(5, 10, 2.5)[0] < train.wilson_interval(5, 10, 1.0)[0]
+
+def test_race_keeps_the_top_agents(fake_results):
+    agents = make_agents([0.9, 0.1, 0.85, 0.3, 0.05, 0.8])
+    full = train.evaluate_many(agents, SEEDS, train.heuristic_dfs, train.AGENT_NODE_EXPANSION_LIMIT)
+    fake_results.clear()
+
+    raced = train.race_agents(agents, SEEDS, 3, 2, 0.05)
+    finished = [i for i, (_fitness, seeds_run) in enumerate(raced) if seeds_run == len(SEEDS)]
+    best = sorted(range(len(agents)), key=lambda i: full[i], reverse=True)[:3]
+    assert set(best) <= set(finished)
+    for i in finished:
+        assert raced[i][0] == full[i]
+    # the weak agents stop early, so fewer pairs ran than a full evaluation
+    assert len(fake_results) < len(agents) * len(SEEDS)
+    assert len(fake_results) == sum(seeds_run for _fitness, seeds_run in raced)
+
+def test_lower_alpha_drops_agents_later(fake_results):
+    agents = make_agents([0.7, 0.65, 0.6, 0.5, 0.45, 0.4])
+    strict = sum(seeds_run for _fitness, seeds_run in train.race_agents(agents, SEEDS, 2, 2, 1e-6))
+    loose = sum(seeds_run for _fitness, seeds_run in train.race_agents(agents, SEEDS, 2, 2, 0.3))
+    assert loose < strict
+
+def test_race_runs_everything_when_all_agents_make_the_top_k(fake_results):
+    agents = make_agents([0.9, 0.1])
+    raced = train.race_agents(agents, SEEDS, 2, 2, 0.05)
+    assert [seeds_run for _fitness, seeds_run in raced] == [len(SEEDS), len(SEEDS)]
+
+def test_steady_state_pool_is_ranked(fake_results):
+    random.seed(0)
+    seeds = SEEDS[:16]
+    pool = train.steady_state_train(make_agents([0.2, 0.5, 0.8, 0.1]), seeds, 20, 5, 2, 0.0, 1.0)
+    assert len(fake_results) == 20 * len(seeds)
+    assert len(pool) == 5
+    fitness = [entry[0] for entry in pool]
+    assert fitness == sorted(fitness, reverse=True)
+    for agent_fitness, agent in pool:
+        assert agent_fitness == train.summarize_results(train.evaluate_results([agent], seeds, None, 0)[0])
+    # children are bred from the best agents, the pool never ends up worse than the best initial agent
+    assert pool[0][0] >= train.summarize_results(train.evaluate_results(make_agents([0.8]), seeds, None, 0)[0])
+
+def test_steady_state_reuses_cached_seeds(fake_results):
+    cache = Fitness_Cache()
+    agents = make_agents([0.6, 0.6, 0.3])
+    pool = train.steady_state_train(agents, SEEDS[:16], 3, 3, 2, 0.0, 1.0, cache=cache)
+    # the second copy of the first agent finds all its seeds in the cache
+    assert len(fake_results) == 2 * 16
+    assert cache.hits == 16
+    assert [agent.w_food for _fitness, agent in pool] == [0.6, 0.6, 0.3]
+
+def test_steady_state_keeps_workers_busy(fake_results):
+    random.seed(1)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        pool = train.steady_state_train(make_agents([0.4, 0.7]), SEEDS[:8], 12, 4, 2, 0.0, 1.0, executor, 3)
+    assert len(fake_results) == 12 * 8
+    fitness = [entry[0] for entry in pool]
+    assert len(pool) == 4 and fitness == sorted(fitness, reverse=True)
@@ -0,0 +1,58 @@
+#Transposition_Table has to stay within its capacity by evicting its oldest keys, and keep the (day, food)
+#groups seen_mask looks keys up in matching what is left
+import pytest
+
+from transposition import Transposition_Table
+
+def make_keys(count: int) -> list[tuple]:
+    return [(day, 10, 50.0, float(day), 1.0, 0) for day in range(count)]
+
+def test_capacity_evicts_oldest_first():
+    seen = Transposition_Table(2, capacity=3)
+    keys = make_keys(5)
+    for key in keys:
+        seen.add(key)
+        assert len(seen) <= 3
+    assert list(seen) == keys[2:]
+    assert seen.evictions == 2
+    assert keys[0] not in seen
+    assert keys[4] in seen
+    assert (seen.hits, seen.misses) == (1, 1)
+
+def test_adding_a_stored_key_keeps_its_place():
+    seen = Transposition_Table(2, capacity=2)
+    first, second, third = make_keys(3)
+    seen.add(first)
+    seen.add(second)
+    seen.add(first)
+    assert seen.evictions == 0
+    seen.add(third)
+    assert list(seen) == [second, third]
+
+def test_unbounded_table_never_evicts():
+    seen = Transposition_Table(2)
+    for key in make_keys(1000):
+        seen.add(key)
+    assert len(seen) == 1000
+    assert seen.evictions == 0
+
+def test_resolution_buckets_near_states_together():
+    seen = Transposition_Table(2, resolution=5.0)
+    assert seen.make_key(3, 10, 51.0, 12.0, 7.5, 0) == seen.make_key(3, 10, 54.9, 14.0, 9.9, 0)
+    assert seen.make_key(3, 10, 51.0, 12.0, 7.5, 0) != seen.make_key(3, 10, 55.0, 12.0, 7.5, 0)
+
+def test_groups_follow_evictions():
+    seen = Transposition_Table(2, capacity=2)
+    first, second, third = (3, 10, 50.0, 1.0, 1.0, 0), (3, 12, 50.0, 2.0, 1.0, 0), (4, 12, 50.0, 2.0, 1.0, 0)
+    for key in (first, second, third):
+        seen.add(key)
+    assert list(seen.keys_for(3, 50.0)) == [second]
+    assert list(seen.keys_for(4, 50.0)) == [third]
+    seen.add((5, 1, 1.0, 1.0, 1.0, 0))
+    assert list(seen.keys_for(3, 50.0)) == []
+    assert set(seen.groups) == {(4, 50.0), (5, 1.0)}
+
+@pytest.mark.parametrize("capacity, resolution", [(0, None), (None, 0.0), (None, -1.0)])
+def test_rejects_bad_settings(capacity, resolution):
+    with pytest.raises(ValueError):
+        Transposition_Table(2, capacity=capacity, resolution=resolution)
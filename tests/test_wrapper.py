@@ -0,0 +1,87 @@
+#Colony_Wrapper scores children without building a Colony per child, from action deltas or by applying and
+#undoing the actions on one scratch child, these tests check both against transition on colonies from real runs
+import copy
+import random
+import pytest
+
+from search import default_dfs, get_unique_index_combinations, score_children
+from transposition import Transposition_Table
+
+def sample_states(wrapper):
+    # Colonies from every day of a default_dfs run, so they own buildings and have had events
+    path, _stats = default_dfs(wrapper, node_expansions_allowed=300)
+    return [node.state for node in path]
+
+def colony_fields(state) -> dict:
+    # Every attribute of the colony, lists and dicts copied so later changes don't show up in the snapshot.
+    # building_log only says whether changes are being recorded, transition never records them
+    return {
+        name: copy.copy(value) if isinstance(value, (list, dict)) else value
+        for name, value in vars(state).items()
+        if name != "building_log"
+    }
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_apply_and_undo_match_transition(make_wrapper, seed):
+    # Combinations drawn from the whole table, so builds that fail for lack of energy are covered too
+    wrapper = make_wrapper(seed, 4)
+    rng = random.Random(seed)
+    for state in sample_states(wrapper):
+        child = wrapper.transition(state, [])
+        before = colony_fields(child)
+        for _ in range(20):
+            actions = rng.choices(wrapper.action_table, k=4)
+            undo_log = wrapper.apply(child, actions)
+            assert colony_fields(child) == colony_fields(wrapper.transition(state, actions))
+            wrapper.undo(child, undo_log)
+            assert colony_fields(child) == before
+            assert child.building_log is None
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_scores_match_transition(make_wrapper, seed):
+    # apply/undo is what score_children falls back on when some action has no known deltas
+    wrapper = make_wrapper(seed, 3)
+    wrapper.action_deltas = None
+    for state in sample_states(wrapper):
+        action_list = wrapper.get_actions(state, state.energy)
+        combinations = list(get_unique_index_combinations(wrapper.action_costs[:len(action_list)], 3, state.energy))
+        children = [wrapper.transition(state, [action_list[i] for i in combination]) for combination in combinations]
+        seen = Transposition_Table(len(state.building_counts))
+        for child in children[::2]:
+            seen.add(seen.state_key(child))
+        expected = [
+            (wrapper.heuristic(child), tuple(combination))
+            for child, combination in zip(children, combinations)
+            if seen.state_key(child) not in seen.entries
+        ]
+        assert len(expected) < len(children)
+        assert score_children(wrapper, state, action_list, seen) == expected
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_single_action_deltas_match_transition(make_wrapper, seed):
+    wrapper = make_wrapper(seed, 3)
+    assert wrapper.action_deltas is not None
+    seen = Transposition_Table(len(wrapper.initial_state.building_counts))
+    for state in sample_states(wrapper):
+        for index, action in enumerate(wrapper.action_table):
+            [(score, combination)] = wrapper.delta_scores(state, [(index,)], seen)
+            assert combination == (index,)
+            assert score == wrapper.heuristic(wrapper.transition(state, [action])), f"{action[0]} on day {state.current_day}"
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_combination_deltas_match_transition(make_wrapper, seed):
+    # Several actions at once, including builds that fail because an earlier action spent the energy
+    wrapper = make_wrapper(seed, 4)
+    rng = random.Random(seed)
+    for state in sample_states(wrapper):
+        combinations = list(get_unique_index_combinations(wrapper.action_costs, 4, state.energy + 200, sample=40, rng=rng))
+        children = [wrapper.transition(state, wrapper.actions_at(combination)) for combination in combinations]
+        seen = Transposition_Table(len(state.building_counts))
+        scores = wrapper.delta_scores(state, combinations, seen)
+        assert scores == [(wrapper.heuristic(child), tuple(combination)) for child, combination in zip(children, combinations)]
+        # the keys delta_scores checks against seen are those of the real children (different combinations
+        # can make the same child, so more than the added half can be left out)
+        for child in children[::2]:
+            seen.add(seen.state_key(child))
+        unseen = [entry for entry, child in zip(scores, children) if seen.state_key(child) not in seen.entries]
+        assert wrapper.delta_scores(state, combinations, seen) == unseen
@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
 #This file trains the heuristics of the model and after doing so writes it to an outfile
+import math
+import os
 import random
 import argparse
+from bisect import insort
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass, fields
+from statistics import NormalDist
+from typing import Callable
 from colony_simulation.colony import Colony
 from colony_simulation.building import Building
 from colony_simulation.wrapper import Colony_Wrapper
 from colony_simulation.default_buildings import *
 from colony_simulation.default_events import *
+from colony_simulation.scenario import Scenario_Corpus
+from fitness_cache import Fitness_Cache, fitness_key
 from search import heuristic_dfs, default_dfs, search_stats, Node
 # Importing necessary setup functions and data structures from run.py
 from run import Heuristic_Values, setup_simulation
 
+BASELINE_NODE_EXPANSION_LIMIT = 300
+AGENT_NODE_EXPANSION_LIMIT = 1500
+GOAL_DAYS = 31
+
+# Every seed's scenario is built once per process, evaluating many agents on a seed reuses it
+SCENARIOS = Scenario_Corpus(GOAL_DAYS)
+
+def load_scenarios(path: str | None) -> None:
+    # Also the worker initializer, so every worker process starts from the saved corpus
+    if path is not None and os.path.exists(path):
+        SCENARIOS.load(path)
+
 def generate_random_agent(weight_min: float, weight_max: float) -> Heuristic_Values:
     return Heuristic_Values(
         w_food=random.uniform(weight_min, weight_max),
@@ -69,57 +89,246 @@ def mutate_agent(agent: Heuristic_Values, weight_min: float, weight_max: float,
             
     return Heuristic_Values(**new_kwargs)
 
-def evaluate_baseline(seeds: list[int]) -> tuple[float, float]:
-    wins = 0
-    avg_depth = 0
-    node_expansion_limit = 300
-    
+def evaluate_seed(agent: Heuristic_Values, seed: int, algorithm: Callable, node_expansion_limit: int) -> tuple[bool, int]:
+    """Runs a single agent against a single seeded scenario and returns (success, path length).
+
+    The caller's random state is restored afterwards so that evaluating in a worker
+    process or in the main process leaves the training loop's own RNG in the same place.
+    """
+    outer_state = random.getstate()
+    # leaves the RNG where random.seed(seed) followed by building the scenario would
+    scenario = SCENARIOS.seed_random(seed)
+    colony, buildings = setup_simulation(GOAL_DAYS, scenario)
+
+    wrapper = Colony_Wrapper(colony, buildings, heuristic_values=agent)
+    wrapper.actions_per_day = 3
+    wrapper.goal_day = GOAL_DAYS
+
+    path, stats = algorithm(wrapper, node_expansions_allowed=node_expansion_limit)
+
+    random.setstate(outer_state)
+    return (stats.success, len(path))
+
+def summarize_results(results: list[tuple[bool, int]]) -> tuple[float, float]:
+    wins = sum(1 for success, _depth in results if success)
+    total_depth = sum(depth for _success, depth in results)
+    return (wins / len(results), total_depth / len(results))
+
+def evaluate_results(
+        agents: list[Heuristic_Values],
+        seeds: list[int],
+        algorithm: Callable,
+        node_expansion_limit: int,
+        executor: Executor | None = None,
+        cache: Fitness_Cache | None = None
+    ) -> list[list[tuple[bool, int]]]:
+    """Runs every agent on every seed, optionally fanning the (agent, seed) pairs out to a process pool.
+
+    Returns each agent's (success, path length) per seed, merged back in (agent, seed) order so the
+    results are identical to the serial ones regardless of how many workers were used. Pairs already
+    in the cache are not run again.
+    """
+    job_agents = [agent for agent in agents for _seed in seeds]
+    job_seeds = [seed for _agent in agents for seed in seeds]
+    job_keys = [fitness_key(agent, seed, algorithm.__name__, node_expansion_limit) for agent, seed in zip(job_agents, job_seeds)]
+
+    results: list[tuple[bool, int] | None] = [None] * len(job_agents)
+    pending: dict[tuple, list[int]] = {}
+    for i, key in enumerate(job_keys):
+        cached = cache.get(key) if cache is not None and key not in pending else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            # the same key can appear more than once (e.g. duplicate agents), it is only run once
+            pending.setdefault(key, []).append(i)
+
+    run_indices = [indices[0] for indices in pending.values()]
+    run_agents = [job_agents[i] for i in run_indices]
+    run_seeds = [job_seeds[i] for i in run_indices]
+    run_algorithms = [algorithm] * len(run_indices)
+    run_limits = [node_expansion_limit] * len(run_indices)
+
+    if executor is None:
+        new_results = list(map(evaluate_seed, run_agents, run_seeds, run_algorithms, run_limits))
+    else:
+        # executor.map yields in submission order, which keeps the merge deterministic
+        new_results = list(executor.map(evaluate_seed, run_agents, run_seeds, run_algorithms, run_limits))
+
+    for indices, result in zip(pending.values(), new_results):
+        for i in indices:
+            results[i] = result
+    if cache is not None:
+        cache.put_many(zip(pending.keys(), new_results))
+
+    return [results[i * len(seeds):(i + 1) * len(seeds)] for i in range(len(agents))]
+
+def evaluate_many(
+        agents: list[Heuristic_Values],
+        seeds: list[int],
+        algorithm: Callable,
+        node_expansion_limit: int,
+        executor: Executor | None = None,
+        cache: Fitness_Cache | None = None
+    ) -> list[tuple[float, float]]:
+    # (win rate, average path length) of every agent over all the seeds
+    return [
+        summarize_results(results)
+        for results in evaluate_results(agents, seeds, algorithm, node_expansion_limit, executor, cache)
+    ]
+
+def wilson_interval(wins: int, runs: int, z: float) -> tuple[float, float]:
+    # Wilson score interval for a win rate, unlike the plain normal one it stays sensible at 0 or all wins
+    rate = wins / runs
+    denominator = 1 + z * z / runs
+    centre = (rate + z * z / (2 * runs)) / denominator
+    spread = z * math.sqrt(rate * (1 - rate) / runs + z * z / (4 * runs * runs)) / denominator
+    return (centre - spread, centre + spread)
+
+def race_agents(
+        agents: list[Heuristic_Values],
+        seeds: list[int],
+        top_k: int,
+        first_round: int,
+        alpha: float,
+        executor: Executor | None = None,
+        cache: Fitness_Cache | None = None
+    ) -> list[tuple[tuple[float, float], int]]:
+    """Evaluates the agents in rounds and stops running the ones that can't make the top k.
+
+    The first round uses first_round seeds, every round after that doubles the seeds seen so far.
+    After a round an agent is dropped when winning every remaining seed would still leave it behind
+    the k-th best agent, or when the upper end of its win rate's confidence interval (Wilson score,
+    one sided at significance level alpha) is below the lower end of the k-th best one's.
+    Returns (fitness over the seeds it ran, seeds it ran) per agent, the agents that made it to the
+    end ran every seed and have exactly the fitness evaluate_many would give them.
+    """
+    z = NormalDist().inv_cdf(1 - alpha)
+    results: list[list[tuple[bool, int]]] = [[] for _ in agents]
+    alive = list(range(len(agents)))
+    done = 0
+    round_size = max(1, first_round)
+
+    while done < len(seeds):
+        round_seeds = seeds[done:done + round_size]
+        round_results = evaluate_results(
+            [agents[i] for i in alive], round_seeds, heuristic_dfs, AGENT_NODE_EXPANSION_LIMIT, executor, cache
+        )
+        for i, agent_results in zip(alive, round_results):
+            results[i].extend(agent_results)
+        done += len(round_seeds)
+        round_size = done
+
+        if done >= len(seeds) or len(alive) <= top_k:
+            continue
+        wins = {i: sum(1 for success, _depth in results[i] if success) for i in alive}
+        kth_best = sorted(wins.values(), reverse=True)[top_k - 1]
+        kth_lower, _kth_upper = wilson_interval(kth_best, done, z)
+        remaining = len(seeds) - done
+        alive = [
+            i for i in alive
+            if wins[i] + remaining >= kth_best and wilson_interval(wins[i], done, z)[1] >= kth_lower
+        ]
+
+    return [(summarize_results(agent_results), len(agent_results)) for agent_results in results]
+
+def evaluate_baseline(seeds: list[int], executor: Executor | None = None, cache: Fitness_Cache | None = None) -> tuple[float, float]:
     dummy_agent = generate_random_agent(1.0, 1.0)
 
-    for seed in seeds:
-        random.seed(seed)
-        
-        GOAL_DAYS = 31
-        colony, buildings = setup_simulation(GOAL_DAYS)
-        
-        wrapper = Colony_Wrapper(colony, buildings, heuristic_values=dummy_agent)
-        wrapper.actions_per_day = 3 
-        wrapper.goal_day = GOAL_DAYS
-        
-        path, stats = default_dfs(wrapper, node_expansions_allowed=node_expansion_limit)
-        
-        if stats.success:
-            wins += 1
-        avg_depth += len(path)
-        
-            
-    win_rate = wins / len(seeds)
-    
-    return (win_rate, avg_depth / len(seeds))
+    return evaluate_many([dummy_agent], seeds, default_dfs, BASELINE_NODE_EXPANSION_LIMIT, executor, cache)[0]
 
-def evaluate_agent(agent: Heuristic_Values, seeds: list[int]) -> tuple[float, float]:
-    wins = 0
-    avg_depth = 0
-    node_expansion_limit = 1500
-    
-    for seed in seeds:
+def evaluate_agent(agent: Heuristic_Values, seeds: list[int], executor: Executor | None = None, cache: Fitness_Cache | None = None) -> tuple[float, float]:
+    return evaluate_many([agent], seeds, heuristic_dfs, AGENT_NODE_EXPANSION_LIMIT, executor, cache)[0]
 
-        random.seed(seed)
-        
-        GOAL_DAYS = 31
-        colony, buildings = setup_simulation(GOAL_DAYS)
-        
-        wrapper = Colony_Wrapper(colony, buildings, heuristic_values=agent)
-        wrapper.actions_per_day = 3 
-        wrapper.goal_day = GOAL_DAYS
-        
-        path, stats = heuristic_dfs(wrapper, node_expansion_limit)
-        
-        if stats.success:
-            wins += 1
-        avg_depth += len(path)
-            
-    return (wins / len(seeds), avg_depth / len(seeds))
+def evaluate_agent_seeds(agent: Heuristic_Values, seeds: list[int]) -> list[tuple[bool, int]]:
+    # One steady state job: a single agent on the seeds it still needs, run start to finish in one worker
+    return evaluate_results([agent], seeds, heuristic_dfs, AGENT_NODE_EXPANSION_LIMIT)[0]
+
+def steady_state_train(
+        initial_agents: list[Heuristic_Values],
+        seeds: list[int],
+        total_evaluations: int,
+        pool_size: int,
+        top_k: int,
+        weight_min: float,
+        weight_max: float,
+        executor: Executor | None = None,
+        workers: int = 1,
+        cache: Fitness_Cache | None = None
+    ) -> list[tuple[tuple[float, float], Heuristic_Values]]:
+    """Steady state GA: no generations, every worker always has an agent to evaluate.
+
+    The initial agents are evaluated first, after that each time an evaluation finishes the agent goes
+    straight into a ranked pool of the best pool_size agents seen so far and the free worker gets a
+    child mutated from one of the current top k. Every agent runs on the same seeds so fitness is
+    comparable across the whole run. With workers the order results come back in depends on timing,
+    so runs are only reproducible without them. Returns the pool, best first.
+    """
+    # (fitness, -evaluation number, agent), sorted best last so insort keeps it ranked; earlier agents win ties
+    pool: list[tuple[tuple[float, float], int, Heuristic_Values]] = []
+    waiting = list(initial_agents)
+    in_flight: dict[Future, tuple[Heuristic_Values, list[int], dict[int, tuple[bool, int]]]] = {}
+    submitted = 0
+    finished = 0
+    best_fitness = None
+
+    def next_agent() -> Heuristic_Values:
+        if waiting:
+            return waiting.pop(0)
+        parents = [agent for _fitness, _order, agent in pool[-top_k:]]
+        return mutate_agent(random.choice(parents), weight_min, weight_max)
+
+    def finish(agent: Heuristic_Values, results: list[tuple[bool, int]]) -> None:
+        nonlocal finished, best_fitness
+        finished += 1
+        fitness = summarize_results(results)
+        insort(pool, (fitness, -finished, agent), key=lambda entry: (entry[0], entry[1]))
+        if len(pool) > pool_size:
+            pool.pop(0)
+        if best_fitness is None or fitness > best_fitness:
+            best_fitness = fitness
+            print(f"Evaluated {finished}/{total_evaluations} | New Best Win Rate: {fitness[0] * 100:.1f}% | Avg Depth: {fitness[1]:.1f}")
+
+    def complete(
+            agent: Heuristic_Values,
+            missing: list[int],
+            cached: dict[int, tuple[bool, int]],
+            new_results: list[tuple[bool, int]]
+        ) -> None:
+        if cache is not None and missing:
+            cache.put_many(
+                (fitness_key(agent, seed, heuristic_dfs.__name__, AGENT_NODE_EXPANSION_LIMIT), result)
+                for seed, result in zip(missing, new_results)
+            )
+        cached.update(zip(missing, new_results))
+        finish(agent, [cached[seed] for seed in seeds])
+
+    def start(agent: Heuristic_Values) -> None:
+        # Seeds already in the cache are not sent to a worker
+        cached: dict[int, tuple[bool, int]] = {}
+        if cache is not None:
+            for seed in seeds:
+                result = cache.get(fitness_key(agent, seed, heuristic_dfs.__name__, AGENT_NODE_EXPANSION_LIMIT))
+                if result is not None:
+                    cached[seed] = result
+        missing = [seed for seed in seeds if seed not in cached]
+        if executor is None or not missing:
+            complete(agent, missing, cached, evaluate_agent_seeds(agent, missing) if missing else [])
+        else:
+            in_flight[executor.submit(evaluate_agent_seeds, agent, missing)] = (agent, missing, cached)
+
+    while finished < total_evaluations:
+        # keep every worker busy, children can only be bred once something is in the pool
+        while submitted < total_evaluations and len(in_flight) < workers and (waiting or pool):
+            submitted += 1
+            start(next_agent())
+        if not in_flight:
+            continue
+        done, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            agent, missing, cached = in_flight.pop(future)
+            complete(agent, missing, cached, future.result())
+
+    return [(fitness, agent) for fitness, _order, agent in reversed(pool)]
 
 def save_best_agent(agent: Heuristic_Values, filepath: str):
     try:
@@ -139,8 +348,19 @@ def main():
     parser.add_argument('--population-size', '--ps', required=False, type=int, default=50, help="The number of agents to run in each generation")
     parser.add_argument('--top-k', '--tk', required=False, type=int, default=5, help="The number of agents to select for each generation")
     parser.add_argument('--output-file', '--of', required=True, type=str,help="The file to write the results to")
+    parser.add_argument('--workers', '--w', required=False, type=int, default=1, help="The number of worker processes used to evaluate agents, 1 runs everything in this process")
+    parser.add_argument('--seed', '--s', required=False, type=int, help="Seed for the training loop (agents, mutations and scenario seeds), rerunning with the same seed and --fitness-cache picks up where a stopped run left off")
+    parser.add_argument('--fitness-cache', '--fc', required=False, type=str, help="SQLite file that keeps every (agent, seed) result, restarting with the same file skips evaluations already done. Delete it after changing the simulation")
+    parser.add_argument('--seed-pool', '--sp', required=False, type=int, help="Draw this many seeds once and pick every generation's seeds from them, so carried over agents and the baseline hit the fitness cache")
+    parser.add_argument('--racing', '--race', action='store_true', help="Evaluate agents in rounds of seeds and stop running the ones that are statistically out of the top k")
+    parser.add_argument('--race-seeds', '--rs', required=False, type=int, default=2, help="Seeds in the first racing round, every round after doubles the seeds seen so far")
+    parser.add_argument('--race-alpha', '--ralpha', required=False, type=float, default=0.05, help="Significance level of the racing comparisons, the chance of wrongly calling an agent worse than the k-th best in a single one. Lower drops agents later")
+    parser.add_argument('--steady-state', '--ss', action='store_true', help="Train without generations: workers keep evaluating agents and children are bred from the current best as soon as a worker is free. Evaluates generations * population-size agents on one fixed set of seeds")
+    parser.add_argument('--scenario-file', '--sf', required=False, type=str, help="JSON file to load prebuilt scenarios from, new ones are added to it when training ends")
     args = parser.parse_args()
     
+    if args.seed is not None:
+        random.seed(args.seed)
     WEIGHT_MIN = 0.25
     WEIGHT_MAX = 7.5
 
@@ -149,34 +369,74 @@ def main():
     population_size = args.population_size
     top_k = args.top_k
     output_file = args.output_file
+    workers = max(1, args.workers)
     population = [generate_random_agent(WEIGHT_MIN, WEIGHT_MAX) for _ in range(population_size)]
     
-    print(f"Starting training: {generations} generations, pop size {population_size}, {num_simulations} sims/agent.")
-    
-    for gen in range(generations):
-        seeds = [seed for seed in random.sample(range(10000000), num_simulations)]
+    print(f"Starting training: {generations} generations, pop size {population_size}, {num_simulations} sims/agent, {workers} worker(s).")
+    load_scenarios(args.scenario_file)
+    # Always on: elites and the baseline get the same seeds again, a file makes it last between runs too
+    cache = Fitness_Cache(args.fitness_cache)
+    seed_pool = None
+    if args.seed_pool:
+        seed_pool = random.sample(range(10000000), max(args.seed_pool, num_simulations))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=load_scenarios, initargs=(args.scenario_file,)) if workers > 1 else None
+
+    if args.steady_state:
+        # one set of seeds for the whole run, every agent in the pool has to be scored on the same scenarios
+        seeds = random.sample(seed_pool if seed_pool is not None else range(10000000), num_simulations)
+        SCENARIOS.warm(seeds)
+        base_win, base_depth = evaluate_baseline(seeds, executor, cache)
+        print(f"Baseline: {base_win * 100:.1f}% | Avg Depth: {base_depth:.1f}")
+        ranked_pool = steady_state_train(
+            population, seeds, generations * population_size, population_size, top_k,
+            WEIGHT_MIN, WEIGHT_MAX, executor, workers, cache
+        )
+        population = [agent for _fitness, agent in ranked_pool]
+        best_win_rate, best_avg_depth = ranked_pool[0][0]
+        print(f"Best Win Rate: {best_win_rate * 100:.1f}% | Avg Depth: {best_avg_depth:.1f}")
+    else:
+        for gen in range(generations):
+            if seed_pool is None:
+                seeds = [seed for seed in random.sample(range(10000000), num_simulations)]
+            else:
+                seeds = random.sample(seed_pool, num_simulations)
+            # workers build their own copies, this keeps every seed in the corpus that gets saved
+            SCENARIOS.warm(seeds)
 
-        scored_population = []
-        base_win, base_depth = evaluate_baseline(seeds)
+            base_win, base_depth = evaluate_baseline(seeds, executor, cache)
       
-        for i, agent in enumerate(population):
-            fitness = evaluate_agent(agent, seeds)
-            scored_population.append((fitness, agent))
+            if args.racing:
+                raced = race_agents(population, seeds, top_k, args.race_seeds, args.race_alpha, executor, cache)
+                # agents dropped early only ran some of the seeds, everything that ran the whole race ranks above them
+                order = sorted(range(len(population)), key=lambda i: (raced[i][1], raced[i][0]), reverse=True)
+                scored_population = [(raced[i][0], population[i]) for i in order]
+                seeds_run = sum(seeds_used for _fitness, seeds_used in raced)
+                print(f"Racing: {seeds_run}/{len(population) * len(seeds)} agent evaluations, {sum(1 for _fitness, seeds_used in raced if seeds_used == len(seeds))} agents finished")
+            else:
+                population_fitness = evaluate_many(population, seeds, heuristic_dfs, AGENT_NODE_EXPANSION_LIMIT, executor, cache)
+                scored_population = list(zip(population_fitness, population))
         
-        scored_population.sort(key=lambda x: x[0], reverse=True)
+                scored_population.sort(key=lambda x: x[0], reverse=True)
         
-        best_stats = scored_population[0][0]
-        best_win_rate, best_avg_depth = best_stats
-        print(f"Gen {gen+1}/{generations} | Best Win Rate: {best_win_rate * 100:.1f}% | Avg Depth: {best_avg_depth:.1f}")       
-        print(f"Baseline: {base_win * 100:.1f}% | Avg Depth: {base_depth:.1f}") 
-        next_generation = [agent for score, agent in scored_population[:top_k]]
+            best_stats = scored_population[0][0]
+            best_win_rate, best_avg_depth = best_stats
+            print(f"Gen {gen+1}/{generations} | Best Win Rate: {best_win_rate * 100:.1f}% | Avg Depth: {best_avg_depth:.1f}")       
+            print(f"Baseline: {base_win * 100:.1f}% | Avg Depth: {base_depth:.1f}") 
+            next_generation = [agent for score, agent in scored_population[:top_k]]
         
-        while len(next_generation) < population_size:
-            parent = random.choice(next_generation[:top_k])
-            child = mutate_agent(parent, WEIGHT_MIN, WEIGHT_MAX)
-            next_generation.append(child)
+            while len(next_generation) < population_size:
+                parent = random.choice(next_generation[:top_k])
+                child = mutate_agent(parent, WEIGHT_MIN, WEIGHT_MAX)
+                next_generation.append(child)
             
-        population = next_generation
+            population = next_generation
+
+    if executor is not None:
+        executor.shutdown()
+    if args.scenario_file:
+        SCENARIOS.save(args.scenario_file)
+    print(f"Fitness cache: {cache.hits} evaluations reused, {cache.misses} run")
+    cache.close()
 
     best_agent = population[0]
     
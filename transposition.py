@@ -0,0 +1,114 @@
+#Remembers the states heuristic_dfs has already committed to, so later attempts don't walk back into them
+#A key is a colony's day, population, food, energy, defense capacity and an additive hash of its building counts,
+#so a child's key comes from its parent's hash plus the buildings it adds instead of a tuple of every count
+import math
+import random
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+if TYPE_CHECKING:
+    import numpy as np
+    from colony_simulation.colony import Colony
+    from search import search_stats
+
+# The building hashes only have to be the same in every run, not secret
+HASH_SEED = 4300
+# 40 bit hashes keep the hash of any realistic building counts exact inside an int64 for the NumPy scorer
+HASH_BITS = 40
+
+class Transposition_Table:
+    """Bounded set of state keys with hit, miss and eviction counts.
+
+    With a resolution, food, energy and defense capacity are bucketed to multiples of it, so near identical
+    colonies count as the same state. Without one the values are used as they are. Once capacity keys are
+    stored the oldest one is evicted for every new one (first in, first out), with no capacity it grows
+    without limit.
+    """
+    def __init__(self, building_types: int, capacity: int | None = None, resolution: float | None = None):
+        if capacity is not None and capacity < 1:
+            raise ValueError(f"Transposition table capacity has to be at least 1, got {capacity}")
+        if resolution is not None and resolution <= 0:
+            raise ValueError(f"Transposition table resolution has to be positive, got {resolution}")
+        rng = random.Random(HASH_SEED)
+        self.building_hashes: list[int] = [rng.getrandbits(HASH_BITS) for _ in range(building_types)]
+        self.capacity: int | None = capacity
+        self.resolution: float | None = resolution
+        # dicts keep insertion order, so the first key is always the oldest
+        self.entries: dict[tuple, None] = {}
+        # the same keys grouped by (day, food bucket), the only part every child of one colony shares,
+        # so a Colony_Batch only compares its rows against the keys that can match them (see keys_for)
+        self.groups: dict[tuple, dict[tuple, None]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def counts_hash(self, building_counts: Sequence[int]) -> int:
+        return sum(count * building_hash for count, building_hash in zip(building_counts, self.building_hashes))
+
+    def make_key(
+            self,
+            current_day: int,
+            population: int,
+            food: float,
+            energy: float,
+            defense_capacity: float,
+            counts_hash: int
+        ) -> tuple:
+        resolution = self.resolution
+        if resolution is not None:
+            food = math.floor(food / resolution)
+            energy = math.floor(energy / resolution)
+            defense_capacity = math.floor(defense_capacity / resolution)
+        return (current_day, population, food, energy, defense_capacity, counts_hash)
+
+    def state_key(self, state: "Colony") -> tuple:
+        return self.make_key(
+            state.current_day,
+            state.population,
+            state.food,
+            state.energy,
+            state.defense_capacity,
+            self.counts_hash(state.building_counts)
+        )
+
+    def bucket_array(self, values: "np.ndarray") -> "np.ndarray":
+        # make_key's bucketing for a column of a Colony_Batch
+        if self.resolution is None:
+            return values
+        import numpy as np
+        return np.floor(values / self.resolution)
+
+    def add(self, key: tuple) -> None:
+        if key in self.entries:
+            return
+        if self.capacity is not None and len(self.entries) >= self.capacity:
+            oldest = next(iter(self.entries))
+            del self.entries[oldest]
+            group_key = (oldest[0], oldest[2])
+            group = self.groups[group_key]
+            del group[oldest]
+            if not group:
+                del self.groups[group_key]
+            self.evictions += 1
+        self.entries[key] = None
+        self.groups.setdefault((key[0], key[2]), {})[key] = None
+
+    def keys_for(self, current_day: int, food_key: float) -> Iterable[tuple]:
+        # Every stored key of that day whose (bucketed) food is food_key
+        return self.groups.get((current_day, food_key), ())
+
+    def __contains__(self, key: tuple) -> bool:
+        if key in self.entries:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def record_stats(self, stats: "search_stats") -> None:
+        stats.transposition_hits = self.hits
+        stats.transposition_misses = self.misses
+        stats.transposition_evictions = self.evictions